@@ -1,9 +1,17 @@
 """
 ASGI entrypoint.
 
+Serves the async application if the `LINKER_ASYNC` environment variable is enabled.
+
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
-from linker.main import app
+from linker.constants import ASYNC_MODE_DEFAULT, ASYNC_MODE_KEY
+from linker.environment import get_env_bool
+
+if get_env_bool(ASYNC_MODE_KEY, default=ASYNC_MODE_DEFAULT):
+    from linker.async_main import app
+else:
+    from linker.main import app
 
 __all__ = ["app"]
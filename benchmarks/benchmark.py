@@ -0,0 +1,287 @@
+"""
+Benchmarks of the crud layer and the endpoints.
+
+Each benchmark is timed over a number of repeats, then run once more under tracemalloc to count allocations. The
+results are written as json, so runs of different commits can be compared with `--compare`.
+
+    python benchmarks/benchmark.py --clicks 1000 --clicks 100000 --output benchmark.json
+    python benchmarks/benchmark.py --clicks 1000 --compare benchmark.json
+
+The database is an in-memory SQLite database, like the one the tests use. With `--postgres` the database configured
+by the `POSTGRES_*` environment variables is used instead. Its tables are dropped, so only point it at a database
+that is dedicated to benchmarks.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import sqlalchemy
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine, update
+from sqlmodel import Session, SQLModel, create_engine, insert, select
+from sqlmodel.pool import StaticPool
+
+from linker.cache import redirect_cache
+from linker.crud import record_clicks
+from linker.database import create_database_engine, create_db, get_engine, get_read_session, get_session
+from linker.main import app, get_linker_token
+from linker.models import Click, Link, SlugSequence
+from linker.slugs import slug_space
+from linker.urls import hash_target_url
+
+LINKER_TOKEN = "benchmark"  # noqa: S105
+AUTH_HEADERS = {"Authorization": f"Bearer {LINKER_TOKEN}"}
+SEED_BATCH_SIZE = 10_000
+TARGET_URL = "https://example.com/benchmark"
+
+
+class BenchmarkResult(NamedTuple):
+    """Timings and allocations of one benchmark on one dataset."""
+
+    name: str
+    dialect: str
+    links: int
+    clicks: int
+    repeats: int
+    min_seconds: float
+    median_seconds: float
+    mean_seconds: float
+    max_seconds: float
+    peak_memory_bytes: int
+    allocated_blocks: int
+
+
+class Dataset(NamedTuple):
+    """Seeded database and the slugs of its links, the first one having the most clicks."""
+
+    engine: Engine
+    slugs: list[str]
+    links: int
+    clicks: int
+
+
+def create_engine_for(*, postgres: bool) -> Engine:
+    """Create an empty database engine."""
+    if postgres:
+        engine: Engine = create_database_engine()
+        SQLModel.metadata.drop_all(engine)
+        return engine
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+def seed(engine: Engine, links: int, clicks: int) -> Dataset:
+    """Create the schema and insert links and clicks in bulk.
+
+    Clicks are spread over the last 30 days, and half of them belong to the first link, so listing its clicks reads a
+    large share of the click table.
+    """
+    create_db(engine)
+    slugs = [slug_space.slug(index) for index in range(links)]
+    with Session(engine) as session:
+        for start in range(0, links, SEED_BATCH_SIZE):
+            target_urls = [f"{TARGET_URL}/{index}" for index in range(start, min(start + SEED_BATCH_SIZE, links))]
+            rows = [
+                {"slug": slug, "target_url": target_url, "target_url_hash": hash_target_url(target_url)}
+                for slug, target_url in zip(slugs[start : start + SEED_BATCH_SIZE], target_urls, strict=True)
+            ]
+            session.execute(insert(Link), rows)
+        session.execute(update(SlugSequence).values(value=links))
+        session.commit()
+        link_ids = session.exec(select(Link.id).order_by(Link.id)).all()
+
+        now = datetime.now(tz=UTC)
+        for start in range(0, clicks, SEED_BATCH_SIZE):
+            batch = [
+                Click(
+                    ip_address="127.0.0.1",
+                    link_id=link_ids[0] if index % 2 == 0 else link_ids[index % len(link_ids)],
+                    timestamp=now - timedelta(days=30) * (index / clicks),
+                )
+                for index in range(start, min(start + SEED_BATCH_SIZE, clicks))
+            ]
+            record_clicks(session, batch)
+    return Dataset(engine=engine, slugs=slugs, links=links, clicks=clicks)
+
+
+def create_client(engine: Engine) -> TestClient:
+    """Create a client of the application that uses the engine of the dataset."""
+
+    def get_session_override() -> Iterator[Session]:
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_engine] = lambda: engine
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
+    app.dependency_overrides[get_linker_token] = lambda: LINKER_TOKEN
+    return TestClient(app)
+
+
+def measure(
+    name: str,
+    dataset: Dataset,
+    function: Callable[[Any], object],
+    repeats: int,
+    setup: Callable[[], Any] = lambda: None,
+) -> BenchmarkResult:
+    """Time a function over a number of repeats, then count its allocations in one more run.
+
+    The setup runs before every call and is not measured. The garbage collector is disabled while timing, like timeit
+    does, so collections do not land on a random repeat.
+    """
+    durations = []
+    for _ in range(repeats):
+        argument = setup()
+        gc.disable()
+        start = time.perf_counter()
+        function(argument)
+        durations.append(time.perf_counter() - start)
+        gc.enable()
+
+    argument = setup()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    function(argument)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocated_blocks = sum(max(stat.count_diff, 0) for stat in after.compare_to(before, "lineno"))
+
+    return BenchmarkResult(
+        name=name,
+        dialect=dataset.engine.dialect.name,
+        links=dataset.links,
+        clicks=dataset.clicks,
+        repeats=repeats,
+        min_seconds=min(durations),
+        median_seconds=statistics.median(durations),
+        mean_seconds=statistics.fmean(durations),
+        max_seconds=max(durations),
+        peak_memory_bytes=peak,
+        allocated_blocks=allocated_blocks,
+    )
+
+
+def run_benchmarks(dataset: Dataset, repeats: int) -> list[BenchmarkResult]:
+    """Run every benchmark on a seeded dataset."""
+    client = create_client(dataset.engine)
+    busiest_slug, other_slugs = dataset.slugs[0], iter(dataset.slugs[1:])
+    created = iter(range(sys.maxsize))
+
+    def request(method: str, url: str, **kwargs: Any) -> Callable[[Any], object]:  # noqa: ANN401
+        def send(_: object) -> None:
+            response = client.request(method, url, headers=AUTH_HEADERS, follow_redirects=False, **kwargs)
+            if response.is_error:
+                response.raise_for_status()
+
+        return send
+
+    def create_link(_: object) -> None:
+        json = {"target_url": f"{TARGET_URL}/created/{next(created)}"}
+        client.post("/api/v1/links", headers=AUTH_HEADERS, json=json).raise_for_status()
+
+    def delete_link(slug: str) -> None:
+        client.delete(f"/api/v1/links/{slug}", headers=AUTH_HEADERS).raise_for_status()
+
+    # Walk to a page deep into the link table, to time keyset pagination far from the start.
+    cursor: str | None = None
+    last_page_cursor: str | None = None
+    for _ in range(min(dataset.links // 100, 100)):
+        response = client.get("/api/v1/links", headers=AUTH_HEADERS, params={"cursor": cursor} if cursor else {})
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        last_page_cursor = cursor
+    deep_page = {"cursor": last_page_cursor} if last_page_cursor else {}
+
+    results = [
+        measure("forward_to_target_url", dataset, request("GET", f"/{busiest_slug}"), repeats),
+        measure(
+            "forward_to_target_url_uncached",
+            dataset,
+            request("GET", f"/{busiest_slug}"),
+            repeats,
+            setup=redirect_cache.clear,
+        ),
+        measure("create_link", dataset, create_link, repeats),
+        measure("list_links", dataset, request("GET", "/api/v1/links"), repeats),
+        measure("list_links_deep_page", dataset, request("GET", "/api/v1/links", params=deep_page), repeats),
+        measure("list_clicks", dataset, request("GET", f"/api/v1/links/{busiest_slug}/clicks"), repeats),
+        measure("delete_link", dataset, delete_link, repeats, setup=lambda: next(other_slugs)),
+    ]
+    app.dependency_overrides.clear()
+    return results
+
+
+def get_commit() -> str | None:
+    """Get the commit the benchmarks ran on, if they run in a git checkout."""
+    try:
+        output = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, check=True, text=True)  # noqa: S607
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def compare(results: list[BenchmarkResult], baseline_path: Path) -> None:
+    """Print the median time of each benchmark relative to a baseline run."""
+    baseline = {
+        (result["name"], result["dialect"], result["clicks"]): result
+        for result in json.loads(baseline_path.read_text())["results"]
+    }
+    for result in results:
+        base = baseline.get((result.name, result.dialect, result.clicks))
+        if base is None:
+            continue
+        ratio = result.median_seconds / base["median_seconds"]
+        print(f"{result.name:<32} {result.dialect:<10} {result.clicks:>9} clicks  {ratio:6.2f}x baseline")  # noqa: T201
+
+
+def main() -> None:
+    """Seed a dataset for each click count, run the benchmarks on it and write the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip() if __doc__ else None)
+    parser.add_argument("--clicks", type=int, action="append", help="Number of clicks, repeatable. Default: 1000.")
+    parser.add_argument("--clicks-per-link", type=int, default=10, help="Clicks per link, sets the number of links.")
+    parser.add_argument("--repeats", type=int, default=20, help="Number of timed runs of each benchmark.")
+    parser.add_argument("--postgres", action="store_true", help="Run against the configured PostgreSQL database.")
+    parser.add_argument("--output", type=Path, help="Write the results as json to this file.")
+    parser.add_argument("--compare", type=Path, help="Compare the results with the json output of an earlier run.")
+    arguments = parser.parse_args()
+
+    results: list[BenchmarkResult] = []
+    for clicks in arguments.clicks or [1_000]:
+        links = max(clicks // arguments.clicks_per_link, arguments.repeats + 2)
+        engine = create_engine_for(postgres=arguments.postgres)
+        dataset = seed(engine, links, clicks)
+        for result in run_benchmarks(dataset, arguments.repeats):
+            results.append(result)
+            print(f"{result.name:<32} {result.dialect:<10} {clicks:>9} clicks  {result.median_seconds * 1000:9.3f} ms")  # noqa: T201
+        engine.dispose()
+
+    report = {
+        "commit": get_commit(),
+        "created_at": datetime.now(tz=UTC).isoformat(),
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "results": [result._asdict() for result in results],
+    }
+    if arguments.output is not None:
+        arguments.output.write_text(json.dumps(report, indent=2))
+    if arguments.compare is not None:
+        compare(results, arguments.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Async Create, Read, Update, Delete operations for Link model.
+
+Each operation runs the matching function of `linker.crud` on the connection of an async session, so the database
+driver awaits on the event loop instead of blocking a worker thread.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from collections.abc import Callable
+from datetime import datetime
+from typing import Concatenate
+
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from linker import crud
+from linker.constants import PAGE_SIZE_DEFAULT
+from linker.models import ClickRow, HistogramBucket, Link, LinkRow
+
+
+async def _run_sync[**P, T](
+    session: AsyncSession,
+    function: Callable[Concatenate[Session, P], T],
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> T:
+    """Run a synchronous crud function with the synchronous facade of an async session."""
+    return await session.run_sync(function, *args, **kwargs)  # type: ignore[arg-type]
+
+
+async def create_link(session: AsyncSession, slug: str | None, target_url: str) -> Link:
+    """Create a link with a slug that points to the target url. See `linker.crud.create_link`."""
+    return await _run_sync(session, crud.create_link, slug, target_url)
+
+
+async def list_links(
+    session: AsyncSession,
+    limit: int = PAGE_SIZE_DEFAULT,
+    cursor: str | None = None,
+) -> tuple[list[LinkRow], str | None]:
+    """List a page of links that have a target url, ordered by id. See `linker.crud.list_links`."""
+    return await _run_sync(session, crud.list_links, limit, cursor)
+
+
+async def get_link(session: AsyncSession, slug: str) -> Link:
+    """Get a link by its slug. See `linker.crud.get_link`."""
+    return await _run_sync(session, crud.get_link, slug)
+
+
+async def get_link_version(session: AsyncSession, slug: str) -> tuple[int, datetime | None] | None:
+    """Get the version of a link and the time it last changed. See `linker.crud.get_link_version`."""
+    return await _run_sync(session, crud.get_link_version, slug)
+
+
+async def update_link(session: AsyncSession, link: Link, target_url: str) -> Link:
+    """Update the target url of a link. See `linker.crud.update_link`."""
+    return await _run_sync(session, crud.update_link, link, target_url)
+
+
+async def delete_link(session: AsyncSession, link: Link) -> None:
+    """Delete a link by setting its target url to none and resetting clicks. See `linker.crud.delete_link`."""
+    await _run_sync(session, crud.delete_link, link)
+
+
+async def update_link_clicks(session: AsyncSession, link_id: int, ip_address: str) -> None:
+    """Update the clicks for a link. See `linker.crud.update_link_clicks`."""
+    await _run_sync(session, crud.update_link_clicks, link_id, ip_address)
+
+
+async def list_clicks(
+    session: AsyncSession,
+    link: Link,
+    limit: int = PAGE_SIZE_DEFAULT,
+    cursor: str | None = None,
+) -> tuple[list[ClickRow], str | None]:
+    """List a page of clicks for a given link, newest first. See `linker.crud.list_clicks`."""
+    return await _run_sync(session, crud.list_clicks, link, limit, cursor)
+
+
+async def count_visitors(session: AsyncSession, link: Link) -> float:
+    """Estimate the number of distinct ip addresses that clicked a link. See `linker.crud.count_visitors`."""
+    return await _run_sync(session, crud.count_visitors, link)
+
+
+async def click_histogram(
+    session: AsyncSession,
+    link: Link,
+    bucket: HistogramBucket,
+    start: datetime,
+    end: datetime,
+) -> list[tuple[datetime, int]]:
+    """Count the clicks of a link in hourly or daily buckets. See `linker.crud.click_histogram`."""
+    return await _run_sync(session, crud.click_histogram, link, bucket, start, end)
@@ -0,0 +1,275 @@
+"""
+Main application with async request handlers.
+
+The link endpoints run on the event loop over an async database driver. The remaining endpoints are served by the
+synchronous handlers of `linker.main`, so both applications expose the same API.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+from typing import Annotated
+
+import validators
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse, Response
+from fastapi.routing import APIRoute
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from linker.async_crud import (
+    click_histogram,
+    count_visitors,
+    create_link,
+    delete_link,
+    get_link,
+    get_link_version,
+    list_clicks,
+    list_links,
+    update_link,
+    update_link_clicks,
+)
+from linker.cache import CachedLink, redirect_cache
+from linker.clicks import click_buffer
+from linker.conditional import is_conditional, not_modified, page_version, validator_headers
+from linker.constants import DEBUG_DEFAULT, DEBUG_KEY, HISTOGRAM_RANGE_DEFAULT, NEXT_CURSOR_HEADER, PAGE_SIZE_DEFAULT
+from linker.crud import (
+    InvalidCursorError,
+    InvalidRangeError,
+    InvalidSlugError,
+    NoAvailableSlugsError,
+    SlugAlreadyInUseError,
+    SlugNotInUseError,
+    TargetUrlAlreadyExistsError,
+)
+from linker.database import (
+    dispose_async_engine,
+    get_async_engine,
+    get_async_read_session,
+    get_async_session,
+    pin_reads_to_primary,
+)
+from linker.encoding import encode_clicks, encode_links, json_response
+from linker.environment import get_env_bool
+from linker.main import PageLimit, verify_token
+from linker.main import app as sync_app
+from linker.main import lifespan as sync_lifespan
+from linker.metrics import MetricsMiddleware
+from linker.models import (
+    ClickHistogramRead,
+    ClickRead,
+    HistogramBucket,
+    LinkCreate,
+    LinkRead,
+    LinkUpdate,
+    VisitorsRead,
+)
+from linker.queries import QueryCountMiddleware
+from linker.ratelimit import limit_redirect_rate
+from linker.sketches import relative_standard_error
+from linker.startup import startup_timings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """Run the startup and shutdown of the synchronous application, and manage the async database engine."""
+    async with sync_lifespan(app):
+        with startup_timings.phase("async_engine"):
+            get_async_engine()
+        yield
+        await dispose_async_engine()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(QueryCountMiddleware, debug=get_env_bool(DEBUG_KEY, default=DEBUG_DEFAULT))
+app.add_middleware(MetricsMiddleware)
+
+
+@app.post("/api/v1/links", dependencies=[Depends(verify_token), Depends(pin_reads_to_primary)])
+async def create_link_endpoint(
+    link_create: LinkCreate,
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> LinkRead:
+    """Create a link with a slug that points to the target url."""
+    if not validators.url(link_create.target_url):
+        raise HTTPException(status_code=422, detail=f"The provided url '{link_create.target_url}' is not valid")
+    try:
+        link = await create_link(session, link_create.slug, link_create.target_url)
+    except (TargetUrlAlreadyExistsError, NoAvailableSlugsError, InvalidSlugError, SlugAlreadyInUseError) as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    return LinkRead.from_link(link)
+
+
+@app.get("/api/v1/links", dependencies=[Depends(verify_token)], response_model=list[LinkRead])
+async def list_links_endpoint(
+    session: Annotated[AsyncSession, Depends(get_async_read_session)],
+    request: Request,
+    limit: PageLimit = PAGE_SIZE_DEFAULT,
+    cursor: str | None = None,
+) -> Response:
+    """List a page of links that have a target url. The cursor of the next page is sent in a response header.
+
+    The page is validated by the ids and versions of its links, see `linker.main.list_links_endpoint`.
+    """
+    try:
+        rows, next_cursor = await list_links(session, limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    version = page_version((row_id, row_version) for *_, row_id, row_version in rows)
+    if (not_modified_response := not_modified(request, version, None)) is not None:
+        return not_modified_response
+    headers = validator_headers(version, None)
+    if next_cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return json_response(encode_links(rows), headers)
+
+
+@app.get("/api/v1/links/{slug}", dependencies=[Depends(verify_token)], response_model=LinkRead)
+async def get_link_endpoint(
+    slug: str,
+    session: Annotated[AsyncSession, Depends(get_async_read_session)],
+    request: Request,
+    response: Response,
+) -> LinkRead | Response:
+    """Get a link by its slug. Conditional requests are answered from the version of the link."""
+    if is_conditional(request) and (link_version := await get_link_version(session, slug)) is not None:
+        not_modified_response = not_modified(request, *link_version)
+        if not_modified_response is not None:
+            return not_modified_response
+    try:
+        link = await get_link(session, slug)
+    except (InvalidSlugError, SlugNotInUseError) as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    response.headers.update(validator_headers(link.version, link.updated_at))
+    return LinkRead.from_link(link)
+
+
+@app.patch("/api/v1/links/{slug}", dependencies=[Depends(verify_token), Depends(pin_reads_to_primary)])
+async def update_link_endpoint(
+    slug: str,
+    link_update: LinkUpdate,
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> LinkRead:
+    """Update the target url of a link."""
+    if not validators.url(link_update.target_url):
+        raise HTTPException(status_code=422, detail=f"The provided url '{link_update.target_url}' is not valid")
+    try:
+        link = await get_link(session, slug)
+    except (InvalidSlugError, SlugNotInUseError) as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    try:
+        link = await update_link(session, link, link_update.target_url)
+    except TargetUrlAlreadyExistsError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    return LinkRead.from_link(link)
+
+
+@app.delete("/api/v1/links/{slug}", dependencies=[Depends(verify_token), Depends(pin_reads_to_primary)])
+async def delete_link_endpoint(slug: str, session: Annotated[AsyncSession, Depends(get_async_session)]) -> Response:
+    """Delete a link by setting its target url to none and resetting clicks."""
+    try:
+        link = await get_link(session, slug)
+    except (InvalidSlugError, SlugNotInUseError) as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    click_buffer.discard(link.id)  # type: ignore[arg-type]
+    await delete_link(session, link)
+    return Response(status_code=204)
+
+
+@app.get("/{slug}", dependencies=[Depends(limit_redirect_rate)])
+async def forward_to_target_url(
+    slug: str,
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+    request: Request,
+) -> RedirectResponse:
+    """Redirect to the target url of the link with the given slug.
+
+    Links that are not cached are read from the primary rather than the replica, as they are cached for later
+    redirects, and a lagging replica could still return a link that was updated or deleted since.
+    """
+    cached_link = redirect_cache.get(slug)
+    if cached_link is None:
+        generation = redirect_cache.generation()
+        try:
+            link = await get_link(session, slug)
+        except (InvalidSlugError, SlugNotInUseError) as e:
+            raise HTTPException(status_code=404, detail=str(e)) from e
+        cached_link = CachedLink(link_id=link.id, target_url=link.target_url)  # type: ignore[arg-type]
+        redirect_cache.set(slug, cached_link, generation)
+    ip_address = request.client.host if request.client is not None else "unknown"
+    if not click_buffer.add(cached_link.link_id, ip_address):
+        await update_link_clicks(session, cached_link.link_id, ip_address)
+    return RedirectResponse(url=cached_link.target_url, status_code=307)
+
+
+@app.get("/api/v1/links/{slug}/clicks", dependencies=[Depends(verify_token)], response_model=list[ClickRead])
+async def list_clicks_endpoint(
+    slug: str,
+    session: Annotated[AsyncSession, Depends(get_async_read_session)],
+    limit: PageLimit = PAGE_SIZE_DEFAULT,
+    cursor: str | None = None,
+) -> Response:
+    """List a page of clicks for a given link. The cursor of the next page is sent in a response header."""
+    try:
+        link = await get_link(session, slug)
+    except (InvalidSlugError, SlugNotInUseError) as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    try:
+        rows, next_cursor = await list_clicks(session, link, limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor is not None else {}
+    return json_response(encode_clicks(rows), headers)
+
+
+@app.get("/api/v1/links/{slug}/visitors", dependencies=[Depends(verify_token)])
+async def count_visitors_endpoint(
+    slug: str,
+    session: Annotated[AsyncSession, Depends(get_async_read_session)],
+) -> VisitorsRead:
+    """Estimate the number of unique visitors of a link, by the ip addresses of its clicks.
+
+    The estimate comes from a fixed size sketch, so it is served in constant time. Its relative standard error is
+    returned with it, and about 95% of the estimates are within two standard errors of the exact count.
+    """
+    try:
+        link = await get_link(session, slug)
+    except (InvalidSlugError, SlugNotInUseError) as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    visitors = await count_visitors(session, link)
+    return VisitorsRead(visitors=round(visitors), relative_standard_error=relative_standard_error())
+
+
+@app.get("/api/v1/links/{slug}/clicks/histogram", dependencies=[Depends(verify_token)])
+async def click_histogram_endpoint(
+    slug: str,
+    session: Annotated[AsyncSession, Depends(get_async_read_session)],
+    bucket: HistogramBucket = HistogramBucket.HOUR,
+    start: Annotated[datetime | None, Query(alias="from")] = None,
+    end: Annotated[datetime | None, Query(alias="to")] = None,
+) -> list[ClickHistogramRead]:
+    """Count the clicks of a link per hour or day. The range defaults to the last seven days."""
+    try:
+        link = await get_link(session, slug)
+    except (InvalidSlugError, SlugNotInUseError) as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    end = end if end is not None else datetime.now(tz=UTC)
+    start = start if start is not None else end - HISTOGRAM_RANGE_DEFAULT
+    try:
+        histogram = await click_histogram(session, link, bucket, start, end)
+    except InvalidRangeError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    return [ClickHistogramRead(bucket_start=bucket_start, count=count) for bucket_start, count in histogram]
+
+
+# Endpoints without an async handler are served by the synchronous handler of the same operation. They are matched
+# first, so the redirect route does not shadow single segment paths like "/metrics".
+async_operations = {
+    (route.path, method) for route in app.routes if isinstance(route, APIRoute) for method in route.methods
+}
+app.router.routes[:0] = (
+    route
+    for route in sync_app.routes
+    if isinstance(route, APIRoute) and not {(route.path, method) for method in route.methods} & async_operations
+)
@@ -0,0 +1,149 @@
+"""
+In-process cache of slug to target url mappings used by the redirect endpoint.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from linker.constants import (
+    REDIRECT_CACHE_SIZE_DEFAULT,
+    REDIRECT_CACHE_SIZE_KEY,
+    REDIRECT_CACHE_TTL_DEFAULT,
+    REDIRECT_CACHE_TTL_KEY,
+)
+from linker.environment import get_env_int
+from linker.models import CacheStatisticsRead
+
+
+class CachedLink(NamedTuple):
+    """Cached part of a link that is needed to redirect and record a click."""
+
+    link_id: int
+    target_url: str
+
+
+class RedirectCache:
+    """Bounded least recently used cache of links with a time to live.
+
+    Every invalidation advances a generation counter. A link read before an invalidation is not cached, so a lookup
+    that races with an update or a delete cannot put the old target url back into the cache.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            max_size (int): Maximum number of cached links. Caching is disabled if zero.
+            ttl_seconds (float): Number of seconds after which a cached link expires.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, CachedLink]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, slug: str) -> CachedLink | None:
+        """Get the cached link for a slug, or none if it is not cached or has expired."""
+        with self._lock:
+            entry = self._entries.get(slug)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, cached_link = entry
+            if expires_at <= time.monotonic():
+                del self._entries[slug]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(slug)
+            self.hits += 1
+            return cached_link
+
+    def generation(self) -> int:
+        """Get the number of invalidations so far, to be passed to `set` with a link read afterwards."""
+        with self._lock:
+            return self._generation
+
+    def set(self, slug: str, cached_link: CachedLink, generation: int | None = None) -> None:
+        """Cache the link of a slug, evicting the least recently used link if the cache is full.
+
+        Nothing is cached while caching is disabled.
+
+        Args:
+            slug (str): Slug of the link.
+            cached_link (CachedLink): Link to cache.
+            generation (int | None): Generation of the cache before the link was read. The link is not cached if an
+                invalidation happened since.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if not self._enabled or (generation is not None and generation != self._generation):
+                return
+            self._entries[slug] = (time.monotonic() + self.ttl_seconds, cached_link)
+            self._entries.move_to_end(slug)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, slug: str) -> None:
+        """Remove the cached link of a slug."""
+        with self._lock:
+            self._entries.pop(slug, None)
+            self._generation += 1
+
+    def invalidate_all(self) -> None:
+        """Remove all cached links, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def disable(self) -> None:
+        """Remove all cached links and stop caching links until `enable` is called, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._enabled = False
+
+    def enable(self) -> None:
+        """Remove all cached links and cache links again."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._enabled = True
+
+    def clear(self) -> None:
+        """Remove all cached links and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def statistics(self) -> CacheStatisticsRead:
+        """Get the size and the counters of the cache."""
+        with self._lock:
+            return CacheStatisticsRead(
+                size=len(self._entries),
+                max_size=self.max_size,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                expirations=self.expirations,
+            )
+
+
+redirect_cache = RedirectCache(
+    max_size=get_env_int(REDIRECT_CACHE_SIZE_KEY, REDIRECT_CACHE_SIZE_DEFAULT),
+    ttl_seconds=get_env_int(REDIRECT_CACHE_TTL_KEY, REDIRECT_CACHE_TTL_DEFAULT),
+)
@@ -0,0 +1,138 @@
+"""
+Write-behind buffer that records clicks in batches off the redirect path.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import asyncio
+import contextlib
+import logging
+import threading
+
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from linker.constants import (
+    CLICK_BUFFER_SIZE_DEFAULT,
+    CLICK_BUFFER_SIZE_KEY,
+    CLICK_FLUSH_INTERVAL_MS_DEFAULT,
+    CLICK_FLUSH_INTERVAL_MS_KEY,
+    CLICK_FLUSH_SIZE_DEFAULT,
+    CLICK_FLUSH_SIZE_KEY,
+)
+from linker.crud import record_clicks
+from linker.environment import get_env_int
+from linker.models import Click
+
+logger = logging.getLogger(__name__)
+
+
+class ClickBuffer:
+    """In-memory buffer of clicks that a background task flushes to the database in batches."""
+
+    def __init__(self, max_size: int, flush_size: int, flush_interval: float) -> None:
+        """Initialize an empty, stopped buffer.
+
+        Args:
+            max_size (int): Maximum number of buffered clicks. Clicks are rejected when the buffer is full.
+            flush_size (int): Number of buffered clicks that triggers a flush.
+            flush_interval (float): Maximum number of seconds between flushes.
+        """
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._clicks: list[Click] = []
+        self._lock = threading.Lock()
+        self._engine: Engine | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._flush_requested: asyncio.Event | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    def add(self, link_id: int, ip_address: str) -> bool:
+        """Buffer a click for a link.
+
+        Args:
+            link_id (int): Id of the link that was clicked.
+            ip_address (str): The ip address of the client.
+
+        Returns:
+            bool: False if the buffer is not running or is full, in which case the caller must record the click.
+        """
+        loop, flush_requested = self._loop, self._flush_requested
+        if loop is None or flush_requested is None:
+            return False
+        with self._lock:
+            if len(self._clicks) >= self.max_size:
+                return False
+            self._clicks.append(Click(ip_address=ip_address, link_id=link_id))
+            should_flush = len(self._clicks) == self.flush_size
+        if should_flush:
+            loop.call_soon_threadsafe(flush_requested.set)
+        return True
+
+    def discard(self, *link_ids: int) -> None:
+        """Drop the buffered clicks of links, so they are not recorded after the links are deleted."""
+        discarded_ids = set(link_ids)
+        with self._lock:
+            self._clicks = [click for click in self._clicks if click.link_id not in discarded_ids]
+
+    def drain(self) -> list[Click]:
+        """Remove and return all buffered clicks."""
+        with self._lock:
+            clicks, self._clicks = self._clicks, []
+        return clicks
+
+    def __len__(self) -> int:
+        """Number of buffered clicks."""
+        return len(self._clicks)
+
+    def flush(self) -> int:
+        """Write all buffered clicks to the database.
+
+        Returns:
+            int: Number of clicks written.
+        """
+        clicks = self.drain()
+        if not clicks or self._engine is None:
+            return 0
+        try:
+            with Session(self._engine) as session:
+                record_clicks(session, clicks)
+        except Exception:
+            logger.exception("Failed to flush %d clicks, requeueing them", len(clicks))
+            with self._lock:
+                self._clicks[:0] = clicks[: max(self.max_size - len(self._clicks), 0)]
+            return 0
+        return len(clicks)
+
+    def start(self, engine: Engine) -> None:
+        """Start the background flush task on the running event loop."""
+        self._engine = engine
+        self._loop = asyncio.get_running_loop()
+        self._flush_requested = asyncio.Event()
+        self._task = asyncio.create_task(self._run(self._flush_requested))
+
+    async def stop(self) -> None:
+        """Stop accepting clicks, wait for the background flush task and drain the buffer into the database."""
+        if self._task is None or self._flush_requested is None:
+            return
+        task, self._task = self._task, None
+        self._loop = None
+        self._flush_requested.set()
+        await task
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self, flush_requested: asyncio.Event) -> None:
+        """Flush whenever the buffer reaches the flush size or the flush interval elapses, until stopped."""
+        while self._loop is not None:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(flush_requested.wait(), timeout=self.flush_interval)
+            flush_requested.clear()
+            await asyncio.to_thread(self.flush)
+
+
+click_buffer = ClickBuffer(
+    max_size=get_env_int(CLICK_BUFFER_SIZE_KEY, CLICK_BUFFER_SIZE_DEFAULT),
+    flush_size=get_env_int(CLICK_FLUSH_SIZE_KEY, CLICK_FLUSH_SIZE_DEFAULT),
+    flush_interval=get_env_int(CLICK_FLUSH_INTERVAL_MS_KEY, CLICK_FLUSH_INTERVAL_MS_DEFAULT) / 1000,
+)
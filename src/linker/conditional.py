@@ -0,0 +1,87 @@
+"""
+Validators of conditional requests, so clients can revalidate a response instead of downloading it again.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import hashlib
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def page_version(row_versions: Iterable[tuple[int, int]]) -> str:
+    """Get the version of a page of rows from the ids and versions of its rows.
+
+    The version changes whenever a row of the page changes, or a row joins or leaves the page.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for row_id, version in row_versions:
+        digest.update(f"{row_id}:{version},".encode())
+    return digest.hexdigest()
+
+
+def validator_headers(version: int | str, modified_at: datetime | None) -> dict[str, str]:
+    """Get the `ETag` and `Last-Modified` headers of a representation.
+
+    Args:
+        version (int | str): Version of the representation, which changes whenever the representation does.
+        modified_at (datetime | None): Time of the last change. Naive datetimes are taken to be in UTC.
+
+    Returns:
+        dict[str, str]: The headers. `Last-Modified` is left out if the time of the last change is not known.
+    """
+    headers = {"ETag": f'"{version}"'}
+    if modified_at is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(modified_at), usegmt=True)
+    return headers
+
+
+def is_conditional(request: Request) -> bool:
+    """Whether the request carries a validator of a representation the client has."""
+    return "If-None-Match" in request.headers or "If-Modified-Since" in request.headers
+
+
+def not_modified(request: Request, version: int | str, modified_at: datetime | None) -> Response | None:
+    """Answer a conditional request with `304 Not Modified` if the representation of the client is current.
+
+    `If-Modified-Since` is only evaluated without `If-None-Match`, as the entity tag is the more precise validator.
+
+    Args:
+        request (Request): The request.
+        version (int | str): Current version of the representation.
+        modified_at (datetime | None): Time of the last change of the representation.
+
+    Returns:
+        Response | None: The `304 Not Modified` response, or none if the representation has to be sent.
+    """
+    headers = validator_headers(version, modified_at)
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        entity_tags = {entity_tag.strip().removeprefix("W/") for entity_tag in if_none_match.split(",")}
+        current = "*" in entity_tags or headers["ETag"] in entity_tags
+    else:
+        current = _is_unmodified_since(request.headers.get("If-Modified-Since"), modified_at)
+    return Response(status_code=304, headers=headers) if current else None
+
+
+def _is_unmodified_since(if_modified_since: str | None, modified_at: datetime | None) -> bool:
+    """Whether the representation has not changed since the date of an `If-Modified-Since` header."""
+    if if_modified_since is None or modified_at is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    # Header dates have a resolution of one second.
+    return _as_utc(modified_at).replace(microsecond=0) <= since
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Attach UTC to naive datetimes, the way timestamps are stored."""
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value
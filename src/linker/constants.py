@@ -4,6 +4,8 @@ Constants used in the application.
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
+from datetime import timedelta
+
 # General
 LINKER_TOKEN_KEY = "LINKER_TOKEN"  # noqa: S105
 
@@ -13,3 +15,129 @@ POSTGRES_PORT_KEY = "POSTGRES_PORT"
 POSTGRES_DATABASE_KEY = "POSTGRES_DATABASE"
 POSTGRES_USERNAME_KEY = "POSTGRES_USERNAME"
 POSTGRES_PASSWORD_KEY = "POSTGRES_PASSWORD"  # noqa: S105
+POSTGRES_POOL_SIZE_KEY = "POSTGRES_POOL_SIZE"
+POSTGRES_POOL_MAX_OVERFLOW_KEY = "POSTGRES_POOL_MAX_OVERFLOW"
+POSTGRES_POOL_RECYCLE_KEY = "POSTGRES_POOL_RECYCLE"
+POSTGRES_POOL_PRE_PING_KEY = "POSTGRES_POOL_PRE_PING"
+POSTGRES_REPLICA_HOST_KEY = "POSTGRES_REPLICA_HOST"
+POSTGRES_REPLICA_PORT_KEY = "POSTGRES_REPLICA_PORT"
+POSTGRES_REPLICA_MAX_LAG_KEY = "POSTGRES_REPLICA_MAX_LAG"
+
+POSTGRES_POOL_SIZE_DEFAULT = 5
+POSTGRES_POOL_MAX_OVERFLOW_DEFAULT = 10
+POSTGRES_POOL_RECYCLE_DEFAULT = 1800
+POSTGRES_POOL_PRE_PING_DEFAULT = True
+POSTGRES_REPLICA_MAX_LAG_DEFAULT = 5
+POSTGRES_REPLICA_RETRY_INTERVAL = 30
+POSTGRES_REPLICA_MAX_CLIENTS = 10_000
+
+# SQLite
+DATABASE_BACKEND_KEY = "LINKER_DATABASE_BACKEND"
+SQLITE_PATH_KEY = "LINKER_SQLITE_PATH"
+SQLITE_READER_POOL_SIZE_KEY = "LINKER_SQLITE_READER_POOL_SIZE"
+
+DATABASE_BACKENDS = ("postgresql", "sqlite")
+DATABASE_BACKEND_DEFAULT = "postgresql"
+SQLITE_PATH_DEFAULT = "linker.db"
+SQLITE_READER_POOL_SIZE_DEFAULT = 4
+SQLITE_BUSY_TIMEOUT = 5
+# Write-ahead logging lets readers run next to the writer, and synchronous=NORMAL only syncs the log at checkpoints.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "temp_store": "MEMORY",
+    "cache_size": "-65536",
+    "mmap_size": "268435456",
+}
+
+# Redirect cache
+REDIRECT_CACHE_SIZE_KEY = "LINKER_REDIRECT_CACHE_SIZE"
+REDIRECT_CACHE_TTL_KEY = "LINKER_REDIRECT_CACHE_TTL"
+
+REDIRECT_CACHE_SIZE_DEFAULT = 10_000
+REDIRECT_CACHE_TTL_DEFAULT = 300
+
+# Rate limiting
+RATE_LIMIT_IP_PER_MINUTE_KEY = "LINKER_RATE_LIMIT_IP_PER_MINUTE"
+RATE_LIMIT_IP_BURST_KEY = "LINKER_RATE_LIMIT_IP_BURST"
+RATE_LIMIT_SLUG_PER_MINUTE_KEY = "LINKER_RATE_LIMIT_SLUG_PER_MINUTE"
+RATE_LIMIT_SLUG_BURST_KEY = "LINKER_RATE_LIMIT_SLUG_BURST"
+RATE_LIMIT_SIZE_KEY = "LINKER_RATE_LIMIT_SIZE"
+
+RATE_LIMIT_IP_PER_MINUTE_DEFAULT = 0
+RATE_LIMIT_IP_BURST_DEFAULT = 20
+RATE_LIMIT_SLUG_PER_MINUTE_DEFAULT = 0
+RATE_LIMIT_SLUG_BURST_DEFAULT = 100
+RATE_LIMIT_SIZE_DEFAULT = 100_000
+
+# Cache invalidation
+INVALIDATION_CHANNEL = "linker_invalidation"
+INVALIDATION_RETRY_INTERVAL = 5
+INVALIDATION_HEARTBEAT_INTERVAL = 30
+INVALIDATION_KEEPALIVE_IDLE = 30
+INVALIDATION_KEEPALIVE_INTERVAL = 10
+INVALIDATION_KEEPALIVE_COUNT = 3
+
+# Click buffer
+CLICK_WRITE_BEHIND_KEY = "LINKER_CLICK_WRITE_BEHIND"
+CLICK_BUFFER_SIZE_KEY = "LINKER_CLICK_BUFFER_SIZE"
+CLICK_FLUSH_SIZE_KEY = "LINKER_CLICK_FLUSH_SIZE"
+CLICK_FLUSH_INTERVAL_MS_KEY = "LINKER_CLICK_FLUSH_INTERVAL_MS"
+
+CLICK_WRITE_BEHIND_DEFAULT = False
+CLICK_BUFFER_SIZE_DEFAULT = 100_000
+CLICK_FLUSH_SIZE_DEFAULT = 1_000
+CLICK_FLUSH_INTERVAL_MS_DEFAULT = 1_000
+
+# Pagination
+PAGE_SIZE_DEFAULT = 100
+PAGE_SIZE_MAX = 1_000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Export
+EXPORT_BATCH_SIZE = 1_000
+
+# Histogram
+HISTOGRAM_RANGE_DEFAULT = timedelta(days=7)
+
+# Async mode
+ASYNC_MODE_KEY = "LINKER_ASYNC"
+ASYNC_MODE_DEFAULT = False
+
+# Batch operations
+LINK_BATCH_SIZE_MAX = 10_000
+CLICK_PURGE_CHUNK_SIZE = 10_000
+
+# Slugs
+SLUG_SUFFIX_COUNT = 10_000
+SLUG_PERMUTATION_SEED = 42
+SLUG_PERMUTATION_ROUNDS = 4
+
+# Unique visitors
+# Sketches keep 2**precision one byte registers, for a relative standard error of 1.04 / sqrt(2**precision).
+VISITOR_SKETCH_PRECISION = 10
+
+# Schema
+# Bump whenever the models or `migrate_db` change, so existing databases are brought up to date at the next startup.
+SCHEMA_VERSION = 6
+# Key of the PostgreSQL advisory lock held while the schema is brought up to date.
+SCHEMA_LOCK_KEY = 0x6C696E6B
+
+# Click retention
+CLICK_RETENTION_DAYS_KEY = "LINKER_CLICK_RETENTION_DAYS"
+CLICK_RETENTION_ARCHIVE_KEY = "LINKER_CLICK_RETENTION_ARCHIVE"
+
+CLICK_RETENTION_DAYS_DEFAULT = 0
+CLICK_RETENTION_ARCHIVE_DEFAULT = False
+CLICK_MAINTENANCE_INTERVAL = 3_600
+CLICK_PARTITIONS_AHEAD = 3
+
+# Metrics
+METRICS_DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Debug
+DEBUG_KEY = "LINKER_DEBUG"
+DEBUG_DEFAULT = False
+QUERY_COUNT_HEADER = "X-Query-Count"
+QUERY_SECONDS_HEADER = "X-Query-Seconds"
@@ -4,11 +4,39 @@ Create, Read, Update, Delete operations for Link model.
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
-from sqlmodel import Session, select
-
-from linker.models import Click, Link
-
-
+import base64
+import binascii
+import json
+from collections import Counter, defaultdict
+from collections.abc import Callable, Collection, Iterator
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, and_, delete, func, insert, or_, select, update
+
+from linker.cache import redirect_cache
+from linker.constants import CLICK_PURGE_CHUNK_SIZE, EXPORT_BATCH_SIZE, PAGE_SIZE_DEFAULT
+from linker.dialects import dialect_insert, truncate_to_hour
+from linker.invalidation import publish_invalidation
+from linker.metrics import instrument, metrics
+from linker.models import (
+    Click,
+    ClickRollup,
+    ClickRow,
+    HistogramBucket,
+    Link,
+    LinkCreate,
+    LinkRow,
+    SlugSequence,
+    VisitorSketch,
+)
+from linker.sketches import HyperLogLog
+from linker.slugs import slug_space
+from linker.urls import hash_target_url
+
+
+@instrument
 def create_link(session: Session, slug: str | None, target_url: str) -> Link:
     """Create a link with a slug that points to the target url.
 
@@ -26,48 +54,275 @@ def create_link(session: Session, slug: str | None, target_url: str) -> Link:
         InvalidSlugError: If the slug is not valid.
         SlugAlreadyInUseError: If the slug is already in use.
     """
-    statement = select(Link).where(Link.target_url == target_url).limit(1)
+    target_url_hash = hash_target_url(target_url)
+    statement = select(Link).where(Link.target_url_hash == target_url_hash).limit(1)
     existing_link = session.exec(statement).first()
     if existing_link is not None:
         msg = f"Link with target url '{target_url}' already exists under slug '{existing_link.slug}'"
         raise TargetUrlAlreadyExistsError(msg)
 
     if slug is None:
-        statement = select(Link).where(Link.target_url.is_(None)).order_by(Link.id.asc()).limit(1)  # type: ignore[union-attr]
-        link = session.exec(statement).first()
-        if link is None:
-            msg = "No unused slugs are available in the database"
-            raise NoAvailableSlugsError(msg)
-    else:
-        statement = select(Link).where(Link.slug == slug).limit(1)
-        link = session.exec(statement).first()
+        link = _claim_free_link(session, target_url, target_url_hash)
         if link is None:
+            link = _create_generated_link(session, target_url, target_url_hash)
+        return link
+
+    statement = select(Link).where(Link.slug == slug).limit(1)
+    link = session.exec(statement).first()
+    if link is None:
+        if slug not in slug_space:
             msg = f"Slug '{slug}' is not valid"
             raise InvalidSlugError(msg)
-        if link.target_url is not None:
-            msg = f"Slug '{slug}' is already in use for target url '{link.target_url}'"
-            raise SlugAlreadyInUseError(msg)
+        link = Link(slug=slug)
+    elif link.target_url is not None:
+        msg = f"Slug '{slug}' is already in use for target url '{link.target_url}'"
+        raise SlugAlreadyInUseError(msg)
+    else:
+        _reset_clicks(session, [link.id])  # type: ignore[list-item]
+        link.click_count = 0
 
     link.target_url = target_url
+    link.target_url_hash = target_url_hash
     session.add(link)
+    _record_changes([link])
     session.commit()
     session.refresh(link)
     return link
 
 
-def list_links(session: Session) -> list[Link]:
-    """List all links that have a target url.
+def _reset_clicks(session: Session, link_ids: list[int]) -> None:
+    """Delete the clicks, hourly rollups and visitor sketches of free links that are about to be reused.
+
+    Freed links should have none of them left, but a reused link must never show the clicks of its previous owner.
+    """
+    session.execute(delete(Click).where(Click.link_id.in_(link_ids)))  # type: ignore[attr-defined]
+    session.execute(delete(ClickRollup).where(ClickRollup.link_id.in_(link_ids)))  # type: ignore[attr-defined]
+    session.execute(delete(VisitorSketch).where(VisitorSketch.link_id.in_(link_ids)))  # type: ignore[attr-defined]
+
+
+def _claim_free_link(session: Session, target_url: str, target_url_hash: str) -> Link | None:
+    """Point a free slug to the target url, without handing the same slug to concurrent callers.
+
+    The candidate row is locked with `FOR UPDATE SKIP LOCKED`, so concurrent callers move on to the next free slug
+    instead of waiting for each other. The update only succeeds if the slug is still free, which keeps the claim safe
+    on databases without row locks, where the next candidate is tried after a lost race. Returns none if there are no
+    free slugs.
+    """
+    while True:
+        statement = (
+            select(Link.id)
+            .where(Link.target_url.is_(None))  # type: ignore[union-attr]
+            .order_by(Link.id.asc())  # type: ignore[union-attr]
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        link_id = session.exec(statement).first()
+        if link_id is None:
+            return None
+        result = session.execute(
+            update(Link)
+            .where(Link.id == link_id, Link.target_url.is_(None))  # type: ignore[arg-type,union-attr]
+            .values(
+                target_url=target_url,
+                target_url_hash=target_url_hash,
+                click_count=0,
+                version=Link.version + 1,
+                updated_at=datetime.now(tz=UTC),
+            ),
+        )
+        if result.rowcount == 1:  # type: ignore[attr-defined]
+            _reset_clicks(session, [link_id])
+            session.commit()
+            link = session.get_one(Link, link_id)
+            session.refresh(link)
+            return link
+        session.rollback()
+
+
+def _create_generated_link(session: Session, target_url: str, target_url_hash: str) -> Link:
+    """Create a link under a newly generated slug.
+
+    The slug index is allocated in its own short transaction, so concurrent callers only hold the counter row briefly.
+    A slug taken concurrently by a link created with an explicit slug is skipped for the next one.
+    """
+    while True:
+        slugs = _allocate_slugs(session, 1)
+        session.commit()
+        if not slugs:
+            msg = "No unused slugs are available in the database"
+            raise NoAvailableSlugsError(msg)
+        link = Link(slug=slugs[0], target_url=target_url, target_url_hash=target_url_hash)
+        session.add(link)
+        try:
+            _record_changes([link])
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            statement = select(Link).where(Link.target_url_hash == target_url_hash).limit(1)
+            existing_link = session.exec(statement).first()
+            if existing_link is not None:
+                msg = f"Link with target url '{target_url}' already exists under slug '{existing_link.slug}'"
+                raise TargetUrlAlreadyExistsError(msg) from None
+            continue
+        session.refresh(link)
+        return link
+
+
+def _allocate_slugs(session: Session, count: int, excluded: Collection[str] = ()) -> list[str]:
+    """Generate slugs that have no row yet, by advancing the slug sequence in the current transaction.
+
+    Slugs that already have a row, like the slugs seeded by earlier versions, are skipped, as are the excluded slugs
+    that are about to get a row. Fewer slugs are returned if the slug space is exhausted.
+    """
+    slugs: list[str] = []
+    while len(slugs) < count:
+        needed = count - len(slugs)
+        statement = (
+            update(SlugSequence).values(value=SlugSequence.value + needed).returning(SlugSequence.value)  # type: ignore[call-overload]
+        )
+        end = session.execute(statement).scalar_one_or_none()
+        if end is None:
+            session.add(SlugSequence(value=needed))
+            session.flush()
+            end = needed
+        start = end - needed
+        if start >= slug_space.size:
+            break
+        candidates = [slug_space.slug(index) for index in range(start, min(end, slug_space.size))]
+        existing_slugs = set(session.exec(select(Link.slug).where(Link.slug.in_(candidates))).all())  # type: ignore[attr-defined]
+        slugs.extend(
+            candidate for candidate in candidates if candidate not in existing_slugs and candidate not in excluded
+        )
+    return slugs
+
+
+def _record_changes(links: list[Link]) -> None:
+    """Advance the versions of changed links, which validate conditional reads of the links and of their pages.
+
+    Links changed through update statements advance their versions in the statement.
+    """
+    changed_at = datetime.now(tz=UTC)
+    for link in links:
+        link.version += 1
+        link.updated_at = changed_at
+
+
+@instrument
+def create_links(session: Session, links: list[LinkCreate]) -> "list[Link | LinkError]":
+    """Create many links in a single transaction.
+
+    Target urls are checked for duplicates, requested slugs are looked up and free slugs are reserved with one query
+    each, regardless of the number of links. Missing free slugs are generated by advancing the slug sequence, which
+    stays locked until the batch is committed.
 
     Args:
         session (Session): Database session.
+        links (list[LinkCreate]): Links to create.
 
     Returns:
-        list[Link]: List of links.
+        list[Link | LinkError]: The created link, or the error that prevented its creation, for each requested link.
     """
-    statement = select(Link).where(Link.target_url.is_not(None)).order_by(Link.id.asc())  # type: ignore[union-attr]
-    return list(session.exec(statement).all())
+    target_url_hashes = [hash_target_url(link_create.target_url) for link_create in links]
+    existing_statement = select(Link.target_url_hash, Link.slug).where(
+        Link.target_url_hash.in_(target_url_hashes),  # type: ignore[union-attr]
+    )
+    existing_slugs: dict[str, str] = dict(session.exec(existing_statement).all())  # type: ignore[arg-type]
+
+    requested_slugs = {link_create.slug for link_create in links if link_create.slug is not None}
+    statement = select(Link).where(Link.slug.in_(requested_slugs))  # type: ignore[attr-defined]
+    requested_links = {link.slug: link for link in session.exec(statement).all()}
+
+    free_slug_count = sum(link_create.slug is None for link_create in links)
+    statement = (
+        select(Link)
+        .where(Link.target_url.is_(None), Link.slug.not_in(requested_slugs))  # type: ignore[union-attr,attr-defined]
+        .order_by(Link.id.asc())  # type: ignore[union-attr]
+        .limit(free_slug_count)
+        .with_for_update(skip_locked=True)
+    )
+    free_links = list(session.exec(statement).all())
+    if len(free_links) < free_slug_count:
+        free_links.extend(
+            Link(slug=slug) for slug in _allocate_slugs(session, free_slug_count - len(free_links), requested_slugs)
+        )
+    free_link_iterator = iter(free_links)
+
+    results: list[Link | LinkError] = []
+    for link_create, target_url_hash in zip(links, target_url_hashes, strict=True):
+        if (existing_slug := existing_slugs.get(target_url_hash)) is not None:
+            msg = f"Link with target url '{link_create.target_url}' already exists under slug '{existing_slug}'"
+            results.append(TargetUrlAlreadyExistsError(msg))
+            continue
+        if link_create.slug is None:
+            link = next(free_link_iterator, None)
+            if link is None:
+                results.append(NoAvailableSlugsError("No unused slugs are available in the database"))
+                continue
+        else:
+            link = requested_links.get(link_create.slug)
+            if link is None:
+                if link_create.slug not in slug_space:
+                    results.append(InvalidSlugError(f"Slug '{link_create.slug}' is not valid"))
+                    continue
+                link = requested_links[link_create.slug] = Link(slug=link_create.slug)
+            elif link.target_url is not None:
+                msg = f"Slug '{link_create.slug}' is already in use for target url '{link.target_url}'"
+                results.append(SlugAlreadyInUseError(msg))
+                continue
+        link.target_url = link_create.target_url
+        link.target_url_hash = target_url_hash
+        link.click_count = 0
+        existing_slugs[target_url_hash] = link.slug
+        session.add(link)
+        results.append(link)
+    reused_ids = [result.id for result in results if isinstance(result, Link) and result.id is not None]
+    if reused_ids:
+        _reset_clicks(session, reused_ids)
+    _record_changes([result for result in results if isinstance(result, Link)])
+    session.commit()
+    metrics.count_errors(type(result).__name__ for result in results if isinstance(result, LinkError))
+
+    # Reload the created links with one query instead of refreshing them one by one.
+    created_ids = [result.id for result in results if isinstance(result, Link)]
+    session.exec(select(Link).where(Link.id.in_(created_ids))).all()  # type: ignore[union-attr]
+    return results
 
 
+@instrument
+def list_links(
+    session: Session,
+    limit: int = PAGE_SIZE_DEFAULT,
+    cursor: str | None = None,
+) -> tuple[list[LinkRow], str | None]:
+    """List a page of links that have a target url, ordered by id.
+
+    Only the columns that are read are loaded, without building a `Link` for each row.
+
+    Args:
+        session (Session): Database session.
+        limit (int): Maximum number of links to return.
+        cursor (str | None): Cursor returned with the previous page. The first page is returned if not provided.
+
+    Returns:
+        tuple[list[LinkRow], str | None]: List of link rows and the cursor of the next page, or none on the last page.
+
+    Raises:
+        InvalidCursorError: If the cursor is not valid.
+    """
+    statement = select(Link.slug, Link.target_url, Link.click_count, Link.id, Link.version).where(  # type: ignore[call-overload]
+        Link.target_url.is_not(None),  # type: ignore[union-attr]
+    )
+    if cursor is not None:
+        (last_id,) = _decode_cursor(cursor, int)
+        statement = statement.where(Link.id > last_id)
+    statement = statement.order_by(Link.id.asc()).limit(limit + 1)  # type: ignore[union-attr]
+    rows: list[LinkRow] = list(session.exec(statement).all())
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], _encode_cursor(rows[limit - 1][3])
+
+
+@instrument
 def get_link(session: Session, slug: str) -> Link:
     """Get a link by its slug.
 
@@ -84,15 +339,32 @@ def get_link(session: Session, slug: str) -> Link:
     """
     statement = select(Link).where(Link.slug == slug).limit(1)
     link = session.exec(statement).first()
-    if link is None:
+    if link is None and slug not in slug_space:
         msg = f"Slug '{slug}' is not valid"
         raise InvalidSlugError(msg)
-    if link.target_url is None:
+    if link is None or link.target_url is None:
         msg = f"Slug '{slug}' is not in use"
         raise SlugNotInUseError(msg)
     return link
 
 
+@instrument
+def get_link_version(session: Session, slug: str) -> tuple[int, datetime | None] | None:
+    """Get the version of a link and the time it last changed, without loading the link.
+
+    Args:
+        session (Session): Database session.
+        slug (str): Slug of the link.
+
+    Returns:
+        tuple[int, datetime | None] | None: Version and time of the last change, or none if the slug is not in use.
+    """
+    statement = select(Link.version, Link.updated_at).where(Link.slug == slug, Link.target_url.is_not(None))  # type: ignore[union-attr]
+    row = session.exec(statement).first()
+    return None if row is None else (row[0], row[1])
+
+
+@instrument
 def update_link(session: Session, link: Link, target_url: str) -> Link:
     """Update the target url of a link.
 
@@ -107,52 +379,381 @@ def update_link(session: Session, link: Link, target_url: str) -> Link:
     Raises:
         TargetUrlAlreadyExistsError: If the target url already exists in the database.
     """
-    statement = select(Link).where(Link.target_url == target_url).limit(1)
+    target_url_hash = hash_target_url(target_url)
+    statement = select(Link).where(Link.target_url_hash == target_url_hash).limit(1)
     existing_link = session.exec(statement).first()
     if existing_link is not None:
         msg = f"Link with target url '{target_url}' already exists under slug '{existing_link.slug}'"
         raise TargetUrlAlreadyExistsError(msg)
 
     link.target_url = target_url
+    link.target_url_hash = target_url_hash
     session.add(link)
+    _record_changes([link])
+    publish_invalidation(session.connection(), [link.slug])
     session.commit()
+    redirect_cache.invalidate(link.slug)
     session.refresh(link)
     return link
 
 
+@instrument
 def delete_link(session: Session, link: Link) -> None:
     """Delete a link by setting its target url to none and resetting clicks.
 
+    Deleting is not atomic. The clicks are purged in chunks that are committed one by one, so after a crash between
+    chunks the clicks are gone, but the click count, the rollups and the target url of the link remain until the link
+    is deleted again. Clicks recorded while the purge runs are deleted with the link.
+
     Args:
         session (Session): Database session.
         link (Link): Link object to delete.
     """
+    purge_clicks(session, [link.id])  # type: ignore[list-item]
+    # The link is updated first, which waits for clicks being recorded concurrently and stops any further ones.
     link.target_url = None
-    for click in link.clicks:
-        session.delete(click)
+    link.target_url_hash = None
+    link.click_count = 0
+    _record_changes([link])
     session.add(link)
+    session.flush()
+    session.execute(delete(Click).where(Click.link_id == link.id))  # type: ignore[arg-type]
+    session.execute(delete(ClickRollup).where(ClickRollup.link_id == link.id))  # type: ignore[arg-type]
+    session.execute(delete(VisitorSketch).where(VisitorSketch.link_id == link.id))  # type: ignore[arg-type]
+    publish_invalidation(session.connection(), [link.slug])
     session.commit()
+    redirect_cache.invalidate(link.slug)
     session.refresh(link)
 
 
-def update_link_clicks(session: Session, link: Link, ip_address: str) -> None:
+@instrument
+def delete_links(session: Session, slugs: list[str]) -> dict[str, int]:
+    """Delete many links by setting their target urls to none and resetting their clicks.
+
+    Deleting is not atomic, the same way as for `delete_link`: after a crash while the clicks are purged, the links keep
+    their click counts, rollups and target urls.
+
+    Args:
+        session (Session): Database session.
+        slugs (list[str]): Slugs of the links to delete. Slugs that are not valid or not in use are skipped.
+
+    Returns:
+        dict[str, int]: Ids of the deleted links by their slugs.
+    """
+    statement = select(Link.slug, Link.id).where(Link.slug.in_(slugs), Link.target_url.is_not(None))  # type: ignore[attr-defined,union-attr]
+    deleted_links: dict[str, int] = dict(session.exec(statement).all())  # type: ignore[arg-type]
+    if not deleted_links:
+        return deleted_links
+    link_ids = list(deleted_links.values())
+    purge_clicks(session, link_ids)
+    # The links are updated first, which waits for clicks being recorded concurrently and stops any further ones.
+    session.execute(
+        update(Link)
+        .where(Link.id.in_(link_ids))  # type: ignore[union-attr]
+        .values(
+            target_url=None,
+            target_url_hash=None,
+            click_count=0,
+            version=Link.version + 1,
+            updated_at=datetime.now(tz=UTC),
+        ),
+    )
+    session.execute(delete(Click).where(Click.link_id.in_(link_ids)))  # type: ignore[attr-defined]
+    session.execute(delete(ClickRollup).where(ClickRollup.link_id.in_(link_ids)))  # type: ignore[attr-defined]
+    session.execute(delete(VisitorSketch).where(VisitorSketch.link_id.in_(link_ids)))  # type: ignore[attr-defined]
+    publish_invalidation(session.connection(), list(deleted_links))
+    session.commit()
+    for slug in deleted_links:
+        redirect_cache.invalidate(slug)
+    return deleted_links
+
+
+@instrument
+def purge_clicks(session: Session, link_ids: list[int], chunk_size: int = CLICK_PURGE_CHUNK_SIZE) -> None:
+    """Delete the clicks of links in chunks, committing after each chunk to keep lock times short.
+
+    Args:
+        session (Session): Database session.
+        link_ids (list[int]): Ids of the links to delete the clicks of.
+        chunk_size (int): Maximum number of clicks deleted in one transaction.
+    """
+    chunk = select(Click.id).where(Click.link_id.in_(link_ids)).limit(chunk_size)  # type: ignore[attr-defined]
+    while True:
+        result = session.execute(delete(Click).where(Click.id.in_(chunk)))  # type: ignore[union-attr]
+        session.commit()
+        if result.rowcount < chunk_size:  # type: ignore[attr-defined]
+            return
+
+
+@instrument
+def update_link_clicks(session: Session, link_id: int, ip_address: str) -> None:
     """Update the clicks for a link.
 
     Args:
         session (Session): Database session.
-        link (Link): Link object to increment clicks for.
+        link_id (int): Id of the link to increment clicks for.
         ip_address (str): The ip address of the client.
     """
-    click = Click(ip_address=ip_address, link=link)
-    session.add(click)
+    record_clicks(session, [Click(ip_address=ip_address, link_id=link_id)])
+
+
+@instrument
+def record_clicks(session: Session, clicks: list[Click]) -> None:
+    """Insert a batch of clicks with a single multi-row insert, increment the click counts and commit.
+
+    The versions of the clicked links are advanced with their click counts, so the links and the pages listing them are
+    revalidated by their click counts.
+
+    Clicks of links that were deleted in the meantime, like clicks that were buffered or served from the cache while
+    the link was deleted, are dropped. The click counts are incremented first, only for links that still have a target
+    url, which locks their rows until the commit, so a concurrent delete either skips or removes the recorded clicks.
+
+    Args:
+        session (Session): Database session.
+        clicks (list[Click]): Clicks to record.
+    """
+    if not clicks:
+        return
+    # Links and rollups are updated in key order, so concurrent batches lock their rows in the same order.
+    updated_at = datetime.now(tz=UTC)
+    live_link_ids = set()
+    for link_id, count in sorted(Counter(click.link_id for click in clicks).items()):
+        result = session.execute(
+            update(Link)
+            .where(Link.id == link_id, Link.target_url.is_not(None))  # type: ignore[arg-type,union-attr]
+            .values(click_count=Link.click_count + count, version=Link.version + 1, updated_at=updated_at),
+        )
+        if result.rowcount == 1:  # type: ignore[attr-defined]
+            live_link_ids.add(link_id)
+    clicks = [click for click in clicks if click.link_id in live_link_ids]
+    if not clicks:
+        session.commit()
+        return
+    session.execute(insert(Click), [click.model_dump(exclude={"id"}) for click in clicks])
+    rollups = Counter((click.link_id, _hour_start(click.timestamp)) for click in clicks)
+    connection = session.connection()
+    statement = dialect_insert(connection, ClickRollup)
+    statement = statement.on_conflict_do_update(
+        index_elements=["link_id", "bucket_start"],
+        set_={"count": ClickRollup.count + statement.excluded["count"]},
+    )
+    connection.execute(
+        statement,
+        [
+            {"link_id": link_id, "bucket_start": bucket_start, "count": count}
+            for (link_id, bucket_start), count in sorted(rollups.items())
+        ],
+    )
+    _record_visitors(session, clicks)
     session.commit()
-    session.refresh(click)
 
 
-def list_clicks(session: Session, link: Link) -> list[Click]:
-    """List all clicks for a given link."""
-    statement = select(Click).where(Click.link_id == link.id).order_by(Click.timestamp.desc())  # type: ignore[attr-defined]
-    return list(session.exec(statement).all())
+def _record_visitors(session: Session, clicks: list[Click]) -> None:
+    """Add the ip addresses of clicks to the visitor sketches of their links in the current transaction.
+
+    Missing sketches are created empty first, so every sketch of the batch exists when it is read for update in key
+    order, and concurrent batches of the same link wait for each other instead of overwriting each other. Sketches are
+    only written back if one of their registers grew, which stops happening for most clicks once a link has had a few
+    thousand visitors.
+    """
+    ip_addresses: defaultdict[int, set[str]] = defaultdict(set)
+    for click in clicks:
+        ip_addresses[click.link_id].add(click.ip_address)
+    link_ids = sorted(ip_addresses)
+    connection = session.connection()
+    empty_registers = HyperLogLog().to_bytes()
+    connection.execute(
+        dialect_insert(connection, VisitorSketch).on_conflict_do_nothing(index_elements=["link_id"]),
+        [{"link_id": link_id, "registers": empty_registers} for link_id in link_ids],
+    )
+    sketches = (
+        select(VisitorSketch.link_id, VisitorSketch.registers)
+        .where(VisitorSketch.link_id.in_(link_ids))  # type: ignore[attr-defined]
+        .order_by(VisitorSketch.link_id.asc())  # type: ignore[attr-defined]
+        .with_for_update()
+    )
+    changed_sketches = []
+    for link_id, registers in session.exec(sketches).all():
+        sketch = HyperLogLog(registers)
+        changed = False
+        for ip_address in ip_addresses[link_id]:
+            changed |= sketch.add(ip_address)
+        if changed:
+            changed_sketches.append({"link_id": link_id, "registers": sketch.to_bytes()})
+    if changed_sketches:
+        session.execute(update(VisitorSketch), changed_sketches)
+
+
+@instrument
+def list_clicks(
+    session: Session,
+    link: Link,
+    limit: int = PAGE_SIZE_DEFAULT,
+    cursor: str | None = None,
+) -> tuple[list[ClickRow], str | None]:
+    """List a page of clicks for a given link, newest first.
+
+    Only the columns that are read are loaded, without building a `Click` for each row.
+
+    Args:
+        session (Session): Database session.
+        link (Link): Link object to list clicks for.
+        limit (int): Maximum number of clicks to return.
+        cursor (str | None): Cursor returned with the previous page. The first page is returned if not provided.
+
+    Returns:
+        tuple[list[ClickRow], str | None]: List of click rows and the cursor of the next page, or none on the last page.
+
+    Raises:
+        InvalidCursorError: If the cursor is not valid.
+    """
+    statement = select(Click.timestamp, Click.ip_address, Click.id).where(Click.link_id == link.id)
+    if cursor is not None:
+        last_timestamp, last_id = _decode_cursor(cursor, datetime.fromisoformat, int)
+        statement = statement.where(
+            or_(
+                Click.timestamp < last_timestamp,
+                and_(Click.timestamp == last_timestamp, Click.id < last_id),
+            ),
+        )
+    statement = statement.order_by(Click.timestamp.desc(), Click.id.desc()).limit(limit + 1)  # type: ignore[attr-defined,union-attr]
+    rows: list[ClickRow] = list(session.exec(statement).all())  # type: ignore[arg-type]
+    if len(rows) <= limit:
+        return rows, None
+    last_timestamp, _, last_id = rows[limit - 1]
+    return rows[:limit], _encode_cursor(last_timestamp.isoformat(), last_id)
+
+
+@instrument
+def count_visitors(session: Session, link: Link) -> float:
+    """Estimate the number of distinct ip addresses that clicked a link.
+
+    The estimate is read from the visitor sketch of the link, so the cost does not grow with the number of clicks. See
+    `linker.sketches` for its error bounds.
+
+    Args:
+        session (Session): Database session.
+        link (Link): Link object to count visitors for.
+
+    Returns:
+        float: Estimated number of unique visitors.
+    """
+    registers = session.exec(select(VisitorSketch.registers).where(VisitorSketch.link_id == link.id)).one_or_none()
+    return 0.0 if registers is None else HyperLogLog(registers).estimate()
+
+
+@instrument
+def click_histogram(
+    session: Session,
+    link: Link,
+    bucket: HistogramBucket,
+    start: datetime,
+    end: datetime,
+) -> list[tuple[datetime, int]]:
+    """Count the clicks of a link in hourly or daily buckets.
+
+    Whole hours of the range are read from the hourly rollups, so the cost does not grow with the number of clicks.
+    Only the partial hours at the edges of the range are counted from the clicks themselves.
+
+    Args:
+        session (Session): Database session.
+        link (Link): Link object to count clicks for.
+        bucket (HistogramBucket): Width of the buckets.
+        start (datetime): Start of the range, inclusive.
+        end (datetime): End of the range, exclusive.
+
+    Returns:
+        list[tuple[datetime, int]]: Start in UTC and number of clicks of each bucket with clicks, oldest first.
+
+    Raises:
+        InvalidRangeError: If the start of the range is not before its end.
+    """
+    start, end = _to_utc(start), _to_utc(end)
+    if start >= end:
+        msg = f"Start of the range '{start.isoformat()}' must be before its end '{end.isoformat()}'"
+        raise InvalidRangeError(msg)
+
+    whole_hours_start = _hour_start(start) if start == _hour_start(start) else _hour_start(start) + timedelta(hours=1)
+    whole_hours_end = max(_hour_start(end), whole_hours_start)
+    statement = select(ClickRollup.bucket_start, ClickRollup.count).where(
+        ClickRollup.link_id == link.id,
+        ClickRollup.bucket_start >= whole_hours_start,
+        ClickRollup.bucket_start < whole_hours_end,
+    )
+    hourly_counts: Counter[datetime] = Counter(dict(session.exec(statement).all()))
+
+    connection = session.connection()
+    hour = truncate_to_hour(connection, Click.timestamp)
+    edges = [(start, min(whole_hours_start, end)), (max(whole_hours_end, start), end)]
+    for edge_start, edge_end in edges:
+        if edge_start >= edge_end:
+            continue
+        edge_statement = (
+            select(hour, func.count())
+            .where(Click.link_id == link.id, Click.timestamp >= edge_start, Click.timestamp < edge_end)
+            .group_by(hour)
+        )
+        for bucket_start, count in session.exec(edge_statement).all():
+            parsed_start = datetime.fromisoformat(bucket_start) if isinstance(bucket_start, str) else bucket_start
+            hourly_counts[parsed_start] += count
+
+    if bucket == HistogramBucket.DAY:
+        daily_counts: Counter[datetime] = Counter()
+        for bucket_start, count in hourly_counts.items():
+            daily_counts[bucket_start.replace(hour=0)] += count
+        hourly_counts = daily_counts
+    return sorted(
+        (bucket_start.replace(tzinfo=UTC), count) for bucket_start, count in hourly_counts.items() if count > 0
+    )
+
+
+def _to_utc(value: datetime) -> datetime:
+    """Convert a datetime to a naive datetime in UTC, the way timestamps are stored. Naive datetimes are kept."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(UTC).replace(tzinfo=None)
+
+
+def _hour_start(value: datetime) -> datetime:
+    """Truncate a datetime to the start of its hour, in UTC."""
+    return _to_utc(value).replace(minute=0, second=0, microsecond=0)
+
+
+def iter_clicks(session: Session, link: Link, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[tuple[datetime, str]]:
+    """Iterate over all clicks for a given link, newest first, without loading them all into memory.
+
+    Rows are fetched in batches from a server-side cursor where the database driver supports it.
+
+    Args:
+        session (Session): Database session.
+        link (Link): Link object to export clicks for.
+        batch_size (int): Number of rows fetched at a time.
+
+    Yields:
+        tuple[datetime, str]: Timestamp and ip address of each click.
+    """
+    statement = (
+        select(Click.timestamp, Click.ip_address)
+        .where(Click.link_id == link.id)
+        .order_by(Click.timestamp.desc(), Click.id.desc())  # type: ignore[attr-defined,union-attr]
+        .execution_options(yield_per=batch_size)
+    )
+    yield from session.exec(statement)
+
+
+def _encode_cursor(*values: int | str | None) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor: str, *parsers: Callable[[Any], Any]) -> list[Any]:
+    """Decode a cursor into the sort key of the last row of a page, parsing each value with the matching parser."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return [parser(value) for parser, value in zip(parsers, values, strict=True)]
+    except (binascii.Error, TypeError, ValueError) as e:
+        msg = f"Cursor '{cursor}' is not valid"
+        raise InvalidCursorError(msg) from e
 
 
 class LinkError(Exception):
@@ -177,3 +778,11 @@ class SlugAlreadyInUseError(LinkError):
 
 class SlugNotInUseError(LinkError):
     """Raised when a slug is not in use."""
+
+
+class InvalidCursorError(LinkError):
+    """Raised when a pagination cursor is not valid."""
+
+
+class InvalidRangeError(LinkError):
+    """Raised when a time range is not valid."""
@@ -1,27 +1,98 @@
 """
-PostgreSQL database connection and session management.
+Database connection and session management, on PostgreSQL or on an embedded SQLite database.
 
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
+import fcntl
+import logging
+import math
 import os
-from collections.abc import Generator
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from collections.abc import AsyncGenerator, Generator, Iterator
+from contextlib import contextmanager
+from functools import cache
+from pathlib import Path
+from typing import Any
 
-from sqlmodel import Session, SQLModel, create_engine, select
+from fastapi import Request
+from sqlalchemy import Connection, Engine, event, func, insert, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection, QueuePool
+from sqlmodel import Session, SQLModel, create_engine, select, text
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from linker.constants import (
+    ASYNC_MODE_KEY,
+    DATABASE_BACKEND_DEFAULT,
+    DATABASE_BACKEND_KEY,
+    DATABASE_BACKENDS,
     POSTGRES_DATABASE_KEY,
     POSTGRES_HOST_KEY,
     POSTGRES_PASSWORD_KEY,
+    POSTGRES_POOL_MAX_OVERFLOW_DEFAULT,
+    POSTGRES_POOL_MAX_OVERFLOW_KEY,
+    POSTGRES_POOL_PRE_PING_DEFAULT,
+    POSTGRES_POOL_PRE_PING_KEY,
+    POSTGRES_POOL_RECYCLE_DEFAULT,
+    POSTGRES_POOL_RECYCLE_KEY,
+    POSTGRES_POOL_SIZE_DEFAULT,
+    POSTGRES_POOL_SIZE_KEY,
     POSTGRES_PORT_KEY,
+    POSTGRES_REPLICA_HOST_KEY,
+    POSTGRES_REPLICA_MAX_CLIENTS,
+    POSTGRES_REPLICA_MAX_LAG_DEFAULT,
+    POSTGRES_REPLICA_MAX_LAG_KEY,
+    POSTGRES_REPLICA_PORT_KEY,
+    POSTGRES_REPLICA_RETRY_INTERVAL,
     POSTGRES_USERNAME_KEY,
+    SCHEMA_LOCK_KEY,
+    SCHEMA_VERSION,
+    SQLITE_BUSY_TIMEOUT,
+    SQLITE_PATH_DEFAULT,
+    SQLITE_PATH_KEY,
+    SQLITE_PRAGMAS,
+    SQLITE_READER_POOL_SIZE_DEFAULT,
+    SQLITE_READER_POOL_SIZE_KEY,
 )
-from linker.models import Link
-from linker.slugs import get_slugs
+from linker.dialects import dialect_insert, truncate_to_hour
+from linker.environment import get_env_bool, get_env_int
+from linker.metrics import instrument_engine
+from linker.models import (
+    Click,
+    ClickRollup,
+    Link,
+    PoolStatisticsRead,
+    SchemaVersion,
+    SlugSequence,
+    VisitorSketch,
+)
+from linker.partitions import partition_click_table
+from linker.sketches import HyperLogLog
+from linker.startup import startup_timings
+from linker.urls import hash_target_url
+
+logger = logging.getLogger(__name__)
+
+
+def get_database_backend() -> str:
+    """Load the database backend, "postgresql" or "sqlite", from environment variables."""
+    backend = os.getenv(DATABASE_BACKEND_KEY, DATABASE_BACKEND_DEFAULT)
+    if backend not in DATABASE_BACKENDS:
+        backends = ", ".join(DATABASE_BACKENDS)
+        msg = f"Environment variable '{DATABASE_BACKEND_KEY}' must be one of {backends}, got '{backend}'"
+        raise ValueError(msg)
+    return backend
 
 
 def get_database_url() -> str:
     """Load database connection url from environment variables."""
+    if get_database_backend() == "sqlite":
+        return f"sqlite:///{os.getenv(SQLITE_PATH_KEY, SQLITE_PATH_DEFAULT)}"
     postgres_host = os.getenv(POSTGRES_HOST_KEY)
     if postgres_host is None:
         msg = f"Environment variable '{POSTGRES_HOST_KEY}' is not set"
@@ -49,19 +120,506 @@ def get_database_url() -> str:
     return f"postgresql://{postgres_username}:{postgres_password}@{postgres_host}:{postgres_port}/{postgres_database}"
 
 
-def create_db() -> None:
-    """Create the database and populate it with initial data."""
-    engine = create_engine(get_database_url())
-    SQLModel.metadata.create_all(engine)
+def get_async_database_url() -> str:
+    """Load database connection url for the async driver from environment variables.
+
+    The SQLite backend is not supported, as the async application also writes through the sync engine, so it would
+    have a second writer next to the single one of the embedded database. Its engine is created at startup, so async
+    mode with the SQLite backend fails to start.
+    """
+    return _async_url(get_database_url())
+
+
+def get_replica_database_url() -> str | None:
+    """Load the connection url of the read replica from environment variables, or none if no replica is configured.
+
+    The replica shares the database and the credentials of the primary. Its port defaults to the port of the primary.
+    With the SQLite backend the reader connections to the database file take the place of the replica.
+    """
+    if get_database_backend() == "sqlite":
+        return get_database_url()
+    replica_host = os.getenv(POSTGRES_REPLICA_HOST_KEY)
+    if replica_host is None:
+        return None
+    url = make_url(get_database_url())
+    replica_port = get_env_int(POSTGRES_REPLICA_PORT_KEY, url.port or 5432)
+    return url.set(host=replica_host, port=replica_port).render_as_string(hide_password=False)
+
+
+def get_async_replica_database_url() -> str | None:
+    """Load the connection url of the read replica for the async driver, or none if no replica is configured."""
+    replica_url = get_replica_database_url()
+    return None if replica_url is None else _async_url(replica_url)
+
+
+def _async_url(url: str) -> str:
+    if make_url(url).get_backend_name() == "sqlite":
+        msg = f"The sqlite backend does not support async mode, unset '{ASYNC_MODE_KEY}' to use it"
+        raise ValueError(msg)
+    return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+
+class PoolStatistics:
+    """Process-wide counters of connection checkouts and the time spent waiting for them."""
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_checkout(self, wait_seconds: float) -> None:
+        """Record a connection checkout that took the given number of seconds."""
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def reset(self) -> None:
+        """Reset all counters to zero."""
+        with self._lock:
+            self.checkouts = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+
+
+pool_statistics = PoolStatistics()
+
+
+class TimedQueuePool(QueuePool):
+    """Queue pool that records how long each connection checkout takes."""
+
+    def connect(self) -> PoolProxiedConnection:
+        """Check out a connection and record the time spent waiting for it."""
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            pool_statistics.record_checkout(time.perf_counter() - start)
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """Queue pool for async drivers that records how long each connection checkout takes."""
+
+
+def get_pool_options() -> dict[str, Any]:
+    """Load connection pool options from environment variables."""
+    return {
+        "pool_size": get_env_int(POSTGRES_POOL_SIZE_KEY, POSTGRES_POOL_SIZE_DEFAULT),
+        "max_overflow": get_env_int(POSTGRES_POOL_MAX_OVERFLOW_KEY, POSTGRES_POOL_MAX_OVERFLOW_DEFAULT),
+        "pool_recycle": get_env_int(POSTGRES_POOL_RECYCLE_KEY, POSTGRES_POOL_RECYCLE_DEFAULT),
+        "pool_pre_ping": get_env_bool(POSTGRES_POOL_PRE_PING_KEY, default=POSTGRES_POOL_PRE_PING_DEFAULT),
+    }
+
+
+def get_sqlite_pool_options(*, reader: bool) -> dict[str, Any]:
+    """Load connection pool options of an embedded SQLite database from environment variables.
+
+    SQLite allows a single writer at a time, so writes share one connection and wait for it in the pool rather than
+    on the database lock. Readers do not block the writer in write-ahead logging mode, so they are pooled. The writer
+    is only shared within an engine, which is why the async application does not support SQLite.
+    """
+    return {
+        "pool_size": get_env_int(SQLITE_READER_POOL_SIZE_KEY, SQLITE_READER_POOL_SIZE_DEFAULT) if reader else 1,
+        "max_overflow": 0,
+        "connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT},
+    }
+
+
+def create_database_engine(url: str | None = None, *, reader: bool = False) -> Engine:
+    """Create a pooled database engine configured from environment variables.
+
+    Args:
+        url (str | None): Connection url of the database. The primary database is used if not provided.
+        reader (bool): Whether the engine only reads. Only affects SQLite databases, whose readers are pooled.
+    """
+    url = url or get_database_url()
+    if make_url(url).get_backend_name() == "sqlite":
+        engine = create_engine(url, poolclass=TimedQueuePool, **get_sqlite_pool_options(reader=reader))
+        configure_sqlite_engine(engine, reader=reader)
+    else:
+        engine = create_engine(url, poolclass=TimedQueuePool, **get_pool_options())
+    instrument_engine(engine)
+    return engine
+
+
+def create_async_database_engine(url: str | None = None) -> AsyncEngine:
+    """Create a pooled async database engine configured from environment variables.
+
+    Args:
+        url (str | None): Connection url of the database. The primary database is used if not provided.
+    """
+    url = url or get_async_database_url()
+    async_engine = create_async_engine(url, poolclass=TimedAsyncQueuePool, **get_pool_options())
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+
+def configure_sqlite_engine(engine: Engine, *, reader: bool) -> None:
+    """Set the pragmas of `linker.constants.SQLITE_PRAGMAS` on every new connection of an engine.
+
+    Connections of reader engines are also made read-only, so a write routed to them fails instead of taking the
+    database lock next to the writer.
+    """
+    pragmas = {**SQLITE_PRAGMAS, "query_only": "ON"} if reader else SQLITE_PRAGMAS
+
+    def set_pragmas(dbapi_connection: Any, _: object) -> None:  # noqa: ANN401
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    event.listen(engine, "connect", set_pragmas)
+
+
+@cache
+def get_engine() -> Engine:
+    """Get the process-wide database engine, creating it on first use."""
+    return create_database_engine()
+
+
+def dispose_engine() -> None:
+    """Close all pooled connections and forget the process-wide database engines."""
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+    get_engine.cache_clear()
+    if get_replica_engine.cache_info().currsize and (replica_engine := get_replica_engine()) is not None:
+        replica_engine.dispose()
+    get_replica_engine.cache_clear()
+
+
+@cache
+def get_replica_engine() -> Engine | None:
+    """Get the process-wide database engine of the read replica, or none if no replica is configured."""
+    replica_url = get_replica_database_url()
+    return None if replica_url is None else create_database_engine(replica_url, reader=True)
+
+
+@cache
+def get_async_engine() -> AsyncEngine:
+    """Get the process-wide async database engine, creating it on first use."""
+    return create_async_database_engine()
+
+
+async def dispose_async_engine() -> None:
+    """Close all pooled connections and forget the process-wide async database engines."""
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    get_async_engine.cache_clear()
+    if get_async_replica_engine.cache_info().currsize and (replica_engine := get_async_replica_engine()) is not None:
+        await replica_engine.dispose()
+    get_async_replica_engine.cache_clear()
 
-    with Session(engine) as session:
-        if not session.exec(select(Link)).first():
-            session.add_all([Link(slug=slug) for slug in get_slugs()])
-            session.commit()
+
+@cache
+def get_async_replica_engine() -> AsyncEngine | None:
+    """Get the process-wide async database engine of the read replica, or none if no replica is configured."""
+    replica_url = get_async_replica_database_url()
+    return None if replica_url is None else create_async_database_engine(replica_url)
+
+
+class ReplicaRouter:
+    """Choose the database of read-only sessions.
+
+    Reads go to the replica, unless it is down or the same client wrote so recently that the replica may not have the
+    write yet. Clients are told apart by ip address, so clients behind a shared proxy also share their read-your-writes
+    window, and the least recently writing clients are forgotten once the window of too many clients is tracked.
+    """
+
+    def __init__(self, max_lag: float, retry_interval: float, max_clients: int) -> None:
+        """Initialize without recent writes or failures.
+
+        Args:
+            max_lag (float): Number of seconds reads stay on the primary after a write, so writers read their writes.
+            retry_interval (float): Number of seconds reads stay on the primary after the replica could not be reached.
+            max_clients (int): Maximum number of clients whose last write is kept.
+        """
+        self.max_lag = max_lag
+        self.retry_interval = retry_interval
+        self.max_clients = max_clients
+        self._written_at: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._down_until = -math.inf
+
+    def record_write(self, client: str) -> None:
+        """Keep the reads of a client on the primary until the replica has caught up with its write."""
+        now = time.monotonic()
+        with self._lock:
+            self._written_at.pop(client, None)
+            self._written_at[client] = now
+            while self._written_at and (
+                len(self._written_at) > self.max_clients or next(iter(self._written_at.values())) <= now - self.max_lag
+            ):
+                self._written_at.popitem(last=False)
+
+    def connect(self, primary: Engine, replica: Engine | None, client: str) -> Connection:
+        """Connect to the replica if it is available to the client, or to the primary otherwise."""
+        if replica is not None and self._use_replica(client):
+            try:
+                return replica.connect()
+            except (OperationalError, OSError) as e:
+                self._record_failure(e)
+        return primary.connect()
+
+    def _use_replica(self, client: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            written_at = self._written_at.get(client, -math.inf)
+        return now - written_at >= self.max_lag and now >= self._down_until
+
+    def _record_failure(self, error: Exception) -> None:
+        logger.warning(
+            "Read replica is not reachable, reading from the primary for %s seconds: %s",
+            self.retry_interval,
+            error,
+        )
+        self._down_until = time.monotonic() + self.retry_interval
+
+
+replica_router = ReplicaRouter(
+    max_lag=get_env_int(POSTGRES_REPLICA_MAX_LAG_KEY, POSTGRES_REPLICA_MAX_LAG_DEFAULT),
+    retry_interval=POSTGRES_REPLICA_RETRY_INTERVAL,
+    max_clients=POSTGRES_REPLICA_MAX_CLIENTS,
+)
+
+
+class ReadSession(Session):
+    """Session that connects to the replica or to the primary on its first query, so an unused session costs nothing.
+
+    Async sessions use it as their sync session class, with the sync engines of the async engines.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        replica: Engine | None,
+        client: str,
+        router: ReplicaRouter = replica_router,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Initialize without a connection.
+
+        Args:
+            primary (Engine): Engine of the primary database.
+            replica (Engine | None): Engine of the read replica, if one is configured.
+            client (str): Ip address of the client, for reading its own writes.
+            router (ReplicaRouter): Router choosing between the primary and the replica.
+            **kwargs (Any): Arguments of the session.
+        """
+        super().__init__(**kwargs)
+        self.primary = primary
+        self.replica = replica
+        self.client = client
+        self.router = router
+        self._connection: Connection | None = None
+
+    def get_bind(self, mapper: Any = None, **kwargs: Any) -> Connection:  # noqa: ANN401, ARG002
+        """Get the connection of the session, connecting on first use."""
+        if self._connection is None:
+            self._connection = self.router.connect(self.primary, self.replica, self.client)
+        return self._connection
+
+    def close(self) -> None:
+        """Close the session and return its connection to the pool."""
+        super().close()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def get_pool_statistics(engine: Engine) -> PoolStatisticsRead:
+    """Get the current connection pool usage of the given engine."""
+    statistics = PoolStatisticsRead(
+        checkouts=pool_statistics.checkouts,
+        wait_seconds_total=pool_statistics.wait_seconds_total,
+        wait_seconds_max=pool_statistics.wait_seconds_max,
+    )
+    if isinstance(engine.pool, QueuePool):
+        statistics.pool_size = engine.pool.size()
+        statistics.checked_in = engine.pool.checkedin()
+        statistics.checked_out = engine.pool.checkedout()
+        statistics.overflow = max(engine.pool.overflow(), 0)
+    return statistics
+
+
+def migrate_db(engine: Engine) -> None:
+    """Bring tables created by earlier versions of the application up to date with the models."""
+    table_names = set(inspect(engine).get_table_names())
+    if "link" not in table_names:
+        return
+    link_columns = {column["name"] for column in inspect(engine).get_columns("link")}
+    with engine.begin() as connection:
+        if "click_count" not in link_columns:
+            connection.execute(text("ALTER TABLE link ADD COLUMN click_count INTEGER NOT NULL DEFAULT 0"))
+            connection.execute(
+                text("UPDATE link SET click_count = (SELECT count(*) FROM click WHERE click.link_id = link.id)"),
+            )
+        if "target_url_hash" not in link_columns:
+            connection.execute(text("ALTER TABLE link ADD COLUMN target_url_hash VARCHAR(64)"))
+            connection.execute(text("DROP INDEX IF EXISTS ix_link_target_url"))
+            _backfill_target_url_hashes(connection)
+        if "version" not in link_columns:
+            updated_at_type = Link.__table__.c.updated_at.type.compile(dialect=connection.dialect)  # type: ignore[attr-defined]
+            connection.execute(text("ALTER TABLE link ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+            connection.execute(text(f"ALTER TABLE link ADD COLUMN updated_at {updated_at_type}"))
+        if "clickrollup" not in table_names:
+            ClickRollup.__table__.create(connection)  # type: ignore[attr-defined]
+            bucket_start = truncate_to_hour(connection, Click.timestamp)
+            rollups = (
+                select(Click.link_id, bucket_start, func.count())
+                .where(Click.timestamp.is_not(None))  # type: ignore[attr-defined]
+                .group_by(Click.link_id, bucket_start)  # type: ignore[arg-type]
+            )
+            connection.execute(insert(ClickRollup).from_select(["link_id", "bucket_start", "count"], rollups))
+        # The change sequence of the link table no longer validates lists of links, their pages are validated instead.
+        connection.execute(text("DROP TABLE IF EXISTS linkchangesequence"))
+        if "visitorsketch" not in table_names:
+            VisitorSketch.__table__.create(connection)  # type: ignore[attr-defined]
+            _backfill_visitor_sketches(connection)
+        for index in [*Link.__table__.indexes, *Click.__table__.indexes]:  # type: ignore[attr-defined]
+            index.create(connection, checkfirst=True)
+
+
+def _backfill_target_url_hashes(connection: Connection) -> None:
+    """Hash the target urls of the links, before the unique index on the hashes is created.
+
+    Target urls that only differ in the case of their scheme or host have the same hash. Only the oldest of their links
+    gets the hash, the others keep a null hash and are no longer found when shortening the same target url again.
+    """
+    link_ids: dict[str, int] = {}
+    rows = connection.execute(text("SELECT id, target_url FROM link WHERE target_url IS NOT NULL ORDER BY id"))
+    for row in rows:
+        target_url_hash = hash_target_url(row.target_url)
+        if target_url_hash in link_ids:
+            logger.warning(
+                "Link %s has the same target url as link %s, leaving its target url hash empty",
+                row.id,
+                link_ids[target_url_hash],
+            )
+        else:
+            link_ids[target_url_hash] = row.id
+    if link_ids:
+        connection.execute(
+            text("UPDATE link SET target_url_hash = :target_url_hash WHERE id = :id"),
+            [{"id": link_id, "target_url_hash": target_url_hash} for target_url_hash, link_id in link_ids.items()],
+        )
+
+
+def _backfill_visitor_sketches(connection: Connection) -> None:
+    """Build the visitor sketches of the links from the distinct ip addresses of their clicks."""
+    sketches: defaultdict[int, HyperLogLog] = defaultdict(HyperLogLog)
+    statement = select(Click.link_id, Click.ip_address).where(Click.ip_address.is_not(None)).distinct()  # type: ignore[attr-defined]
+    for link_id, ip_address in connection.execute(statement):
+        sketches[link_id].add(ip_address)
+    if sketches:
+        connection.execute(
+            insert(VisitorSketch),
+            [{"link_id": link_id, "registers": sketch.to_bytes()} for link_id, sketch in sketches.items()],
+        )
+
+
+def get_schema_version(engine: Engine) -> int | None:
+    """Get the schema version the database is marked with, or none if it has no marker yet."""
+    try:
+        with engine.connect() as connection:
+            statement = select(SchemaVersion.version).where(SchemaVersion.id == 1)
+            return connection.execute(statement).scalar_one_or_none()
+    except DBAPIError:
+        return None
+
+
+@contextmanager
+def _schema_lock(engine: Engine) -> Iterator[None]:
+    """Hold the schema lock of the database until the block is left.
+
+    On PostgreSQL this is an advisory lock, taken on a connection of its own and scoped to its transaction. On SQLite
+    it is an exclusive lock on a file next to the database, as the single writer connection is needed by the
+    migration itself. Both are released even if the block fails. In-memory databases are private to their process and
+    are not locked.
+    """
+    if engine.dialect.name == "sqlite":
+        database = engine.url.database
+        if not database or database == ":memory:":
+            yield
+            return
+        with Path(f"{database}.lock").open("a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        yield
+
+
+def create_db(engine: Engine) -> None:
+    """Bring the database schema up to date and seed the counter of generated slugs.
+
+    Creating and migrating the tables is skipped if the database is already marked with the current schema version.
+    Replicas and workers that start concurrently take turns on the schema lock, and the version marker is checked
+    again once the lock is held, so only the first of them changes the schema. Seeding ignores rows that already
+    exist, so concurrently starting replicas do not conflict.
+    """
+    with startup_timings.phase("schema"):
+        if get_schema_version(engine) != SCHEMA_VERSION:
+            with _schema_lock(engine):
+                if get_schema_version(engine) != SCHEMA_VERSION:
+                    migrate_db(engine)
+                    SQLModel.metadata.create_all(engine)
+                    partition_click_table(engine)
+                    with engine.begin() as connection:
+                        statement = dialect_insert(connection, SchemaVersion).values(id=1, version=SCHEMA_VERSION)
+                        connection.execute(
+                            statement.on_conflict_do_update(index_elements=["id"], set_={"version": SCHEMA_VERSION}),
+                        )
+
+    with startup_timings.phase("seed"), engine.begin() as connection:
+        statement = dialect_insert(connection, SlugSequence).values(id=1, value=0)
+        connection.execute(statement.on_conflict_do_nothing(index_elements=["id"]))
 
 
 def get_session() -> Generator[Session, None, None]:
     """Get session for database operations."""
-    engine = create_engine(get_database_url())
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
+        yield session
+
+
+def get_read_session(request: Request) -> Generator[Session, None, None]:
+    """Get session for read-only database operations, on the read replica where possible."""
+    with ReadSession(get_engine(), get_replica_engine(), get_client_address(request)) as session:
         yield session
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """Get async session for database operations."""
+    async with AsyncSession(get_async_engine()) as session:
+        yield session
+
+
+async def get_async_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Get async session for read-only database operations, on the read replica where possible."""
+    replica = get_async_replica_engine()
+    async with AsyncSession(
+        sync_session_class=ReadSession,
+        primary=get_async_engine().sync_engine,
+        replica=replica.sync_engine if replica is not None else None,
+        client=get_client_address(request),
+    ) as session:
+        yield session
+
+
+def pin_reads_to_primary(request: Request) -> None:
+    """Read from the primary for a while, so the caller of a write endpoint reads its own writes.
+
+    SQLite readers see every committed write at once, so they are not skipped.
+    """
+    if get_database_backend() != "sqlite":
+        replica_router.record_write(get_client_address(request))
+
+
+def get_client_address(request: Request) -> str:
+    """Get the ip address of the client of a request."""
+    return request.client.host if request.client is not None else "unknown"
@@ -0,0 +1,31 @@
+"""
+SQL constructs that are written differently for PostgreSQL and SQLite.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from typing import Any
+
+from sqlalchemy import ColumnElement, Connection, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import SQLModel
+
+# Format of the datetimes stored by SQLAlchemy in SQLite, truncated to the hour.
+SQLITE_HOUR_FORMAT = "%Y-%m-%d %H:00:00.000000"
+
+
+def dialect_insert(connection: Connection, model: type[SQLModel]) -> postgresql.Insert | sqlite.Insert:
+    """Create an insert statement of the dialect of the connection, which can handle conflicting rows."""
+    if connection.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def truncate_to_hour(connection: Connection, column: Any) -> ColumnElement[Any]:  # noqa: ANN401
+    """Truncate a datetime column to the start of its hour.
+
+    SQLite returns the truncated datetime as text, in the format SQLAlchemy stores datetimes in.
+    """
+    if connection.dialect.name == "postgresql":
+        return func.date_trunc("hour", column)
+    return func.strftime(SQLITE_HOUR_FORMAT, column)
@@ -0,0 +1,35 @@
+"""
+Typed access to optional environment variables.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import os
+
+TRUE_VALUES = {"1", "true", "yes", "on"}
+FALSE_VALUES = {"0", "false", "no", "off"}
+
+
+def get_env_int(key: str, default: int) -> int:
+    """Load an integer from an environment variable, falling back to the default if it is not set."""
+    value = os.getenv(key)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError as e:
+        msg = f"Environment variable '{key}' must be a number, got '{value}'"
+        raise ValueError(msg) from e
+
+
+def get_env_bool(key: str, *, default: bool) -> bool:
+    """Load a boolean from an environment variable, falling back to the default if it is not set."""
+    value = os.getenv(key)
+    if value is None:
+        return default
+    if value.lower() in TRUE_VALUES:
+        return True
+    if value.lower() in FALSE_VALUES:
+        return False
+    msg = f"Environment variable '{key}' must be a boolean, got '{value}'"
+    raise ValueError(msg)
@@ -0,0 +1,54 @@
+"""
+Serialization of click exports into streamed text chunks.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from itertools import islice
+
+from linker.constants import EXPORT_BATCH_SIZE
+from linker.models import ExportFormat
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+def export_clicks(
+    clicks: Iterable[tuple[datetime, str]],
+    export_format: ExportFormat,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[str]:
+    """Serialize clicks into chunks of text, one chunk per batch of clicks.
+
+    Args:
+        clicks (Iterable[tuple[datetime, str]]): Timestamp and ip address of each click.
+        export_format (ExportFormat): Format to serialize the clicks in.
+        batch_size (int): Number of clicks serialized into one chunk.
+
+    Yields:
+        str: Chunk of the export.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == ExportFormat.CSV:
+        writer.writerow(["timestamp", "ip_address"])
+    clicks_iterator = iter(clicks)
+    while batch := list(islice(clicks_iterator, batch_size)):
+        if export_format == ExportFormat.CSV:
+            writer.writerows((timestamp.isoformat(), ip_address) for timestamp, ip_address in batch)
+        else:
+            for timestamp, ip_address in batch:
+                buffer.write(json.dumps({"timestamp": timestamp.isoformat(), "ip_address": ip_address}))
+                buffer.write("\n")
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,232 @@
+"""
+Invalidation of the links cached by every worker when a link changes, over PostgreSQL LISTEN and NOTIFY.
+
+Crud functions publish the slugs of the links they change in the transaction that changes them, so the notification
+is only delivered once the change is committed. Each worker runs a listener that evicts those slugs from its redirect
+cache. Notifications sent while a listener is disconnected are lost, so caching is disabled as soon as the listener
+loses its connection and enabled with an empty cache once it connects again. A connection that dies silently is found
+by TCP keepalives and by a heartbeat query whenever the channel has been quiet for a while.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import Connection, Engine, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.types import Text
+
+from linker.cache import RedirectCache
+from linker.constants import (
+    INVALIDATION_CHANNEL,
+    INVALIDATION_HEARTBEAT_INTERVAL,
+    INVALIDATION_KEEPALIVE_COUNT,
+    INVALIDATION_KEEPALIVE_IDLE,
+    INVALIDATION_KEEPALIVE_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationSubscription:
+    """Stream of the slugs published on a bus since the subscription was made."""
+
+    def __init__(self) -> None:
+        """Initialize without received slugs. Must be called on the event loop that receives them."""
+        self._loop = asyncio.get_running_loop()
+        self._received: asyncio.Queue[list[str] | Exception] = asyncio.Queue()
+
+    async def receive(self) -> list[str]:
+        """Wait for the next slugs published on the bus.
+
+        Raises:
+            Exception: If the subscription has lost its connection to the bus.
+        """
+        received = await self._received.get()
+        if isinstance(received, Exception):
+            raise received
+        return received
+
+    async def check(self) -> None:
+        """Check that the subscription is still connected to the bus.
+
+        Raises:
+            Exception: If the subscription has lost its connection to the bus.
+        """
+
+    def deliver(self, received: list[str] | Exception) -> None:
+        """Hand slugs or a connection failure to the receiver. Safe to call from any thread."""
+        self._loop.call_soon_threadsafe(self._received.put_nowait, received)
+
+    def close(self) -> None:
+        """Stop receiving slugs."""
+
+
+class InvalidationBus:
+    """Bus over the NOTIFY and LISTEN commands of PostgreSQL, which reaches the workers of every replica."""
+
+    def supports(self, engine: Engine) -> bool:
+        """Whether workers using the engine can subscribe to the bus."""
+        return engine.dialect.name == "postgresql"
+
+    def publish(self, connection: Connection, slugs: Sequence[str]) -> None:
+        """Publish the slugs of changed links once the transaction of the connection commits."""
+        if connection.dialect.name != "postgresql" or not slugs:
+            return
+        statement = text("SELECT pg_notify(:channel, slug) FROM unnest(:slugs) AS slug").bindparams(
+            bindparam("slugs", type_=ARRAY(Text)),
+        )
+        connection.execute(statement, {"channel": INVALIDATION_CHANNEL, "slugs": list(slugs)})
+
+    async def subscribe(self, engine: Engine) -> InvalidationSubscription:
+        """Listen for the slugs published by any worker on a connection of its own."""
+        dbapi_connection = await asyncio.to_thread(_listen, engine)
+        return _PostgresSubscription(dbapi_connection)
+
+
+def _listen(engine: Engine) -> Any:  # noqa: ANN401
+    """Open a connection with TCP keepalives outside the pool of the engine that listens on the invalidation channel."""
+    cargs, cparams = engine.dialect.create_connect_args(engine.url)
+    dbapi_connection: Any = engine.dialect.connect(
+        *cargs,
+        **cparams,
+        keepalives=1,
+        keepalives_idle=INVALIDATION_KEEPALIVE_IDLE,
+        keepalives_interval=INVALIDATION_KEEPALIVE_INTERVAL,
+        keepalives_count=INVALIDATION_KEEPALIVE_COUNT,
+    )
+    dbapi_connection.autocommit = True
+    with dbapi_connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+    return dbapi_connection
+
+
+class _PostgresSubscription(InvalidationSubscription):
+    """Subscription that reads the notifications of a listening psycopg2 connection as its socket becomes readable."""
+
+    def __init__(self, dbapi_connection: Any) -> None:  # noqa: ANN401
+        super().__init__()
+        self._dbapi_connection = dbapi_connection
+        self._fileno = dbapi_connection.fileno()
+        self._checking = False
+        self._loop.add_reader(self._fileno, self._read)
+
+    async def check(self) -> None:
+        """Run a query on the listening connection in a thread, then read the notifications that arrived meanwhile."""
+        self._loop.remove_reader(self._fileno)
+        self._checking = True
+        await asyncio.to_thread(self._select_one)
+        self._checking = False
+        self._loop.add_reader(self._fileno, self._read)
+        self._read()
+
+    def _select_one(self) -> None:
+        with self._dbapi_connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    def _read(self) -> None:
+        try:
+            self._dbapi_connection.poll()
+        except Exception as e:  # noqa: BLE001
+            self._loop.remove_reader(self._fileno)
+            self.deliver(e)
+            return
+        slugs = [notification.payload for notification in self._dbapi_connection.notifies]
+        self._dbapi_connection.notifies.clear()
+        if slugs:
+            self.deliver(slugs)
+
+    def close(self) -> None:
+        if self._dbapi_connection.closed:
+            return
+        self._loop.remove_reader(self._fileno)
+        if self._checking:
+            # A check that failed or timed out may still wait on the socket in its thread, holding the connection.
+            with socket.socket(fileno=os.dup(self._fileno)) as dbapi_socket:
+                dbapi_socket.shutdown(socket.SHUT_RDWR)
+        self._dbapi_connection.close()
+
+
+class LocalInvalidationBus(InvalidationBus):
+    """Bus between the subscribers of a single process, which stands in for PostgreSQL in tests."""
+
+    def __init__(self) -> None:
+        """Initialize without subscribers."""
+        self._subscriptions: list[InvalidationSubscription] = []
+
+    def supports(self, engine: Engine) -> bool:  # noqa: ARG002
+        """Any engine can use the local bus."""
+        return True
+
+    def publish(self, connection: Connection, slugs: Sequence[str]) -> None:  # noqa: ARG002
+        """Deliver the slugs of changed links to the subscribers at once."""
+        if slugs:
+            for subscription in self._subscriptions:
+                subscription.deliver(list(slugs))
+
+    async def subscribe(self, engine: Engine) -> InvalidationSubscription:  # noqa: ARG002
+        """Subscribe to the slugs published in this process."""
+        subscription = InvalidationSubscription()
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def disconnect(self) -> None:
+        """Fail and drop every subscription, as if the connections to the database were lost."""
+        subscriptions, self._subscriptions = self._subscriptions, []
+        for subscription in subscriptions:
+            subscription.deliver(ConnectionError("Invalidation bus disconnected"))
+
+
+invalidation_bus = InvalidationBus()
+
+
+def publish_invalidation(connection: Connection, slugs: Sequence[str]) -> None:
+    """Publish the slugs of changed links on the invalidation bus. See `InvalidationBus.publish`."""
+    invalidation_bus.publish(connection, slugs)
+
+
+async def run_invalidation_listener(
+    engine: Engine,
+    cache: RedirectCache,
+    retry_interval: float,
+    heartbeat_interval: float = INVALIDATION_HEARTBEAT_INTERVAL,
+) -> None:
+    """Evict the links that any worker changes from the cache, until cancelled.
+
+    Links are only cached while the listener is connected. Caching is disabled as soon as the connection is lost, and
+    enabled with an empty cache once the listener connects again. The connection is checked whenever no slugs arrived
+    for the heartbeat interval, and counts as lost if the check does not finish within another interval. A lost
+    connection is retried after the retry interval. Returns at once if the database of the engine cannot carry
+    invalidations.
+    """
+    if not invalidation_bus.supports(engine):
+        return
+    cache.disable()
+    while True:
+        try:
+            subscription = await invalidation_bus.subscribe(engine)
+        except Exception:
+            logger.exception("Failed to listen for cache invalidations, retrying in %s seconds", retry_interval)
+            await asyncio.sleep(retry_interval)
+            continue
+        try:
+            cache.enable()
+            while True:
+                try:
+                    slugs = await asyncio.wait_for(subscription.receive(), heartbeat_interval)
+                except TimeoutError:
+                    await asyncio.wait_for(subscription.check(), heartbeat_interval)
+                    continue
+                for slug in slugs:
+                    cache.invalidate(slug)
+        except Exception:
+            logger.exception("Lost the cache invalidation connection, retrying in %s seconds", retry_interval)
+        finally:
+            cache.disable()
+            subscription.close()
+        await asyncio.sleep(retry_interval)
@@ -4,44 +4,137 @@ Main application.
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
+import asyncio
+import contextlib
 import os
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Iterator
 from contextlib import asynccontextmanager
+from datetime import UTC, datetime, timedelta
 from typing import Annotated
 
 import validators
-from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.responses import RedirectResponse, Response
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import Engine
 from sqlmodel import Session
 
-from linker.constants import LINKER_TOKEN_KEY
+from linker.cache import CachedLink, redirect_cache
+from linker.clicks import click_buffer
+from linker.conditional import is_conditional, not_modified, page_version, validator_headers
+from linker.constants import (
+    CLICK_MAINTENANCE_INTERVAL,
+    CLICK_RETENTION_ARCHIVE_DEFAULT,
+    CLICK_RETENTION_ARCHIVE_KEY,
+    CLICK_RETENTION_DAYS_DEFAULT,
+    CLICK_RETENTION_DAYS_KEY,
+    CLICK_WRITE_BEHIND_DEFAULT,
+    CLICK_WRITE_BEHIND_KEY,
+    DEBUG_DEFAULT,
+    DEBUG_KEY,
+    HISTOGRAM_RANGE_DEFAULT,
+    INVALIDATION_RETRY_INTERVAL,
+    LINKER_TOKEN_KEY,
+    NEXT_CURSOR_HEADER,
+    PAGE_SIZE_DEFAULT,
+    PAGE_SIZE_MAX,
+)
 from linker.crud import (
+    InvalidCursorError,
+    InvalidRangeError,
     InvalidSlugError,
     NoAvailableSlugsError,
     SlugAlreadyInUseError,
     SlugNotInUseError,
     TargetUrlAlreadyExistsError,
+    click_histogram,
+    count_visitors,
     create_link,
+    create_links,
     delete_link,
+    delete_links,
     get_link,
+    get_link_version,
+    iter_clicks,
     list_clicks,
     list_links,
     update_link,
     update_link_clicks,
 )
-from linker.database import create_db, get_session
-from linker.models import ClickRead, LinkCreate, LinkRead, LinkUpdate
+from linker.database import (
+    create_db,
+    dispose_engine,
+    get_engine,
+    get_pool_statistics,
+    get_read_session,
+    get_session,
+    pin_reads_to_primary,
+)
+from linker.encoding import encode_clicks, encode_links, json_response
+from linker.environment import get_env_bool, get_env_int
+from linker.export import MEDIA_TYPES, export_clicks
+from linker.invalidation import run_invalidation_listener
+from linker.metrics import METRICS_MEDIA_TYPE, MetricsMiddleware, metrics
+from linker.models import (
+    CacheStatisticsRead,
+    ClickHistogramRead,
+    ClickRead,
+    ExportFormat,
+    HistogramBucket,
+    Link,
+    LinkBatchCreate,
+    LinkBatchDelete,
+    LinkBatchDeleteResult,
+    LinkBatchResult,
+    LinkCreate,
+    LinkRead,
+    LinkUpdate,
+    PoolStatisticsRead,
+    RateLimitStatisticsRead,
+    StartupStatisticsRead,
+    VisitorsRead,
+)
+from linker.partitions import run_click_maintenance
+from linker.queries import QueryCountMiddleware
+from linker.ratelimit import ip_rate_limiter, limit_redirect_rate, slug_rate_limiter
+from linker.sketches import relative_standard_error
+from linker.startup import startup_timings
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:  # noqa: ARG001
-    """Create the database at startup."""
-    create_db()
+    """Create the database and start the background tasks, then stop them and release the connections."""
+    startup_timings.reset()
+    with startup_timings.phase("engine"):
+        engine = get_engine()
+    create_db(engine)
+    if get_env_bool(CLICK_WRITE_BEHIND_KEY, default=CLICK_WRITE_BEHIND_DEFAULT):
+        with startup_timings.phase("click_buffer"):
+            click_buffer.start(engine)
+    retention_days = get_env_int(CLICK_RETENTION_DAYS_KEY, CLICK_RETENTION_DAYS_DEFAULT)
+    click_maintenance = asyncio.create_task(
+        run_click_maintenance(
+            engine,
+            timedelta(days=retention_days) if retention_days > 0 else None,
+            CLICK_MAINTENANCE_INTERVAL,
+            archive=get_env_bool(CLICK_RETENTION_ARCHIVE_KEY, default=CLICK_RETENTION_ARCHIVE_DEFAULT),
+        ),
+    )
+    invalidation_listener = asyncio.create_task(
+        run_invalidation_listener(engine, redirect_cache, INVALIDATION_RETRY_INTERVAL),
+    )
     yield
+    for task in (click_maintenance, invalidation_listener):
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await click_buffer.stop()
+    dispose_engine()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(QueryCountMiddleware, debug=get_env_bool(DEBUG_KEY, default=DEBUG_DEFAULT))
+app.add_middleware(MetricsMiddleware)
 
 security = HTTPBearer()
 
@@ -70,7 +163,7 @@ def forward_to_docs() -> RedirectResponse:
     return RedirectResponse(url="/docs", status_code=307)
 
 
-@app.post("/api/v1/links", dependencies=[Depends(verify_token)])
+@app.post("/api/v1/links", dependencies=[Depends(verify_token), Depends(pin_reads_to_primary)])
 def create_link_endpoint(link_create: LinkCreate, session: Annotated[Session, Depends(get_session)]) -> LinkRead:
     """Create a link with a slug that points to the target url."""
     if not validators.url(link_create.target_url):
@@ -82,24 +175,79 @@ def create_link_endpoint(link_create: LinkCreate, session: Annotated[Session, De
     return LinkRead.from_link(link)
 
 
-@app.get("/api/v1/links", dependencies=[Depends(verify_token)])
-def list_links_endpoint(session: Annotated[Session, Depends(get_session)]) -> list[LinkRead]:
-    """List all links that have a target url."""
-    links = list_links(session)
-    return [LinkRead.from_link(link) for link in links]
+@app.post("/api/v1/links:batch", dependencies=[Depends(verify_token), Depends(pin_reads_to_primary)])
+def create_links_endpoint(
+    link_batch_create: LinkBatchCreate,
+    session: Annotated[Session, Depends(get_session)],
+) -> list[LinkBatchResult]:
+    """Create many links in a single transaction, with a result for each link in the order of the request."""
+    links = link_batch_create.links
+    valid_urls = [bool(validators.url(link_create.target_url)) for link_create in links]
+    created_links = iter(create_links(session, [link for link, valid in zip(links, valid_urls, strict=True) if valid]))
+    results = []
+    for link_create, valid_url in zip(links, valid_urls, strict=True):
+        if not valid_url:
+            error = f"The provided url '{link_create.target_url}' is not valid"
+            results.append(LinkBatchResult(target_url=link_create.target_url, error=error))
+            continue
+        created_link = next(created_links)
+        if isinstance(created_link, Link):
+            results.append(LinkBatchResult(target_url=link_create.target_url, link=LinkRead.from_link(created_link)))
+        else:
+            results.append(LinkBatchResult(target_url=link_create.target_url, error=str(created_link)))
+    return results
+
+
+PageLimit = Annotated[int, Query(ge=1, le=PAGE_SIZE_MAX)]
+
 
+@app.get("/api/v1/links", dependencies=[Depends(verify_token)], response_model=list[LinkRead])
+def list_links_endpoint(
+    session: Annotated[Session, Depends(get_read_session)],
+    request: Request,
+    limit: PageLimit = PAGE_SIZE_DEFAULT,
+    cursor: str | None = None,
+) -> Response:
+    """List a page of links that have a target url. The cursor of the next page is sent in a response header.
+
+    The page is validated by the ids and versions of its links, so an unchanged page is not encoded and sent again.
+    Links advance their versions when they are created, updated, deleted or clicked. The page has no `Last-Modified`
+    header, as the times its links changed do not reveal the links that left it.
+    """
+    try:
+        rows, next_cursor = list_links(session, limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    version = page_version((row_id, row_version) for *_, row_id, row_version in rows)
+    if (not_modified_response := not_modified(request, version, None)) is not None:
+        return not_modified_response
+    headers = validator_headers(version, None)
+    if next_cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return json_response(encode_links(rows), headers)
 
-@app.get("/api/v1/links/{slug}", dependencies=[Depends(verify_token)])
-def get_link_endpoint(slug: str, session: Annotated[Session, Depends(get_session)]) -> LinkRead:
-    """Get a link by its slug."""
+
+@app.get("/api/v1/links/{slug}", dependencies=[Depends(verify_token)], response_model=LinkRead)
+def get_link_endpoint(
+    slug: str,
+    session: Annotated[Session, Depends(get_read_session)],
+    request: Request,
+    response: Response,
+) -> LinkRead | Response:
+    """Get a link by its slug. Conditional requests are answered from the version of the link."""
+    if is_conditional(request) and (link_version := get_link_version(session, slug)) is not None:
+        not_modified_response = not_modified(request, *link_version)
+        if not_modified_response is not None:
+            return not_modified_response
     try:
         link = get_link(session, slug)
     except (InvalidSlugError, SlugNotInUseError) as e:
         raise HTTPException(status_code=404, detail=str(e)) from e
+    response.headers.update(validator_headers(link.version, link.updated_at))
     return LinkRead.from_link(link)
 
 
-@app.patch("/api/v1/links/{slug}", dependencies=[Depends(verify_token)])
+@app.patch("/api/v1/links/{slug}", dependencies=[Depends(verify_token), Depends(pin_reads_to_primary)])
 def update_link_endpoint(
     slug: str,
     link_update: LinkUpdate,
@@ -119,38 +267,166 @@ def update_link_endpoint(
     return LinkRead.from_link(link)
 
 
-@app.delete("/api/v1/links/{slug}", dependencies=[Depends(verify_token)])
+@app.delete("/api/v1/links/{slug}", dependencies=[Depends(verify_token), Depends(pin_reads_to_primary)])
 def delete_link_endpoint(slug: str, session: Annotated[Session, Depends(get_session)]) -> Response:
     """Delete a link by setting its target url to none and resetting clicks."""
     try:
         link = get_link(session, slug)
     except (InvalidSlugError, SlugNotInUseError) as e:
         raise HTTPException(status_code=404, detail=str(e)) from e
+    click_buffer.discard(link.id)  # type: ignore[arg-type]
     delete_link(session, link)
     return Response(status_code=204)
 
 
-@app.get("/{slug}")
+@app.post("/api/v1/links:batchDelete", dependencies=[Depends(verify_token), Depends(pin_reads_to_primary)])
+def delete_links_endpoint(
+    link_batch_delete: LinkBatchDelete,
+    session: Annotated[Session, Depends(get_session)],
+) -> LinkBatchDeleteResult:
+    """Delete many links by setting their target urls to none and resetting clicks. Unused slugs are skipped."""
+    deleted_links = delete_links(session, link_batch_delete.slugs)
+    click_buffer.discard(*deleted_links.values())
+    return LinkBatchDeleteResult(deleted=list(deleted_links))
+
+
+@app.get("/api/v1/stats/pool", dependencies=[Depends(verify_token)])
+def pool_statistics_endpoint(engine: Annotated[Engine, Depends(get_engine)]) -> PoolStatisticsRead:
+    """Get database connection pool usage."""
+    return get_pool_statistics(engine)
+
+
+@app.get("/api/v1/stats/cache", dependencies=[Depends(verify_token)])
+def cache_statistics_endpoint() -> CacheStatisticsRead:
+    """Get redirect cache hit, miss and eviction counters."""
+    return redirect_cache.statistics()
+
+
+@app.get("/api/v1/stats/ratelimit", dependencies=[Depends(verify_token)])
+def rate_limit_statistics_endpoint() -> dict[str, RateLimitStatisticsRead]:
+    """Get the counters of the redirect rate limiters by client ip address and by slug."""
+    return {"ip": ip_rate_limiter.statistics(), "slug": slug_rate_limiter.statistics()}
+
+
+@app.get("/api/v1/stats/startup", dependencies=[Depends(verify_token)])
+def startup_statistics_endpoint() -> StartupStatisticsRead:
+    """Get the durations of the phases of the last startup."""
+    return startup_timings.statistics()
+
+
+@app.get("/metrics", dependencies=[Depends(verify_token)], include_in_schema=False)
+def metrics_endpoint(engine: Annotated[Engine, Depends(get_engine)]) -> Response:
+    """Get request, crud function, database and error metrics in the Prometheus text format."""
+    return Response(content=metrics.render(get_pool_statistics(engine)), media_type=METRICS_MEDIA_TYPE)
+
+
+@app.get("/{slug}", dependencies=[Depends(limit_redirect_rate)])
 def forward_to_target_url(
     slug: str,
     session: Annotated[Session, Depends(get_session)],
     request: Request,
 ) -> RedirectResponse:
-    """Redirect to the target url of the link with the given slug."""
+    """Redirect to the target url of the link with the given slug.
+
+    Links that are not cached are read from the primary rather than the replica, as they are cached for later
+    redirects, and a lagging replica could still return a link that was updated or deleted since.
+    """
+    cached_link = redirect_cache.get(slug)
+    if cached_link is None:
+        generation = redirect_cache.generation()
+        try:
+            link = get_link(session, slug)
+        except (InvalidSlugError, SlugNotInUseError) as e:
+            raise HTTPException(status_code=404, detail=str(e)) from e
+        cached_link = CachedLink(link_id=link.id, target_url=link.target_url)  # type: ignore[arg-type]
+        redirect_cache.set(slug, cached_link, generation)
+    ip_address = request.client.host if request.client is not None else "unknown"
+    if not click_buffer.add(cached_link.link_id, ip_address):
+        update_link_clicks(session, cached_link.link_id, ip_address)
+    return RedirectResponse(url=cached_link.target_url, status_code=307)
+
+
+@app.get("/api/v1/links/{slug}/clicks", dependencies=[Depends(verify_token)], response_model=list[ClickRead])
+def list_clicks_endpoint(
+    slug: str,
+    session: Annotated[Session, Depends(get_read_session)],
+    limit: PageLimit = PAGE_SIZE_DEFAULT,
+    cursor: str | None = None,
+) -> Response:
+    """List a page of clicks for a given link. The cursor of the next page is sent in a response header."""
     try:
         link = get_link(session, slug)
     except (InvalidSlugError, SlugNotInUseError) as e:
         raise HTTPException(status_code=404, detail=str(e)) from e
-    ip_address = request.client.host if request.client is not None else "unknown"
-    update_link_clicks(session, link, ip_address)
-    return RedirectResponse(url=str(link.target_url), status_code=307)
+    try:
+        rows, next_cursor = list_clicks(session, link, limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor is not None else {}
+    return json_response(encode_clicks(rows), headers)
 
 
-@app.get("/api/v1/links/{slug}/clicks", dependencies=[Depends(verify_token)])
-def list_clicks_endpoint(slug: str, session: Annotated[Session, Depends(get_session)]) -> list[ClickRead]:
-    """List all clicks for a given link."""
+@app.get("/api/v1/links/{slug}/visitors", dependencies=[Depends(verify_token)])
+def count_visitors_endpoint(
+    slug: str,
+    session: Annotated[Session, Depends(get_read_session)],
+) -> VisitorsRead:
+    """Estimate the number of unique visitors of a link, by the ip addresses of its clicks.
+
+    The estimate comes from a fixed size sketch, so it is served in constant time. Its relative standard error is
+    returned with it, and about 95% of the estimates are within two standard errors of the exact count.
+    """
     try:
         link = get_link(session, slug)
     except (InvalidSlugError, SlugNotInUseError) as e:
         raise HTTPException(status_code=404, detail=str(e)) from e
-    return [ClickRead.from_click(click) for click in list_clicks(session, link)]
+    visitors = count_visitors(session, link)
+    return VisitorsRead(visitors=round(visitors), relative_standard_error=relative_standard_error())
+
+
+@app.get("/api/v1/links/{slug}/clicks/histogram", dependencies=[Depends(verify_token)])
+def click_histogram_endpoint(
+    slug: str,
+    session: Annotated[Session, Depends(get_read_session)],
+    bucket: HistogramBucket = HistogramBucket.HOUR,
+    start: Annotated[datetime | None, Query(alias="from")] = None,
+    end: Annotated[datetime | None, Query(alias="to")] = None,
+) -> list[ClickHistogramRead]:
+    """Count the clicks of a link per hour or day. The range defaults to the last seven days."""
+    try:
+        link = get_link(session, slug)
+    except (InvalidSlugError, SlugNotInUseError) as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    end = end if end is not None else datetime.now(tz=UTC)
+    start = start if start is not None else end - HISTOGRAM_RANGE_DEFAULT
+    try:
+        histogram = click_histogram(session, link, bucket, start, end)
+    except InvalidRangeError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    return [ClickHistogramRead(bucket_start=bucket_start, count=count) for bucket_start, count in histogram]
+
+
+@app.get("/api/v1/links/{slug}/clicks/export", dependencies=[Depends(verify_token)])
+def export_clicks_endpoint(
+    slug: str,
+    session: Annotated[Session, Depends(get_read_session)],
+    export_format: Annotated[ExportFormat, Query(alias="format")] = ExportFormat.NDJSON,
+) -> StreamingResponse:
+    """Stream all clicks for a given link as newline delimited json or csv."""
+    try:
+        link = get_link(session, slug)
+    except (InvalidSlugError, SlugNotInUseError) as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+
+    def stream() -> Iterator[str]:
+        # The session dependency is closed before the body is streamed, so the stream releases the connection it uses.
+        try:
+            yield from export_clicks(iter_clicks(session, link), export_format)
+        finally:
+            session.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{slug}-clicks.{export_format}"'},
+    )
@@ -0,0 +1,262 @@
+"""
+Request, crud function, database query and error metrics, rendered in the Prometheus text format.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import Connection, Engine, event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from linker.constants import METRICS_DURATION_BUCKETS
+from linker.models import PoolStatisticsRead
+from linker.queries import record_query
+
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# The redirect is served under this route, and is labelled apart from the api routes.
+REDIRECT_ROUTE = "/{slug}"
+
+# Name of the crud function that is running in the current context, so its queries are labelled with it.
+_crud_function: ContextVar[str | None] = ContextVar("crud_function", default=None)
+
+
+class Histogram:
+    """Counts of observed durations in seconds per bucket, with their sum and count."""
+
+    __slots__ = ("buckets", "count", "counts", "sum")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        """Initialize an empty histogram with the given upper bounds of its buckets."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Count a value in the first bucket whose upper bound is not less than it."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Process-wide counters and duration histograms."""
+
+    def __init__(self, buckets: tuple[float, ...] = METRICS_DURATION_BUCKETS) -> None:
+        """Initialize without observations.
+
+        Args:
+            buckets (tuple[float, ...]): Upper bounds of the buckets of the duration histograms, in seconds.
+        """
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.requests: dict[tuple[str, str, str, int], int] = {}
+        self.request_durations: dict[tuple[str, str], Histogram] = {}
+        self.crud_durations: dict[str, Histogram] = {}
+        self.query_durations: dict[str, Histogram] = {}
+        self.errors: dict[str, int] = {}
+
+    def observe_request(self, route: str, method: str, status: int, seconds: float) -> None:
+        """Count a request to a route and record its duration."""
+        handler = "redirect" if route == REDIRECT_ROUTE else "api"
+        with self._lock:
+            key = (handler, route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self._histogram(self.request_durations, (handler, route)).observe(seconds)
+
+    def observe_crud(self, function: str, seconds: float) -> None:
+        """Record the duration of a call of a crud function."""
+        with self._lock:
+            self._histogram(self.crud_durations, function).observe(seconds)
+
+    def observe_query(self, function: str, seconds: float) -> None:
+        """Record the duration of a database query run by a crud function."""
+        with self._lock:
+            self._histogram(self.query_durations, function).observe(seconds)
+
+    def count_errors(self, errors: Iterable[str]) -> None:
+        """Count errors by the names of their classes."""
+        with self._lock:
+            for error in errors:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+    def reset(self) -> None:
+        """Forget all observations."""
+        with self._lock:
+            self.requests.clear()
+            self.request_durations.clear()
+            self.crud_durations.clear()
+            self.query_durations.clear()
+            self.errors.clear()
+
+    def render(self, pool: PoolStatisticsRead) -> str:
+        """Render the metrics and the connection pool usage in the Prometheus text format."""
+        lines: list[str] = []
+        with self._lock:
+            _render_header(lines, "linker_http_requests_total", "counter", "Number of handled requests.")
+            for (handler, route, method, status), count in sorted(self.requests.items()):
+                labels = _labels(handler=handler, route=route, method=method, status=str(status))
+                lines.append(f"linker_http_requests_total{{{labels}}} {count}")
+            _render_histograms(
+                lines,
+                "linker_http_request_duration_seconds",
+                "Duration of handled requests.",
+                {_labels(handler=handler, route=route): h for (handler, route), h in self.request_durations.items()},
+            )
+            _render_histograms(
+                lines,
+                "linker_crud_duration_seconds",
+                "Duration of crud function calls.",
+                {_labels(function=function): h for function, h in self.crud_durations.items()},
+            )
+            _render_histograms(
+                lines,
+                "linker_db_query_duration_seconds",
+                "Duration of database queries, by the crud function that ran them.",
+                {_labels(function=function): h for function, h in self.query_durations.items()},
+            )
+            _render_header(lines, "linker_crud_errors_total", "counter", "Number of errors of crud functions.")
+            for error, count in sorted(self.errors.items()):
+                lines.append(f"linker_crud_errors_total{{{_labels(error=error)}}} {count}")
+        for name, value, description in (
+            ("linker_db_pool_size", pool.pool_size, "Number of connections the pool keeps open."),
+            ("linker_db_pool_checked_in", pool.checked_in, "Number of idle connections in the pool."),
+            ("linker_db_pool_checked_out", pool.checked_out, "Number of connections in use."),
+            ("linker_db_pool_overflow", pool.overflow, "Number of connections opened beyond the pool size."),
+        ):
+            _render_header(lines, name, "gauge", description)
+            lines.append(f"{name} {value}")
+        _render_header(lines, "linker_db_pool_checkouts_total", "counter", "Number of connection checkouts.")
+        lines.append(f"linker_db_pool_checkouts_total {pool.checkouts}")
+        _render_header(
+            lines,
+            "linker_db_pool_wait_seconds_total",
+            "counter",
+            "Time spent waiting for connection checkouts.",
+        )
+        lines.append(f"linker_db_pool_wait_seconds_total {pool.wait_seconds_total}")
+        return "\n".join(lines) + "\n"
+
+    def _histogram[K](self, histograms: dict[K, Histogram], key: K) -> Histogram:
+        """Get the histogram of a key, creating it on first use. Must be called with the lock held."""
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(self.buckets)
+        return histogram
+
+
+def _labels(**labels: str) -> str:
+    """Format labels, escaping their values."""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in labels.items()
+    )
+    return ",".join(f'{name}="{value}"' for name, value in escaped)
+
+
+def _render_header(lines: list[str], name: str, metric_type: str, description: str) -> None:
+    """Add the help and type lines of a metric."""
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {metric_type}")
+
+
+def _render_histograms(lines: list[str], name: str, description: str, histograms: dict[str, Histogram]) -> None:
+    """Add the cumulative buckets, the sum and the count of each labelled histogram of a metric."""
+    _render_header(lines, name, "histogram", description)
+    for labels, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip((*map(str, histogram.buckets), "+Inf"), histogram.counts, strict=True):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+metrics = Metrics()
+
+
+def instrument[**P, T](function: Callable[P, T]) -> Callable[P, T]:
+    """Record the duration and the errors of a crud function, and label the queries it runs with its name.
+
+    Errors are only counted by the outermost crud function they pass through, so they are counted once.
+    """
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        outermost = _crud_function.get() is None
+        token = _crud_function.set(name)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except Exception as e:
+            if outermost:
+                metrics.count_errors([type(e).__name__])
+            raise
+        finally:
+            metrics.observe_crud(name, time.perf_counter() - start)
+            _crud_function.reset(token)
+
+    return wrapper
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Record the duration of every query run on an engine, labelled with the crud function that runs it.
+
+    Queries are also counted for the request that runs them, see `linker.queries`. Instrumenting an engine again has no
+    effect.
+    """
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(connection: Connection, *_: Any) -> None:  # noqa: ANN401
+    connection.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(connection: Connection, _cursor: Any, statement: str, *_: Any) -> None:  # noqa: ANN401
+    seconds = time.perf_counter() - connection.info["query_start"].pop()
+    metrics.observe_query(_crud_function.get() or "other", seconds)
+    record_query(seconds, statement)
+
+
+class MetricsMiddleware:
+    """Count the requests to each route and record their durations.
+
+    The route template is read from the scope after the request is handled, so requests are labelled by route rather
+    than by path, and the redirect does not create a label for every slug.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Wrap an application."""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle a request and record it once the response is sent."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            metrics.observe_request(path, scope["method"], status, time.perf_counter() - start)
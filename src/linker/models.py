@@ -5,17 +5,35 @@ Data structure schemas.
 """
 
 from datetime import UTC, datetime
+from enum import StrEnum
 
-from sqlmodel import Field, Relationship, SQLModel
+from sqlmodel import Field, Index, Relationship, SQLModel, text
+
+from linker.constants import LINK_BATCH_SIZE_MAX
 
 
 # TODO: Change the target_url to be BASE64 encoded so GET requests can send the url without issues.
 class Link(SQLModel, table=True):
     """Link model saved in the database."""
 
+    # Partial index over the free slugs, so claiming one does not scan the slugs that are already in use.
+    __table_args__ = (
+        Index(
+            "ix_link_free_id",
+            "id",
+            postgresql_where=text("target_url IS NULL"),
+            sqlite_where=text("target_url IS NULL"),
+        ),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     slug: str = Field(index=True, unique=True)
-    target_url: str | None = Field(index=True)
+    target_url: str | None = None
+    target_url_hash: str | None = Field(default=None, unique=True, index=True, max_length=64)
+    click_count: int = Field(default=0)
+    # Advanced with every change of the link that shows in `LinkRead`, to validate conditional requests.
+    version: int = Field(default=0)
+    updated_at: datetime | None = None
     clicks: list["Click"] = Relationship(back_populates="link")
 
 
@@ -26,6 +44,12 @@ class LinkCreate(SQLModel):
     target_url: str
 
 
+class LinkBatchCreate(SQLModel):
+    """Data model for creating many links at once."""
+
+    links: list[LinkCreate] = Field(max_length=LINK_BATCH_SIZE_MAX)
+
+
 class LinkRead(SQLModel):
     """Data model for reading a link."""
 
@@ -39,19 +63,60 @@ class LinkRead(SQLModel):
         return cls(
             slug=link.slug,
             target_url=link.target_url,
-            clicks=len(link.clicks),
+            clicks=link.click_count,
         )
 
 
+# Columns of a link listed by `linker.crud.list_links`: slug, target url, click count, id and version.
+type LinkRow = tuple[str, str | None, int, int, int]
+
+
+class LinkBatchResult(SQLModel):
+    """Data model for reading the result of creating one link of a batch."""
+
+    target_url: str
+    link: LinkRead | None = None
+    error: str | None = None
+
+
+class LinkBatchDelete(SQLModel):
+    """Data model for deleting many links at once."""
+
+    slugs: list[str] = Field(max_length=LINK_BATCH_SIZE_MAX)
+
+
+class LinkBatchDeleteResult(SQLModel):
+    """Data model for reading the result of deleting many links at once."""
+
+    deleted: list[str]
+
+
 class LinkUpdate(SQLModel):
     """Data model for updating a link."""
 
     target_url: str
 
 
+class SlugSequence(SQLModel, table=True):
+    """Counter of the slug indexes that were handed out, kept in a single row."""
+
+    id: int = Field(default=1, primary_key=True)
+    value: int = Field(default=0)
+
+
+class SchemaVersion(SQLModel, table=True):
+    """Version of the schema the database was last brought up to date with, kept in a single row."""
+
+    id: int = Field(default=1, primary_key=True)
+    version: int
+
+
 class Click(SQLModel, table=True):
     """Click model saved in the database."""
 
+    # Covers keyset pagination of the clicks of a link, newest first.
+    __table_args__ = (Index("ix_click_link_id_timestamp_id", "link_id", "timestamp", "id"),)
+
     id: int | None = Field(default=None, primary_key=True)
     timestamp: datetime = Field(default_factory=lambda: datetime.now(tz=UTC))
     ip_address: str
@@ -60,6 +125,28 @@ class Click(SQLModel, table=True):
     link: Link = Relationship(back_populates="clicks")
 
 
+class ClickRollup(SQLModel, table=True):
+    """Number of clicks of a link per hour, maintained as clicks are recorded."""
+
+    link_id: int = Field(foreign_key="link.id", primary_key=True)
+    bucket_start: datetime = Field(primary_key=True)
+    count: int = Field(default=0)
+
+
+class VisitorSketch(SQLModel, table=True):
+    """HyperLogLog sketch of the ip addresses that clicked a link, maintained as clicks are recorded."""
+
+    link_id: int = Field(foreign_key="link.id", primary_key=True)
+    registers: bytes
+
+
+class VisitorsRead(SQLModel):
+    """Data model for reading the estimated number of unique visitors of a link."""
+
+    visitors: int
+    relative_standard_error: float
+
+
 class ClickRead(SQLModel):
     """Data model for reading a click."""
 
@@ -73,3 +160,70 @@ class ClickRead(SQLModel):
             timestamp=click.timestamp,
             ip_address=click.ip_address,
         )
+
+
+# Columns of a click listed by `linker.crud.list_clicks`: timestamp, ip address and id.
+type ClickRow = tuple[datetime, str, int]
+
+
+class ExportFormat(StrEnum):
+    """File formats that clicks can be exported in."""
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class HistogramBucket(StrEnum):
+    """Widths of the buckets that clicks can be counted in."""
+
+    HOUR = "hour"
+    DAY = "day"
+
+
+class ClickHistogramRead(SQLModel):
+    """Data model for reading the number of clicks in a bucket of a histogram."""
+
+    bucket_start: datetime
+    count: int
+
+
+class PoolStatisticsRead(SQLModel):
+    """Data model for reading database connection pool statistics."""
+
+    pool_size: int = 0
+    checked_in: int = 0
+    checked_out: int = 0
+    overflow: int = 0
+    checkouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+class CacheStatisticsRead(SQLModel):
+    """Data model for reading redirect cache statistics."""
+
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+
+
+class RateLimitStatisticsRead(SQLModel):
+    """Data model for reading the statistics of a redirect rate limiter."""
+
+    size: int
+    max_size: int
+    per_minute: int
+    burst: int
+    allowed: int
+    rejected: int
+    evictions: int
+
+
+class StartupStatisticsRead(SQLModel):
+    """Data model for reading the durations of the startup phases in seconds."""
+
+    phases: dict[str, float]
+    total_seconds: float
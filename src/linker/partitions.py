@@ -0,0 +1,212 @@
+"""
+Monthly partitions of the click table and retention of expired clicks.
+
+On PostgreSQL the click table is partitioned by the month of the click timestamp, so expired clicks are removed by
+dropping or detaching whole partitions. Other databases delete expired clicks in chunks. The click counts of links
+and the hourly rollups are kept, so totals and histograms still cover expired clicks.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import asyncio
+import logging
+import re
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import Connection, Engine, text
+from sqlmodel import Session, delete, select
+
+from linker.constants import CLICK_PARTITIONS_AHEAD, CLICK_PURGE_CHUNK_SIZE
+from linker.models import Click
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME_PATTERN = re.compile(r"^click_(before_)?y(\d{4})m(\d{2})$")
+
+
+def month_start(value: datetime) -> datetime:
+    """Get the start of the month of a datetime, as a naive datetime in UTC like stored timestamps."""
+    if value.tzinfo is not None:
+        value = value.astimezone(UTC).replace(tzinfo=None)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Move the start of a month by a number of months."""
+    year, month_index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + year, month=month_index + 1)
+
+
+def partition_name(month: datetime) -> str:
+    """Get the name of the partition that holds the clicks of a month."""
+    return f"click_y{month.year:04d}m{month.month:02d}"
+
+
+def legacy_partition_name(cutover: datetime) -> str:
+    """Get the name of the partition that holds the clicks recorded before the click table was partitioned."""
+    return f"click_before_y{cutover.year:04d}m{cutover.month:02d}"
+
+
+def is_click_table_partitioned(connection: Connection) -> bool:
+    """Check whether the click table is a partitioned table. Always false on databases other than PostgreSQL."""
+    if connection.dialect.name != "postgresql":
+        return False
+    statement = text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'click'::regclass)")
+    return bool(connection.execute(statement).scalar())
+
+
+def get_click_partitions(connection: Connection) -> dict[str, tuple[datetime | None, datetime]]:
+    """Get the start and the end month of the named partitions of the click table, by partition name.
+
+    The partition of the clicks recorded before the table was partitioned has no start month. The default partition is
+    not included.
+    """
+    partitions: dict[str, tuple[datetime | None, datetime]] = {}
+    statement = text("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'click'::regclass")
+    for name in connection.execute(statement).scalars():
+        match = PARTITION_NAME_PATTERN.match(name)
+        if match is None:
+            continue
+        month = datetime(int(match[2]), int(match[3]), 1)  # noqa: DTZ001
+        partitions[name] = (None, month) if match[1] else (month, add_months(month, 1))
+    return partitions
+
+
+def create_click_partitions(connection: Connection, start: datetime, end: datetime) -> None:
+    """Create the monthly partitions of the click table from the month of start up to and including the end month.
+
+    Months that are still covered by the partition of the clicks recorded before the table was partitioned are skipped.
+    """
+    cutovers = [cutover for first, cutover in get_click_partitions(connection).values() if first is None]
+    month = max([month_start(start), *cutovers])
+    while month <= end:
+        next_month = add_months(month, 1)
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF click "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')",
+            ),
+        )
+        month = next_month
+
+
+def partition_click_table(engine: Engine) -> None:
+    """Convert the click table into a table partitioned by month on PostgreSQL.
+
+    The existing table is attached as a partition that holds every click before a cutover month, instead of copying
+    its rows. A validated check constraint proves that its rows fit the partition and a concurrently built unique
+    index backs the primary key, so the attach does not scan the table while holding its exclusive lock. Both are
+    prepared without blocking writes. Nothing is done on other databases or if the table is already partitioned. The
+    primary key of the partitioned table includes the timestamp, as PostgreSQL requires.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.connect() as connection:
+        if is_click_table_partitioned(connection):
+            return
+    # Clicks recorded while the table is prepared must still fit the legacy partition, so the cutover is at least a
+    # month away.
+    cutover = add_months(month_start(datetime.now(tz=UTC)), 2)
+    legacy = legacy_partition_name(cutover)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ALTER TABLE click DROP CONSTRAINT IF EXISTS click_partition_bound"))
+        connection.execute(
+            text(
+                "ALTER TABLE click ADD CONSTRAINT click_partition_bound "
+                f"""CHECK ("timestamp" < '{cutover.isoformat()}') NOT VALID""",
+            ),
+        )
+        connection.execute(text("ALTER TABLE click VALIDATE CONSTRAINT click_partition_bound"))
+        # An index left invalid by an interrupted build is not reused.
+        connection.execute(text("DROP INDEX CONCURRENTLY IF EXISTS click_id_timestamp_key"))
+        connection.execute(text('CREATE UNIQUE INDEX CONCURRENTLY click_id_timestamp_key ON click (id, "timestamp")'))
+
+    with engine.begin() as connection:
+        connection.execute(text("LOCK TABLE click IN ACCESS EXCLUSIVE MODE"))
+        # Another replica may have partitioned the table while the lock was awaited.
+        if is_click_table_partitioned(connection):
+            return
+        connection.execute(text(f"ALTER TABLE click RENAME TO {legacy}"))
+        connection.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT click_pkey TO {legacy}_pkey"))
+        for index in Click.__table__.indexes:  # type: ignore[attr-defined]
+            connection.execute(text(f"ALTER INDEX IF EXISTS {index.name} RENAME TO {legacy}_{index.name}"))
+        connection.execute(text("ALTER SEQUENCE click_id_seq OWNED BY NONE"))
+        connection.execute(
+            text(
+                f"CREATE TABLE click (LIKE {legacy} INCLUDING DEFAULTS, "
+                'PRIMARY KEY (id, "timestamp"), FOREIGN KEY (link_id) REFERENCES link (id)) '
+                'PARTITION BY RANGE ("timestamp")',
+            ),
+        )
+        connection.execute(
+            text(
+                f"ALTER TABLE click ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ('{cutover.isoformat()}')",
+            ),
+        )
+        connection.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT click_partition_bound"))
+        # Catches clicks outside of the created months, so inserts never fail for a missing partition.
+        connection.execute(text("CREATE TABLE click_default PARTITION OF click DEFAULT"))
+        create_click_partitions(connection, cutover, add_months(cutover, CLICK_PARTITIONS_AHEAD))
+        connection.execute(text("ALTER SEQUENCE click_id_seq OWNED BY click.id"))
+        # The indexes of the legacy partition are attached to the new ones instead of being built again.
+        for index in Click.__table__.indexes:  # type: ignore[attr-defined]
+            index.create(connection)
+
+
+def expire_clicks(engine: Engine, retention: timedelta, *, archive: bool = False) -> None:
+    """Remove the clicks that are older than the retention horizon.
+
+    Partitions are dropped, or detached if archived, once their whole month is older than the horizon, so a partition
+    is removed at most a month after its newest click expires. The partition of the clicks recorded before the table
+    was partitioned is removed once its cutover month is older than the horizon. Without partitions, expired clicks
+    are deleted in chunks that are committed one by one.
+
+    Args:
+        engine (Engine): Database engine.
+        retention (timedelta): Age after which clicks expire.
+        archive (bool): Detach expired partitions and keep them as standalone tables instead of dropping them.
+    """
+    horizon = (datetime.now(tz=UTC) - retention).replace(tzinfo=None)
+    with engine.begin() as connection:
+        if is_click_table_partitioned(connection):
+            for name, (_, end) in get_click_partitions(connection).items():
+                if end > horizon:
+                    continue
+                action = f"ALTER TABLE click DETACH PARTITION {name}" if archive else f"DROP TABLE {name}"
+                connection.execute(text(action))
+                logger.info("%s expired click partition '%s'", "Detached" if archive else "Dropped", name)
+            return
+
+    chunk = select(Click.id).where(Click.timestamp < horizon).limit(CLICK_PURGE_CHUNK_SIZE)
+    with Session(engine) as session:
+        while True:
+            result = session.execute(delete(Click).where(Click.id.in_(chunk)))  # type: ignore[union-attr]
+            session.commit()
+            if result.rowcount < CLICK_PURGE_CHUNK_SIZE:  # type: ignore[attr-defined]
+                return
+
+
+def maintain_clicks(engine: Engine, retention: timedelta | None, *, archive: bool = False) -> None:
+    """Create the partitions of the upcoming months and remove expired clicks if a retention is configured."""
+    with engine.begin() as connection:
+        if is_click_table_partitioned(connection):
+            now = datetime.now(tz=UTC)
+            create_click_partitions(connection, now, add_months(month_start(now), CLICK_PARTITIONS_AHEAD))
+    if retention is not None:
+        expire_clicks(engine, retention, archive=archive)
+
+
+async def run_click_maintenance(
+    engine: Engine,
+    retention: timedelta | None,
+    interval: float,
+    *,
+    archive: bool = False,
+) -> None:
+    """Maintain the click storage periodically until cancelled. Failures are logged and retried at the next run."""
+    while True:
+        try:
+            await asyncio.to_thread(maintain_clicks, engine, retention, archive=archive)
+        except Exception:
+            logger.exception("Failed to maintain the click storage")
+        await asyncio.sleep(interval)
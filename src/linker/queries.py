@@ -0,0 +1,118 @@
+"""
+Per-request counts of the database queries and the time spent running them.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from linker.constants import QUERY_COUNT_HEADER, QUERY_SECONDS_HEADER
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """Number of queries and their total duration in seconds, and optionally their statements."""
+
+    __slots__ = ("count", "parent", "seconds", "statements")
+
+    def __init__(self, parent: "QueryCounter | None" = None, *, statements: bool = False) -> None:
+        """Initialize without queries.
+
+        Args:
+            parent (QueryCounter | None): Counter of the enclosing block, which also counts the queries of this one.
+            statements (bool): Whether to keep the statements of the queries.
+        """
+        self.count = 0
+        self.seconds = 0.0
+        self.parent = parent
+        self.statements: list[str] | None = [] if statements else None
+
+    def record(self, seconds: float, statement: str) -> None:
+        """Count a query that took the given number of seconds, here and in the enclosing counters."""
+        counter: QueryCounter | None = self
+        while counter is not None:
+            counter.count += 1
+            counter.seconds += seconds
+            if counter.statements is not None:
+                counter.statements.append(statement)
+            counter = counter.parent
+
+
+# Counter of the request that is handled in the current context. Worker threads and greenlets that run the request
+# copy the context, so they share the counter instead of replacing it.
+_query_counter: ContextVar[QueryCounter | None] = ContextVar("query_counter", default=None)
+
+
+@contextmanager
+def count_queries(*, statements: bool = False) -> Iterator[QueryCounter]:
+    """Count the queries that are run in the current context on engines instrumented by `instrument_engine`.
+
+    Queries of nested blocks are also counted by the enclosing ones.
+
+    Args:
+        statements (bool): Whether to keep the statements of the queries.
+    """
+    counter = QueryCounter(_query_counter.get(), statements=statements)
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
+def record_query(seconds: float, statement: str) -> None:
+    """Count a query in the counter of the current context, if queries are counted."""
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.record(seconds, statement)
+
+
+class QueryCountMiddleware:
+    """Count the queries each request runs and log them at debug level.
+
+    In debug mode the count and the total duration are also sent in response headers. Queries that run while a
+    streaming response body is sent are logged, but are not part of the headers.
+    """
+
+    def __init__(self, app: ASGIApp, *, debug: bool) -> None:
+        """Wrap an application.
+
+        Args:
+            app (ASGIApp): Application to wrap.
+            debug (bool): Whether to send the query count and duration in response headers.
+        """
+        self.app = app
+        self.debug = debug
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle a request while counting its queries."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as counter:
+
+            async def send_with_query_count(message: Message) -> None:
+                if self.debug and message["type"] == "http.response.start":
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (QUERY_COUNT_HEADER.lower().encode(), str(counter.count).encode()),
+                        (QUERY_SECONDS_HEADER.lower().encode(), f"{counter.seconds:.6f}".encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_query_count)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "%s %s ran %d queries in %.3f seconds",
+                scope["method"],
+                scope["path"],
+                counter.count,
+                counter.seconds,
+            )
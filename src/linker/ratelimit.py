@@ -0,0 +1,135 @@
+"""
+In-process token bucket rate limiting of the redirect endpoint, by client ip address and by slug.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+
+from linker.constants import (
+    RATE_LIMIT_IP_BURST_DEFAULT,
+    RATE_LIMIT_IP_BURST_KEY,
+    RATE_LIMIT_IP_PER_MINUTE_DEFAULT,
+    RATE_LIMIT_IP_PER_MINUTE_KEY,
+    RATE_LIMIT_SIZE_DEFAULT,
+    RATE_LIMIT_SIZE_KEY,
+    RATE_LIMIT_SLUG_BURST_DEFAULT,
+    RATE_LIMIT_SLUG_BURST_KEY,
+    RATE_LIMIT_SLUG_PER_MINUTE_DEFAULT,
+    RATE_LIMIT_SLUG_PER_MINUTE_KEY,
+)
+from linker.environment import get_env_int
+from linker.models import RateLimitStatisticsRead
+
+
+class RateLimiter:
+    """Token buckets of keys in a bounded map, refilled at a steady rate up to a burst size.
+
+    A bucket that has been idle long enough to refill is indistinguishable from a new one, so it expires from the map.
+    When the map is full, the least recently used bucket is evicted.
+    """
+
+    def __init__(self, per_minute: int, burst: int, max_size: int) -> None:
+        """Initialize without buckets.
+
+        Args:
+            per_minute (int): Number of tokens a bucket gains per minute. Rate limiting is disabled if zero.
+            burst (int): Number of tokens a full bucket holds.
+            max_size (int): Maximum number of buckets kept.
+        """
+        self.per_minute = per_minute
+        self.burst = burst
+        self.max_size = max_size
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def acquire(self, key: str) -> float:
+        """Take a token from the bucket of a key.
+
+        Returns:
+            float: Zero if a token was taken, otherwise the number of seconds until the bucket has a token again.
+        """
+        if self.per_minute <= 0:
+            return 0
+        rate = self.per_minute / 60
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * rate)
+            self._expire(now - self.burst / rate)
+            if tokens >= 1:
+                tokens -= 1
+                self.allowed += 1
+                wait_seconds = 0.0
+            else:
+                self.rejected += 1
+                wait_seconds = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+            return wait_seconds
+
+    def _expire(self, idle_since: float) -> None:
+        """Remove the buckets that have not been used since the given time. Must be called with the lock held."""
+        while self._buckets:
+            _, updated_at = next(iter(self._buckets.values()))
+            if updated_at > idle_since:
+                return
+            self._buckets.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all buckets and reset the counters."""
+        with self._lock:
+            self._buckets.clear()
+            self.allowed = 0
+            self.rejected = 0
+            self.evictions = 0
+
+    def statistics(self) -> RateLimitStatisticsRead:
+        """Get the configuration, the size and the counters of the rate limiter."""
+        with self._lock:
+            return RateLimitStatisticsRead(
+                size=len(self._buckets),
+                max_size=self.max_size,
+                per_minute=self.per_minute,
+                burst=self.burst,
+                allowed=self.allowed,
+                rejected=self.rejected,
+                evictions=self.evictions,
+            )
+
+
+ip_rate_limiter = RateLimiter(
+    per_minute=get_env_int(RATE_LIMIT_IP_PER_MINUTE_KEY, RATE_LIMIT_IP_PER_MINUTE_DEFAULT),
+    burst=get_env_int(RATE_LIMIT_IP_BURST_KEY, RATE_LIMIT_IP_BURST_DEFAULT),
+    max_size=get_env_int(RATE_LIMIT_SIZE_KEY, RATE_LIMIT_SIZE_DEFAULT),
+)
+slug_rate_limiter = RateLimiter(
+    per_minute=get_env_int(RATE_LIMIT_SLUG_PER_MINUTE_KEY, RATE_LIMIT_SLUG_PER_MINUTE_DEFAULT),
+    burst=get_env_int(RATE_LIMIT_SLUG_BURST_KEY, RATE_LIMIT_SLUG_BURST_DEFAULT),
+    max_size=get_env_int(RATE_LIMIT_SIZE_KEY, RATE_LIMIT_SIZE_DEFAULT),
+)
+
+
+async def limit_redirect_rate(slug: str, request: Request) -> None:
+    """Reject a redirect with 429 if its client or its slug has run out of tokens, before any database work is done.
+
+    The check runs on the event loop rather than in the threadpool, so rejecting a request is cheap.
+    """
+    ip_address = request.client.host if request.client is not None else "unknown"
+    wait_seconds = ip_rate_limiter.acquire(ip_address) or slug_rate_limiter.acquire(slug)
+    if wait_seconds:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(wait_seconds))},
+        )
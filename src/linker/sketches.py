@@ -0,0 +1,78 @@
+"""
+HyperLogLog sketches that estimate the number of distinct values seen, such as the unique visitors of a link.
+
+A sketch keeps `2**precision` registers of one byte. Each value is hashed, the first `precision` bits of its hash
+select a register, and the register keeps the highest position of the first set bit in the rest of the hashes it
+was given. The estimate is derived from the harmonic mean of the registers, so a sketch has a fixed size whatever
+the number of values, and sketches of disjoint sets of values merge by taking the maximum of each register.
+
+With the default precision of 10 a sketch takes 1 KiB, and the relative standard error of its estimate is
+1.04 / sqrt(1024), about 3.25%. About 95% of the estimates are within two standard errors of the exact count.
+Small counts are estimated by linear counting of the empty registers, which is close to exact.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import hashlib
+import math
+
+from linker.constants import VISITOR_SKETCH_PRECISION
+
+HASH_BITS = 64
+
+
+def relative_standard_error(precision: int = VISITOR_SKETCH_PRECISION) -> float:
+    """Get the relative standard error of the estimates of sketches with the given precision."""
+    return 1.04 / math.sqrt(1 << precision)
+
+
+class HyperLogLog:
+    """Sketch of the distinct values added to it."""
+
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, registers: bytes | None = None, precision: int = VISITOR_SKETCH_PRECISION) -> None:
+        """Initialize a sketch from the registers of a stored sketch, or an empty sketch.
+
+        Args:
+            registers (bytes | None): Registers of a stored sketch of the same precision.
+            precision (int): Number of hash bits that select a register.
+        """
+        self.precision = precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(1 << precision)
+        if len(self.registers) != 1 << precision:
+            msg = f"Sketch of precision {precision} must have {1 << precision} registers, got {len(self.registers)}"
+            raise ValueError(msg)
+
+    def add(self, value: str) -> bool:
+        """Add a value to the sketch.
+
+        Returns:
+            bool: Whether a register changed, so the sketch needs to be stored again.
+        """
+        hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=HASH_BITS // 8).digest())
+        rest_bits = HASH_BITS - self.precision
+        index = hashed >> rest_bits
+        rank = rest_bits - (hashed & ((1 << rest_bits) - 1)).bit_length() + 1
+        if rank <= self.registers[index]:
+            return False
+        self.registers[index] = rank
+        return True
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Add the values of another sketch of the same precision to this sketch."""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self) -> float:
+        """Estimate the number of distinct values added to the sketch."""
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        raw_estimate = alpha * size * size / math.fsum(2.0**-register for register in self.registers)
+        empty_registers = self.registers.count(0)
+        if raw_estimate <= 2.5 * size and empty_registers:
+            return size * math.log(size / empty_registers)
+        return raw_estimate
+
+    def to_bytes(self) -> bytes:
+        """Get the registers of the sketch to store them."""
+        return bytes(self.registers)
@@ -4,7 +4,11 @@ Slugs generated from adjectives and Pokémon names.
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
+import hashlib
 import random
+from collections.abc import Sequence
+
+from linker.constants import SLUG_PERMUTATION_ROUNDS, SLUG_PERMUTATION_SEED, SLUG_SUFFIX_COUNT
 
 pokemons = [
     "bulbasaur",
@@ -167,3 +171,84 @@ def get_slugs(seed: int = 42) -> list[str]:
     slugs = [f"{adjective}-{pokemon}" for adjective in adjectives for pokemon in pokemons]
     random.Random(seed).shuffle(slugs)  # noqa: S311
     return slugs
+
+
+class SlugSpace:
+    """Space of slugs built from an adjective, a Pokémon name and an optional numeric suffix.
+
+    Slugs are generated on demand from a monotonically allocated index. The index is scrambled by a keyed Feistel
+    permutation, so consecutive indexes map to unrelated slugs, while every slug is still produced exactly once.
+    Suffix 0 is written without a suffix, so the slugs of `get_slugs` are part of the space.
+    """
+
+    def __init__(
+        self,
+        adjectives: Sequence[str] = adjectives,
+        pokemons: Sequence[str] = pokemons,
+        suffix_count: int = SLUG_SUFFIX_COUNT,
+        seed: int = SLUG_PERMUTATION_SEED,
+    ) -> None:
+        """Initialize the slug space.
+
+        Args:
+            adjectives (Sequence[str]): Adjectives used as the first word of slugs.
+            pokemons (Sequence[str]): Pokémon names used as the second word of slugs.
+            suffix_count (int): Number of numeric suffixes, including the empty suffix.
+            seed (int): Key of the permutation. Changing it changes the order in which slugs are generated.
+        """
+        self.adjectives = list(adjectives)
+        self.pokemons = list(pokemons)
+        self.suffix_count = suffix_count
+        self.seed = seed
+        self.size = len(self.adjectives) * len(self.pokemons) * suffix_count
+        self._adjective_indexes = {adjective: index for index, adjective in enumerate(self.adjectives)}
+        self._pokemon_indexes = {pokemon: index for index, pokemon in enumerate(self.pokemons)}
+        self._half_bits = max((self.size - 1).bit_length() + 1, 2) // 2
+        self._half_mask = (1 << self._half_bits) - 1
+
+    def slug(self, index: int) -> str:
+        """Get the slug of an index.
+
+        Args:
+            index (int): Index of the slug, between zero and the size of the space.
+
+        Returns:
+            str: The slug of the index.
+        """
+        if not 0 <= index < self.size:
+            msg = f"Slug index {index} is out of range for a space of {self.size} slugs"
+            raise ValueError(msg)
+        suffix, word_index = divmod(self._permute(index), len(self.adjectives) * len(self.pokemons))
+        adjective_index, pokemon_index = divmod(word_index, len(self.pokemons))
+        slug = f"{self.adjectives[adjective_index]}-{self.pokemons[pokemon_index]}"
+        return slug if suffix == 0 else f"{slug}-{suffix}"
+
+    def __contains__(self, slug: object) -> bool:
+        """Check whether a slug is part of the space, without generating it."""
+        if not isinstance(slug, str):
+            return False
+        adjective, _, rest = slug.partition("-")
+        pokemon, _, suffix = rest.partition("-")
+        if adjective not in self._adjective_indexes or pokemon not in self._pokemon_indexes:
+            return False
+        if not suffix:
+            return True
+        return suffix.isdigit() and suffix == str(int(suffix)) and 0 < int(suffix) < self.suffix_count
+
+    def _permute(self, index: int) -> int:
+        """Map an index to a unique index of the space with a balanced Feistel network and cycle walking."""
+        while True:
+            left, right = index >> self._half_bits, index & self._half_mask
+            for round_number in range(SLUG_PERMUTATION_ROUNDS):
+                left, right = right, left ^ self._round(round_number, right)
+            index = (left << self._half_bits) | right
+            if index < self.size:
+                return index
+
+    def _round(self, round_number: int, value: int) -> int:
+        """Keyed round function of the Feistel network."""
+        digest = hashlib.blake2b(f"{self.seed}:{round_number}:{value}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest) & self._half_mask
+
+
+slug_space = SlugSpace()
@@ -0,0 +1,49 @@
+"""
+Timings of the startup phases of the application.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from linker.models import StartupStatisticsRead
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimings:
+    """Durations of the named phases of the last startup, in the order they ran."""
+
+    def __init__(self) -> None:
+        """Initialize without recorded phases."""
+        self._phases: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Record the duration of a startup phase, even if the phase fails."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self._phases[name] = duration
+            logger.info("Startup phase '%s' took %.3f seconds", name, duration)
+
+    def reset(self) -> None:
+        """Forget the recorded phases before a new startup."""
+        with self._lock:
+            self._phases.clear()
+
+    def statistics(self) -> StartupStatisticsRead:
+        """Get the duration of each phase and of the whole startup."""
+        with self._lock:
+            return StartupStatisticsRead(phases=dict(self._phases), total_seconds=sum(self._phases.values()))
+
+
+startup_timings = StartupTimings()
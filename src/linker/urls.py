@@ -0,0 +1,37 @@
+"""
+Normalized digests of target urls used to detect duplicate links.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+
+def normalize_target_url(target_url: str) -> str:
+    """Normalize a target url by lowercasing its case-insensitive scheme and host.
+
+    Args:
+        target_url (str): Target url to normalize.
+
+    Returns:
+        str: The normalized target url.
+    """
+    parts = urlsplit(target_url)
+    netloc = parts.netloc
+    if parts.hostname is not None:
+        userinfo, _, hostport = netloc.rpartition("@")
+        netloc = f"{userinfo}@{hostport.lower()}" if userinfo else hostport.lower()
+    return urlunsplit(parts._replace(scheme=parts.scheme.lower(), netloc=netloc))
+
+
+def hash_target_url(target_url: str) -> str:
+    """Get the fixed-width digest of a normalized target url.
+
+    Args:
+        target_url (str): Target url to hash.
+
+    Returns:
+        str: Hexadecimal SHA-256 digest of the normalized target url.
+    """
+    return hashlib.sha256(normalize_target_url(target_url).encode()).hexdigest()
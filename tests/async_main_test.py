@@ -0,0 +1,37 @@
+"""
+Tests for the async application.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import inspect
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+from linker.async_main import app as async_app
+from linker.main import app
+
+
+def get_operations(application: FastAPI) -> dict[tuple[str, str], APIRoute]:
+    return {
+        (route.path, method): route
+        for route in application.routes
+        if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+
+
+def test_async_app_serves_same_operations() -> None:
+    assert get_operations(async_app).keys() == get_operations(app).keys()
+
+
+def test_async_app_link_endpoints_are_async() -> None:
+    operations = get_operations(async_app)
+
+    assert inspect.iscoroutinefunction(operations[("/{slug}", "GET")].endpoint)
+    for method in ["GET", "POST"]:
+        assert inspect.iscoroutinefunction(operations[("/api/v1/links", method)].endpoint)
+    for method in ["GET", "PATCH", "DELETE"]:
+        assert inspect.iscoroutinefunction(operations[("/api/v1/links/{slug}", method)].endpoint)
+    assert inspect.iscoroutinefunction(operations[("/api/v1/links/{slug}/clicks", "GET")].endpoint)
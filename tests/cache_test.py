@@ -0,0 +1,81 @@
+"""
+Tests for the redirect cache.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import pytest
+
+from linker.cache import CachedLink, RedirectCache
+
+
+def test_redirect_cache_hit_and_miss() -> None:
+    cache = RedirectCache(max_size=2, ttl_seconds=60)
+    cache.set("happy-pikachu", CachedLink(1, "https://example.com"))
+
+    assert cache.get("happy-pikachu") == CachedLink(1, "https://example.com")
+    assert cache.get("sad-pikachu") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_redirect_cache_evicts_least_recently_used() -> None:
+    cache = RedirectCache(max_size=2, ttl_seconds=60)
+    cache.set("happy-pikachu", CachedLink(1, "https://example.com/1"))
+    cache.set("sad-pikachu", CachedLink(2, "https://example.com/2"))
+    cache.get("happy-pikachu")
+    cache.set("angry-pikachu", CachedLink(3, "https://example.com/3"))
+
+    assert cache.get("sad-pikachu") is None
+    assert cache.get("happy-pikachu") is not None
+    assert cache.get("angry-pikachu") is not None
+    assert cache.evictions == 1
+
+
+def test_redirect_cache_expires(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = RedirectCache(max_size=2, ttl_seconds=60)
+    cache.set("happy-pikachu", CachedLink(1, "https://example.com"))
+    monkeypatch.setattr("linker.cache.time.monotonic", lambda: float("inf"))
+
+    assert cache.get("happy-pikachu") is None
+    assert cache.expirations == 1
+    assert cache.statistics().size == 0
+
+
+def test_redirect_cache_invalidate() -> None:
+    cache = RedirectCache(max_size=2, ttl_seconds=60)
+    cache.set("happy-pikachu", CachedLink(1, "https://example.com"))
+    cache.invalidate("happy-pikachu")
+    cache.invalidate("sad-pikachu")
+
+    assert cache.get("happy-pikachu") is None
+
+
+def test_redirect_cache_disabled() -> None:
+    cache = RedirectCache(max_size=0, ttl_seconds=60)
+    cache.set("happy-pikachu", CachedLink(1, "https://example.com"))
+
+    assert cache.get("happy-pikachu") is None
+    assert cache.statistics().size == 0
+
+
+def test_redirect_cache_skips_links_read_before_an_invalidation() -> None:
+    cache = RedirectCache(max_size=2, ttl_seconds=60)
+    generation = cache.generation()
+    cache.invalidate("happy-pikachu")
+    cache.set("happy-pikachu", CachedLink(1, "https://example.com/old"), generation)
+
+    assert cache.get("happy-pikachu") is None
+    cache.set("happy-pikachu", CachedLink(1, "https://example.com/new"), cache.generation())
+    assert cache.get("happy-pikachu") == CachedLink(1, "https://example.com/new")
+
+
+def test_redirect_cache_disable_and_enable() -> None:
+    cache = RedirectCache(max_size=2, ttl_seconds=60)
+    cache.set("happy-pikachu", CachedLink(1, "https://example.com"))
+    cache.disable()
+    cache.set("sad-pikachu", CachedLink(2, "https://example.com"))
+
+    assert cache.statistics().size == 0
+    cache.enable()
+    cache.set("sad-pikachu", CachedLink(2, "https://example.com"))
+    assert cache.get("sad-pikachu") == CachedLink(2, "https://example.com")
@@ -0,0 +1,158 @@
+"""
+Tests for the click buffer.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import Engine
+from sqlmodel import Session, create_engine, func, select, update
+
+from linker import crud
+from linker.clicks import ClickBuffer
+from linker.crud import delete_link
+from linker.models import Click, ClickRollup, Link, VisitorSketch
+
+
+@pytest.fixture(autouse=True)
+def links_in_use(session: Session) -> None:
+    """Point the seeded links to target urls, as clicks of deleted links are dropped."""
+    session.execute(update(Link).values(target_url="https://example.com/" + Link.slug))
+    session.commit()
+
+
+def count_clicks(session: Session) -> int:
+    session.expire_all()
+    return len(session.exec(select(Click)).all())
+
+
+def test_click_buffer_not_running() -> None:
+    click_buffer = ClickBuffer(max_size=10, flush_size=5, flush_interval=60)
+
+    assert click_buffer.add(1, "127.0.0.1") is False
+    assert len(click_buffer) == 0
+
+
+def test_click_buffer_full(engine: Engine, session: Session) -> None:
+    click_buffer = ClickBuffer(max_size=2, flush_size=5, flush_interval=60)
+
+    async def run() -> list[bool]:
+        click_buffer.start(engine)
+        added = [click_buffer.add(1, "127.0.0.1") for _ in range(3)]
+        await click_buffer.stop()
+        return added
+
+    assert asyncio.run(run()) == [True, True, False]
+    assert count_clicks(session) == 2
+
+
+def test_click_buffer_flush_size(engine: Engine, session: Session) -> None:
+    click_buffer = ClickBuffer(max_size=10, flush_size=3, flush_interval=60)
+
+    async def run() -> int:
+        click_buffer.start(engine)
+        for _ in range(3):
+            click_buffer.add(1, "127.0.0.1")
+        for _ in range(100):
+            if len(click_buffer) == 0:
+                break
+            await asyncio.sleep(0.01)
+        flushed = count_clicks(session)
+        await click_buffer.stop()
+        return flushed
+
+    assert asyncio.run(run()) == 3
+
+
+def test_click_buffer_flush_interval(engine: Engine, session: Session) -> None:
+    click_buffer = ClickBuffer(max_size=10, flush_size=5, flush_interval=0.01)
+
+    async def run() -> int:
+        click_buffer.start(engine)
+        click_buffer.add(1, "127.0.0.1")
+        for _ in range(100):
+            if len(click_buffer) == 0:
+                break
+            await asyncio.sleep(0.01)
+        flushed = count_clicks(session)
+        await click_buffer.stop()
+        return flushed
+
+    assert asyncio.run(run()) == 1
+
+
+def test_click_buffer_discard(engine: Engine, session: Session) -> None:
+    click_buffer = ClickBuffer(max_size=10, flush_size=5, flush_interval=60)
+
+    async def run() -> None:
+        click_buffer.start(engine)
+        click_buffer.add(1, "127.0.0.1")
+        click_buffer.add(2, "127.0.0.1")
+        click_buffer.discard(1)
+        await click_buffer.stop()
+
+    asyncio.run(run())
+    clicks = session.exec(select(Click)).all()
+    assert [click.link_id for click in clicks] == [2]
+
+
+def test_click_buffer_updates_click_counts(engine: Engine, session: Session) -> None:
+    click_buffer = ClickBuffer(max_size=10, flush_size=5, flush_interval=60)
+
+    async def run() -> None:
+        click_buffer.start(engine)
+        for link_id in [2, 1, 2, 2]:
+            click_buffer.add(link_id, "127.0.0.1")
+        await click_buffer.stop()
+
+    asyncio.run(run())
+    session.expire_all()
+    click_counts = {link.id: link.click_count for link in session.exec(select(Link)).all()}
+    assert click_counts == {1: 1, 2: 3, 3: 0, 4: 0}
+
+
+def test_click_buffer_flush_failure_requeues() -> None:
+    click_buffer = ClickBuffer(max_size=10, flush_size=5, flush_interval=60)
+    engine_without_tables = create_engine("sqlite://")
+
+    async def run() -> tuple[int, int]:
+        click_buffer.start(engine_without_tables)
+        click_buffer.add(1, "127.0.0.1")
+        flushed = click_buffer.flush()
+        buffered = len(click_buffer)
+        await click_buffer.stop()
+        return flushed, buffered
+
+    assert asyncio.run(run()) == (0, 1)
+
+
+def test_click_buffer_drops_clicks_of_links_deleted_during_flush(
+    engine: Engine,
+    session: Session,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    click_buffer = ClickBuffer(max_size=10, flush_size=5, flush_interval=60)
+    link = session.get_one(Link, 1)
+
+    def record_clicks_after_delete(flush_session: Session, clicks: list[Click]) -> None:
+        # The link is deleted after its clicks were drained from the buffer, so discarding them has no effect.
+        delete_link(session, link)
+        crud.record_clicks(flush_session, clicks)
+
+    monkeypatch.setattr("linker.clicks.record_clicks", record_clicks_after_delete)
+
+    async def run() -> None:
+        click_buffer.start(engine)
+        click_buffer.add(1, "127.0.0.1")
+        click_buffer.add(2, "127.0.0.1")
+        await click_buffer.stop()
+
+    asyncio.run(run())
+    session.expire_all()
+    assert session.get_one(Link, 1).click_count == 0
+    assert session.get_one(Link, 2).click_count == 1
+    assert session.exec(select(Click.link_id)).all() == [2]
+    assert session.exec(select(func.count()).select_from(ClickRollup).where(ClickRollup.link_id == 1)).one() == 0
+    assert session.get(VisitorSketch, 1) is None
@@ -0,0 +1,74 @@
+"""
+Tests for the validators of conditional requests.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from datetime import UTC, datetime
+
+import pytest
+from starlette.requests import Request
+
+from linker.conditional import not_modified, page_version, validator_headers
+
+MODIFIED_AT = datetime(2025, 1, 1, 10, 15, 30, 500_000, tzinfo=UTC)
+
+
+def _request(**headers: str) -> Request:
+    raw_headers = [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw_headers})
+
+
+def test_validator_headers() -> None:
+    assert validator_headers(7, MODIFIED_AT.replace(tzinfo=None)) == {
+        "ETag": '"7"',
+        "Last-Modified": "Wed, 01 Jan 2025 10:15:30 GMT",
+    }
+    assert validator_headers(0, None) == {"ETag": '"0"'}
+
+
+def test_page_version() -> None:
+    version = page_version([(1, 0), (2, 3)])
+
+    assert page_version([(1, 0), (2, 3)]) == version
+    assert page_version([(1, 0), (2, 4)]) != version
+    assert page_version([(1, 0)]) != version
+    assert page_version([(1, 0), (23, 0)]) != page_version([(1, 0), (2, 30)])
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "expected"),
+    [('"7"', True), ('W/"7"', True), ('"6", "7"', True), ("*", True), ('"6"', False)],
+)
+def test_not_modified_if_none_match(if_none_match: str, *, expected: bool) -> None:
+    response = not_modified(_request(If_None_Match=if_none_match), 7, MODIFIED_AT)
+
+    assert (response is not None) == expected
+
+
+@pytest.mark.parametrize(
+    ("if_modified_since", "expected"),
+    [
+        ("Wed, 01 Jan 2025 10:15:30 GMT", True),
+        ("Wed, 01 Jan 2025 10:15:29 GMT", False),
+        ("not a date", False),
+    ],
+)
+def test_not_modified_if_modified_since(if_modified_since: str, *, expected: bool) -> None:
+    response = not_modified(_request(If_Modified_Since=if_modified_since), 7, MODIFIED_AT)
+
+    assert (response is not None) == expected
+
+
+def test_not_modified_prefers_if_none_match() -> None:
+    request = _request(If_None_Match='"6"', If_Modified_Since="Wed, 01 Jan 2025 10:15:30 GMT")
+
+    assert not_modified(request, 7, MODIFIED_AT) is None
+
+
+def test_not_modified_response() -> None:
+    response = not_modified(_request(If_None_Match='"7"'), 7, MODIFIED_AT)
+
+    assert response is not None
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"7"'
@@ -4,16 +4,44 @@ Fixtures used in tests.
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
-from collections.abc import Iterator
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager
+from pathlib import Path
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel.pool import StaticPool
 
-from linker.database import get_session
+from linker.async_main import app as async_app
+from linker.cache import redirect_cache
+from linker.database import get_async_read_session, get_async_session, get_engine, get_read_session, get_session
 from linker.main import app, get_linker_token
+from linker.metrics import instrument_engine
 from linker.models import Link
+from linker.queries import count_queries
+from linker.ratelimit import ip_rate_limiter, slug_rate_limiter
+from linker.slugs import SlugSpace
+
+
+@pytest.fixture(autouse=True)
+def clear_redirect_cache() -> Iterator[None]:
+    redirect_cache.clear()
+    yield
+    redirect_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_rate_limiters() -> Iterator[None]:
+    ip_rate_limiter.clear()
+    slug_rate_limiter.clear()
+    yield
+    ip_rate_limiter.clear()
+    slug_rate_limiter.clear()
 
 
 @pytest.fixture(name="linker_token")
@@ -21,28 +49,79 @@ def linker_token_fixture() -> str:
     return "secret"
 
 
-@pytest.fixture(name="session")
-def session_fixture(slugs: list[str]) -> Iterator[Session]:
+@pytest.fixture(name="engine")
+def engine_fixture() -> Iterator[Engine]:
     engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    instrument_engine(engine)
     SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(name="session")
+def session_fixture(engine: Engine, slugs: list[str]) -> Iterator[Session]:
     with Session(engine) as session:
         session.add_all([Link(slug=slug) for slug in slugs])
         session.commit()
         yield session
 
 
-@pytest.fixture(name="client")
-def client_fixture(session: Session, linker_token: str) -> Iterator[TestClient]:
+@pytest.fixture(name="client", params=["sync", "async"])
+def client_fixture(request: pytest.FixtureRequest) -> TestClient:
+    """Client of the synchronous and of the async application, so every endpoint test runs against both."""
+    client: TestClient = request.getfixturevalue(f"{request.param}_client")
+    return client
+
+
+@pytest.fixture(name="sync_client")
+def sync_client_fixture(engine: Engine, session: Session, linker_token: str) -> Iterator[TestClient]:
     def get_session_override() -> Session:
         return session
 
+    app.dependency_overrides[get_engine] = lambda: engine
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
     app.dependency_overrides[get_linker_token] = lambda: linker_token
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(name="async_client")
+def async_client_fixture(tmp_path: Path, slugs: list[str], linker_token: str) -> Iterator[TestClient]:
+    # The sync and the async engine share a database file, as each connection to "sqlite://" is a separate database.
+    database_path = tmp_path / "linker.db"
+    engine = create_engine(f"sqlite:///{database_path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool)
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([Link(slug=slug) for slug in slugs])
+        session.commit()
+
+    def get_session_override() -> Iterator[Session]:
+        with Session(engine) as session:
+            yield session
+
+    async def get_async_session_override() -> AsyncIterator[AsyncSession]:
+        async with AsyncSession(async_engine) as session:
+            yield session
+
+    for application in (app, async_app):
+        application.dependency_overrides[get_engine] = lambda: engine
+        application.dependency_overrides[get_session] = get_session_override
+        application.dependency_overrides[get_read_session] = get_session_override
+        application.dependency_overrides[get_async_session] = get_async_session_override
+        application.dependency_overrides[get_async_read_session] = get_async_session_override
+        application.dependency_overrides[get_linker_token] = lambda: linker_token
+    client = TestClient(async_app)
+    yield client
+    for application in (app, async_app):
+        application.dependency_overrides.clear()
+    engine.dispose()
+
+
 @pytest.fixture(name="auth_headers")
 def auth_headers_fixture(linker_token: str) -> dict[str, str]:
     return {"Authorization": f"Bearer {linker_token}"}
@@ -66,6 +145,13 @@ def slugs_fixture() -> list[str]:
     return ["bored-bulbasaur", "happy-charmander", "sleepy-squirtle", "surprised-pikachu"]
 
 
+@pytest.fixture(name="exhausted_slug_space")
+def exhausted_slug_space_fixture(monkeypatch: pytest.MonkeyPatch, slug: str) -> None:
+    """Restrict generated slugs to the default slug, so no slugs can be generated once the seeded slugs are used."""
+    adjective, pokemon = slug.split("-")
+    monkeypatch.setattr("linker.crud.slug_space", SlugSpace(adjectives=[adjective], pokemons=[pokemon], suffix_count=1))
+
+
 @pytest.fixture(name="slug")
 def slug_fixture() -> str:
     """Default slug."""
@@ -76,3 +162,20 @@ def slug_fixture() -> str:
 def slug_invalid_fixture() -> str:
     """Invalid slug."""
     return "surprised-pika"
+
+
+@pytest.fixture(name="assert_max_queries")
+def assert_max_queries_fixture() -> Callable[[int], AbstractContextManager[list[str]]]:
+    """Fail the test if a block runs more queries than the given budget, on the instrumented engines of the tests."""
+
+    @contextmanager
+    def assert_max_queries(limit: int) -> Iterator[list[str]]:
+        with count_queries(statements=True) as counter:
+            statements = counter.statements
+            assert statements is not None
+            yield statements
+        assert counter.count <= limit, f"{counter.count} queries ran, expected at most {limit}:\n" + "\n".join(
+            statements,
+        )
+
+    return assert_max_queries
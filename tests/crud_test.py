@@ -0,0 +1,215 @@
+"""
+Tests for the crud operations that are not covered by the endpoint tests.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Engine
+from sqlmodel import Session, create_engine, func, select, update
+
+from linker.crud import (
+    InvalidRangeError,
+    SlugNotInUseError,
+    click_histogram,
+    count_visitors,
+    create_link,
+    create_links,
+    delete_link,
+    get_link,
+    purge_clicks,
+    record_clicks,
+)
+from linker.database import create_db
+from linker.models import Click, HistogramBucket, Link, LinkCreate
+from linker.sketches import relative_standard_error
+from linker.slugs import slug_space
+
+
+def test_purge_clicks_in_chunks(session: Session, slugs: list[str], target_url: str) -> None:
+    link = create_link(session, slugs[0], target_url)
+    other_link = create_link(session, slugs[1], f"{target_url}/1")
+    assert link.id is not None
+    assert other_link.id is not None
+    record_clicks(session, [Click(ip_address="127.0.0.1", link_id=link.id) for _ in range(5)])
+    record_clicks(session, [Click(ip_address="127.0.0.1", link_id=other_link.id)])
+
+    purge_clicks(session, [link.id], chunk_size=2)
+
+    remaining = session.exec(select(Click.link_id, func.count()).group_by(Click.link_id)).all()  # type: ignore[arg-type]
+    assert remaining == [(other_link.id, 1)]
+
+
+def test_create_link_concurrent_claims_distinct_slugs(tmp_path: Path, slugs: list[str], target_url: str) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'linker.db'}", connect_args={"timeout": 30})
+    create_db(engine)
+    with Session(engine) as session:
+        session.add_all([Link(slug=slug) for slug in slugs])
+        session.commit()
+    workers = len(slugs) * 4
+    barrier = threading.Barrier(workers)
+
+    def create(index: int) -> str:
+        with Session(engine) as session:
+            barrier.wait()
+            return create_link(session, None, f"{target_url}/{index}").slug
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        claimed = list(executor.map(create, range(workers)))
+
+    assert len(set(claimed)) == workers
+    assert set(slugs) <= set(claimed)
+    with Session(engine) as session:
+        target_urls = session.exec(select(Link.target_url)).all()
+    assert len(set(target_urls)) == workers
+    engine.dispose()
+
+
+def test_create_link_generates_slugs(session: Session, slugs: list[str], target_url: str) -> None:
+    links = [create_link(session, None, f"{target_url}/{index}") for index in range(len(slugs) + 2)]
+
+    assert [link.slug for link in links[: len(slugs)]] == slugs
+    assert all(link.slug in slug_space for link in links[len(slugs) :])
+    assert len({link.slug for link in links}) == len(links)
+
+
+@pytest.mark.parametrize("age", [timedelta(0), timedelta(minutes=5)], ids=["now", "buffered-earlier"])
+def test_delete_link_deletes_clicks_recorded_during_purge(
+    session: Session,
+    slug: str,
+    target_url: str,
+    monkeypatch: pytest.MonkeyPatch,
+    age: timedelta,
+) -> None:
+    link = create_link(session, slug, target_url)
+    assert link.id is not None
+    record_clicks(session, [Click(ip_address="127.0.0.1", link_id=link.id) for _ in range(3)])
+
+    def purge_clicks_while_clicked(session: Session, link_ids: list[int]) -> None:
+        purge_clicks(session, link_ids)
+        # Clicks committed during the purge may be stamped before it started, like clicks buffered earlier.
+        timestamp = datetime.now(tz=UTC) - age
+        record_clicks(session, [Click(ip_address="127.0.0.1", link_id=i, timestamp=timestamp) for i in link_ids])
+
+    monkeypatch.setattr("linker.crud.purge_clicks", purge_clicks_while_clicked)
+    delete_link(session, link)
+
+    assert session.exec(select(Click)).all() == []
+
+
+@pytest.mark.parametrize(
+    ("requested", "batch"),
+    [(False, False), (True, False), (False, True), (True, True)],
+    ids=["claimed", "requested", "batch-claimed", "batch-requested"],
+)
+def test_reused_link_starts_without_clicks(
+    session: Session,
+    slugs: list[str],
+    target_url: str,
+    *,
+    requested: bool,
+    batch: bool,
+) -> None:
+    link = create_link(session, slugs[0], target_url)
+    assert link.id is not None
+    record_clicks(session, [Click(ip_address="127.0.0.1", link_id=link.id)])
+    # Frees the link without removing its clicks, as a click recorded after a delete would leave it.
+    session.execute(update(Link).where(Link.id == link.id).values(target_url=None, target_url_hash=None))  # type: ignore[arg-type]
+    session.commit()
+
+    slug = slugs[0] if requested else None
+    if batch:
+        reused_link = create_links(session, [LinkCreate(slug=slug, target_url=f"{target_url}/1")])[0]
+    else:
+        reused_link = create_link(session, slug, f"{target_url}/1")
+
+    assert isinstance(reused_link, Link)
+    assert reused_link.id == link.id
+    assert reused_link.click_count == 0
+    assert session.exec(select(Click)).all() == []
+    assert count_visitors(session, reused_link) == 0
+    now = datetime.now(tz=UTC)
+    assert click_histogram(session, reused_link, HistogramBucket.DAY, now - timedelta(days=1), now) == []
+
+
+def test_create_links_does_not_generate_requested_slugs(engine: Engine, target_url: str) -> None:
+    requested_slug = slug_space.slug(0)
+    link_creates = [LinkCreate(target_url=target_url), LinkCreate(slug=requested_slug, target_url=f"{target_url}/1")]
+
+    with Session(engine) as session:
+        generated_link, requested_link = create_links(session, link_creates)
+
+    assert isinstance(generated_link, Link)
+    assert isinstance(requested_link, Link)
+    assert requested_link.slug == requested_slug
+    assert generated_link.slug != requested_slug
+
+
+def test_create_link_materializes_slug(session: Session, target_url: str) -> None:
+    slug = slug_space.slug(slug_space.size - 1)
+
+    with pytest.raises(SlugNotInUseError):
+        get_link(session, slug)
+    link = create_link(session, slug, target_url)
+
+    assert get_link(session, slug) == link
+
+
+def _utc(day: int, hour: int = 0, minute: int = 0) -> datetime:
+    return datetime(2025, 1, day, hour, minute, tzinfo=UTC)
+
+
+def test_click_histogram(session: Session, slug: str, target_url: str) -> None:
+    link = create_link(session, slug, target_url)
+    assert link.id is not None
+    timestamps = [_utc(1, 9, 59), _utc(1, 10, 15), _utc(1, 10, 45), _utc(1, 12, 30), _utc(2, 6)]
+    record_clicks(session, [Click(ip_address="127.0.0.1", link_id=link.id, timestamp=t) for t in timestamps])
+    record_clicks(session, [Click(ip_address="127.0.0.1", link_id=link.id, timestamp=timestamps[1])])
+
+    hourly = click_histogram(session, link, HistogramBucket.HOUR, _utc(1, 10, 30), _utc(3))
+    daily = click_histogram(session, link, HistogramBucket.DAY, _utc(1), _utc(3))
+    within_hour = click_histogram(session, link, HistogramBucket.HOUR, _utc(1, 10, 10), _utc(1, 10, 20))
+
+    assert hourly == [(_utc(1, 10), 1), (_utc(1, 12), 1), (_utc(2, 6), 1)]
+    assert daily == [(_utc(1), 5), (_utc(2), 1)]
+    assert within_hour == [(_utc(1, 10), 2)]
+
+
+def test_click_histogram_invalid_range(session: Session, slug: str, target_url: str) -> None:
+    link = create_link(session, slug, target_url)
+
+    with pytest.raises(InvalidRangeError):
+        click_histogram(session, link, HistogramBucket.HOUR, _utc(1), _utc(1))
+
+
+def test_count_visitors(session: Session, slugs: list[str], target_url: str) -> None:
+    link = create_link(session, slugs[0], target_url)
+    other_link = create_link(session, slugs[1], f"{target_url}/other")
+    assert link.id is not None
+    assert other_link.id is not None
+    assert count_visitors(session, link) == 0
+
+    # Synthetic clicks of 5000 visitors, each clicking up to three times, recorded in batches of mixed links.
+    clicks = [
+        Click(ip_address=f"10.0.{index >> 8 & 255}.{index & 255}", link_id=link.id)
+        for index in range(5_000)
+        for _ in range(index % 3 + 1)
+    ]
+    clicks += [Click(ip_address="127.0.0.1", link_id=other_link.id)] * 10
+    for start in range(0, len(clicks), 1_000):
+        record_clicks(session, clicks[start : start + 1_000])
+
+    exact = session.exec(
+        select(func.count(func.distinct(Click.ip_address))).where(Click.link_id == link.id),
+    ).one()
+    assert exact == 5_000
+    assert abs(count_visitors(session, link) - exact) <= 3 * relative_standard_error() * exact
+    assert round(count_visitors(session, other_link)) == 1
+
+    delete_link(session, link)
+    assert count_visitors(session, link) == 0
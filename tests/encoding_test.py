@@ -0,0 +1,54 @@
+"""
+Tests for the json encoding of listed rows.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from datetime import UTC, datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlmodel import Session, select
+
+from linker.crud import create_link, list_clicks, list_links, record_clicks
+from linker.encoding import encode_clicks, encode_links
+from linker.models import Click, ClickRead, Link, LinkRead
+
+
+def test_encode_links_matches_read_model(session: Session, slugs: list[str]) -> None:
+    create_link(session, slugs[0], 'https://example.com/ünïcode?q="quoted"')
+    create_link(session, slugs[1], "https://example.com")
+    record_clicks(session, [Click(ip_address="127.0.0.1", link_id=1)])
+
+    rows, _ = list_links(session)
+    links = session.exec(select(Link).where(Link.target_url.is_not(None)).order_by(Link.id)).all()  # type: ignore[union-attr,arg-type]
+
+    assert encode_links(rows) == JSONResponse(jsonable_encoder([LinkRead.from_link(link) for link in links])).body
+
+
+def test_encode_links_without_target_url() -> None:
+    rows = [("happy-pikachu", None, 0, 1, 0)]
+
+    assert (
+        encode_links(rows)
+        == JSONResponse(jsonable_encoder([LinkRead(slug="happy-pikachu", target_url=None, clicks=0)])).body
+    )
+
+
+def test_encode_clicks_matches_read_model(session: Session, slug: str, target_url: str) -> None:
+    link = create_link(session, slug, target_url)
+    timestamps = [datetime(2025, 1, 1, 10, tzinfo=UTC), datetime(2025, 1, 1, 11, 30, 15, 250_000, tzinfo=UTC)]
+    record_clicks(session, [Click(ip_address="::1", link_id=link.id, timestamp=timestamp) for timestamp in timestamps])
+
+    rows, _ = list_clicks(session, link)
+    clicks = session.exec(select(Click).order_by(Click.timestamp.desc())).all()  # type: ignore[attr-defined]
+
+    assert encode_clicks(rows) == JSONResponse(jsonable_encoder([ClickRead.from_click(click) for click in clicks])).body
+
+
+def test_encode_clicks_with_aware_timestamp() -> None:
+    timestamp = datetime(2025, 1, 1, 10, 0, 0, 1, tzinfo=UTC)
+    rows = [(timestamp, "127.0.0.1", 1)]
+
+    expected = JSONResponse(jsonable_encoder([ClickRead(timestamp=timestamp, ip_address="127.0.0.1")])).body
+    assert encode_clicks(rows) == expected
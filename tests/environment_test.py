@@ -0,0 +1,44 @@
+"""
+Tests for the environment variable helpers.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import pytest
+
+from linker.environment import get_env_bool, get_env_int
+
+ENVIRONMENT_KEY = "LINKER_TEST_VALUE"
+
+
+def test_get_env_int_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv(ENVIRONMENT_KEY, raising=False)
+    assert get_env_int(ENVIRONMENT_KEY, 5) == 5
+
+
+def test_get_env_int(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVIRONMENT_KEY, "-1")
+    assert get_env_int(ENVIRONMENT_KEY, 5) == -1
+
+
+def test_get_env_int_not_number(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVIRONMENT_KEY, "five")
+    with pytest.raises(ValueError, match=f"Environment variable '{ENVIRONMENT_KEY}' must be a number, got 'five'"):
+        get_env_int(ENVIRONMENT_KEY, 5)
+
+
+def test_get_env_bool_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv(ENVIRONMENT_KEY, raising=False)
+    assert get_env_bool(ENVIRONMENT_KEY, default=True) is True
+
+
+@pytest.mark.parametrize(("value", "expected"), [("true", True), ("1", True), ("False", False), ("off", False)])
+def test_get_env_bool(monkeypatch: pytest.MonkeyPatch, value: str, expected: bool) -> None:  # noqa: FBT001
+    monkeypatch.setenv(ENVIRONMENT_KEY, value)
+    assert get_env_bool(ENVIRONMENT_KEY, default=not expected) is expected
+
+
+def test_get_env_bool_not_boolean(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVIRONMENT_KEY, "maybe")
+    with pytest.raises(ValueError, match=f"Environment variable '{ENVIRONMENT_KEY}' must be a boolean, got 'maybe'"):
+        get_env_bool(ENVIRONMENT_KEY, default=True)
@@ -0,0 +1,38 @@
+"""
+Tests for the click export serialization.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import json
+from datetime import UTC, datetime
+
+from linker.export import export_clicks
+from linker.models import ExportFormat
+
+clicks = [(datetime(2025, 1, 1, hour, tzinfo=UTC), f"10.0.0.{hour}") for hour in range(5)]
+
+
+def test_export_clicks_ndjson_batches() -> None:
+    chunks = list(export_clicks(clicks, ExportFormat.NDJSON, batch_size=2))
+    rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+
+    assert len(chunks) == 3
+    assert rows[0] == {"timestamp": "2025-01-01T00:00:00+00:00", "ip_address": "10.0.0.0"}
+    assert len(rows) == 5
+
+
+def test_export_clicks_csv_batches() -> None:
+    chunks = list(export_clicks(clicks, ExportFormat.CSV, batch_size=2))
+
+    assert len(chunks) == 3
+    assert chunks[0].splitlines()[0] == "timestamp,ip_address"
+    assert "".join(chunks).splitlines()[-1] == "2025-01-01T04:00:00+00:00,10.0.0.4"
+
+
+def test_export_clicks_csv_empty() -> None:
+    assert list(export_clicks([], ExportFormat.CSV)) == ["timestamp,ip_address\r\n"]
+
+
+def test_export_clicks_ndjson_empty() -> None:
+    assert list(export_clicks([], ExportFormat.NDJSON)) == []
@@ -0,0 +1,148 @@
+"""
+Tests for the invalidation of cached links across workers.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import asyncio
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+
+import pytest
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from linker.cache import CachedLink, RedirectCache
+from linker.crud import create_link, delete_links, update_link
+from linker.invalidation import (
+    InvalidationBus,
+    InvalidationSubscription,
+    LocalInvalidationBus,
+    run_invalidation_listener,
+)
+
+
+@pytest.fixture(name="bus")
+def bus_fixture(monkeypatch: pytest.MonkeyPatch) -> LocalInvalidationBus:
+    bus = LocalInvalidationBus()
+    monkeypatch.setattr("linker.invalidation.invalidation_bus", bus)
+    return bus
+
+
+def test_local_invalidation_bus(bus: LocalInvalidationBus, engine: Engine) -> None:
+    async def run() -> list[str]:
+        subscription = await bus.subscribe(engine)
+        with engine.connect() as connection:
+            bus.publish(connection, ["happy-pikachu", "sad-pikachu"])
+        return await asyncio.wait_for(subscription.receive(), timeout=1)
+
+    assert asyncio.run(run()) == ["happy-pikachu", "sad-pikachu"]
+
+
+def test_invalidation_listener_evicts_changed_links(
+    bus: LocalInvalidationBus,  # noqa: ARG001
+    engine: Engine,
+    session: Session,
+    slugs: list[str],
+    target_url: str,
+) -> None:
+    links = [create_link(session, slug, f"{target_url}/{index}") for index, slug in enumerate(slugs[:3])]
+    # The cache of another worker, which only learns about the changes through the bus.
+    cache = RedirectCache(max_size=10, ttl_seconds=60)
+
+    async def run() -> list[str]:
+        listener = asyncio.create_task(run_invalidation_listener(engine, cache, retry_interval=0))
+        await asyncio.sleep(0.01)
+        for link in links:
+            cache.set(link.slug, CachedLink(link.id, link.target_url))  # type: ignore[arg-type]
+        await asyncio.to_thread(update_link, session, links[0], f"{target_url}/updated")
+        await asyncio.to_thread(delete_links, session, [links[1].slug])
+        await asyncio.sleep(0.01)
+        listener.cancel()
+        return [link.slug for link in links if cache.get(link.slug) is not None]
+
+    assert asyncio.run(run()) == [links[2].slug]
+
+
+def test_invalidation_listener_flushes_after_reconnect(bus: LocalInvalidationBus, engine: Engine) -> None:
+    cache = RedirectCache(max_size=10, ttl_seconds=60)
+
+    async def run() -> tuple[int, int]:
+        listener = asyncio.create_task(run_invalidation_listener(engine, cache, retry_interval=0))
+        await asyncio.sleep(0.01)
+        cache.set("happy-pikachu", CachedLink(1, "https://example.com/1"))
+        cache.set("sad-pikachu", CachedLink(2, "https://example.com/2"))
+        bus.disconnect()
+        await asyncio.sleep(0.01)
+        size_after_reconnect = cache.statistics().size
+        # The listener has subscribed again.
+        cache.set("happy-pikachu", CachedLink(1, "https://example.com/1"))
+        with engine.connect() as connection:
+            bus.publish(connection, ["happy-pikachu"])
+        await asyncio.sleep(0.01)
+        listener.cancel()
+        return size_after_reconnect, cache.statistics().size
+
+    assert asyncio.run(run()) == (0, 0)
+
+
+def test_invalidation_listener_disables_cache_while_disconnected(bus: LocalInvalidationBus, engine: Engine) -> None:
+    cache = RedirectCache(max_size=10, ttl_seconds=60)
+
+    async def run() -> tuple[int, int]:
+        listener = asyncio.create_task(run_invalidation_listener(engine, cache, retry_interval=60))
+        await asyncio.sleep(0.01)
+        cache.set("happy-pikachu", CachedLink(1, "https://example.com/1"))
+        bus.disconnect()
+        await asyncio.sleep(0.01)
+        size_after_disconnect = cache.statistics().size
+        # Changes are not heard of until the listener reconnects, so links read meanwhile are not cached.
+        cache.set("sad-pikachu", CachedLink(2, "https://example.com/2"))
+        listener.cancel()
+        return size_after_disconnect, cache.statistics().size
+
+    assert asyncio.run(run()) == (0, 0)
+
+
+def test_invalidation_listener_reconnects_after_failed_heartbeat(
+    bus: LocalInvalidationBus,  # noqa: ARG001
+    engine: Engine,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    cache = RedirectCache(max_size=10, ttl_seconds=60)
+    checks: list[int] = []
+
+    async def check(_: InvalidationSubscription) -> None:
+        checks.append(len(checks))
+        if len(checks) == 1:
+            # The first connection died silently, so its check never finishes.
+            await asyncio.Event().wait()
+
+    monkeypatch.setattr(InvalidationSubscription, "check", check)
+
+    async def run() -> int:
+        listener = asyncio.create_task(
+            run_invalidation_listener(engine, cache, retry_interval=0, heartbeat_interval=0.02),
+        )
+        await asyncio.sleep(0.01)
+        cache.set("happy-pikachu", CachedLink(1, "https://example.com/1"))
+        await asyncio.sleep(0.1)
+        listener.cancel()
+        return cache.statistics().size
+
+    assert asyncio.run(run()) == 0
+    # The listener has connected again and checks the new connection.
+    assert len(checks) > 1
+
+
+def test_invalidation_bus_skips_other_databases(
+    engine: Engine,
+    assert_max_queries: Callable[[int], AbstractContextManager[list[str]]],
+) -> None:
+    bus = InvalidationBus()
+    with assert_max_queries(0), engine.connect() as connection:
+        bus.publish(connection, ["happy-pikachu"])
+
+    assert not bus.supports(engine)
+    # The listener returns at once instead of retrying a bus the database cannot carry.
+    asyncio.run(asyncio.wait_for(run_invalidation_listener(engine, RedirectCache(10, 60), retry_interval=0), 1))
@@ -0,0 +1,31 @@
+"""
+Tests for the cache statistics endpoint.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from fastapi.testclient import TestClient
+
+
+def test_cache_statistics_unauthorized(client: TestClient) -> None:
+    response = client.get("/api/v1/stats/cache")
+    data = response.json()
+
+    assert response.status_code == 403
+    assert data["detail"] == "Not authenticated"
+
+
+def test_cache_statistics(client: TestClient, auth_headers: dict[str, str], slug: str, target_url: str) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    client.get(f"/{slug}", follow_redirects=False)
+    client.get(f"/{slug}", follow_redirects=False)
+    client.get(f"/{slug}", follow_redirects=False)
+
+    response = client.get("/api/v1/stats/cache", headers=auth_headers)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["size"] == 1
+    assert data["hits"] == 2
+    assert data["misses"] == 1
+    assert data["evictions"] == 0
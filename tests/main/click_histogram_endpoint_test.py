@@ -0,0 +1,71 @@
+"""
+Tests for the click histogram endpoint.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from datetime import UTC, datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+
+def test_click_histogram_unauthorized(client: TestClient, slug: str) -> None:
+    response = client.get(f"/api/v1/links/{slug}/clicks/histogram")
+    data = response.json()
+
+    assert response.status_code == 403
+    assert data["detail"] == "Not authenticated"
+
+
+def test_click_histogram_slug_not_in_use(client: TestClient, auth_headers: dict[str, str], slug: str) -> None:
+    response = client.get(f"/api/v1/links/{slug}/clicks/histogram", headers=auth_headers)
+    data = response.json()
+
+    assert response.status_code == 404
+    assert data["detail"] == f"Slug '{slug}' is not in use"
+
+
+def test_click_histogram_invalid_range(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+
+    response = client.get(
+        f"/api/v1/links/{slug}/clicks/histogram",
+        headers=auth_headers,
+        params={"from": "2025-01-02T00:00:00", "to": "2025-01-01T00:00:00"},
+    )
+    data = response.json()
+
+    assert response.status_code == 422
+    assert data["detail"] == "Start of the range '2025-01-02T00:00:00' must be before its end '2025-01-01T00:00:00'"
+
+
+def test_click_histogram(client: TestClient, auth_headers: dict[str, str], slug: str, target_url: str) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    client.get(f"/{slug}", follow_redirects=False)
+    client.get(f"/{slug}", follow_redirects=False)
+    now = datetime.now(tz=UTC)
+
+    for bucket in ["hour", "day"]:
+        response = client.get(f"/api/v1/links/{slug}/clicks/histogram", headers=auth_headers, params={"bucket": bucket})
+        data = response.json()
+
+        assert response.status_code == 200
+        assert sum(item["count"] for item in data) == 2
+        for item in data:
+            bucket_start = datetime.fromisoformat(item["bucket_start"])
+            assert bucket_start.minute == bucket_start.second == 0
+            assert bucket == "hour" or bucket_start.hour == 0
+
+    response = client.get(
+        f"/api/v1/links/{slug}/clicks/histogram",
+        headers=auth_headers,
+        params={"to": (now - timedelta(days=1)).isoformat()},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == []
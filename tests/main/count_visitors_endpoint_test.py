@@ -0,0 +1,40 @@
+"""
+Tests for the count visitors endpoint.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from fastapi.testclient import TestClient
+
+from linker.sketches import relative_standard_error
+
+
+def test_count_visitors_unauthorized(client: TestClient, slug: str) -> None:
+    response = client.get(f"/api/v1/links/{slug}/visitors")
+    data = response.json()
+
+    assert response.status_code == 403
+    assert data["detail"] == "Not authenticated"
+
+
+def test_count_visitors_slug_not_in_use(client: TestClient, auth_headers: dict[str, str], slug: str) -> None:
+    response = client.get(f"/api/v1/links/{slug}/visitors", headers=auth_headers)
+    data = response.json()
+
+    assert response.status_code == 404
+    assert data["detail"] == f"Slug '{slug}' is not in use"
+
+
+def test_count_visitors(client: TestClient, auth_headers: dict[str, str], slug: str, target_url: str) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    response = client.get(f"/api/v1/links/{slug}/visitors", headers=auth_headers)
+    assert response.json()["visitors"] == 0
+
+    # Every request of the test client comes from the same address.
+    client.get(f"/{slug}", follow_redirects=False)
+    client.get(f"/{slug}", follow_redirects=False)
+    response = client.get(f"/api/v1/links/{slug}/visitors", headers=auth_headers)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data == {"visitors": 1, "relative_standard_error": relative_standard_error()}
@@ -4,6 +4,7 @@ Tests for the create link endpoint.
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
+import pytest
 from fastapi.testclient import TestClient
 
 
@@ -52,6 +53,22 @@ def test_create_link_existing_target_url(
     assert data["detail"] == f"Link with target url '{target_url}' already exists under slug '{slug}'"
 
 
+def test_create_link_existing_normalized_target_url(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+
+    response = client.post("/api/v1/links", headers=auth_headers, json={"target_url": target_url.upper()})
+    data = response.json()
+
+    assert response.status_code == 422
+    assert data["detail"] == f"Link with target url '{target_url.upper()}' already exists under slug '{slug}'"
+
+
+@pytest.mark.usefixtures("exhausted_slug_space")
 def test_create_link_no_available_slugs(
     client: TestClient,
     auth_headers: dict[str, str],
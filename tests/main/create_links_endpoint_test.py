@@ -0,0 +1,114 @@
+"""
+Tests for the create links endpoint.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def test_create_links_unauthorized(client: TestClient) -> None:
+    response = client.post("/api/v1/links:batch")
+    data = response.json()
+
+    assert response.status_code == 403
+    assert data["detail"] == "Not authenticated"
+
+
+def test_create_links_too_many(client: TestClient, auth_headers: dict[str, str], target_url: str) -> None:
+    links = [{"target_url": f"{target_url}/{index}"} for index in range(10_001)]
+    response = client.post("/api/v1/links:batch", headers=auth_headers, json={"links": links})
+
+    assert response.status_code == 422
+
+
+def test_create_links_invalid_target_url(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    target_url: str,
+    target_url_invalid: str,
+) -> None:
+    links = [{"target_url": target_url_invalid}, {"target_url": target_url}]
+    response = client.post("/api/v1/links:batch", headers=auth_headers, json={"links": links})
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data[0] == {
+        "target_url": target_url_invalid,
+        "link": None,
+        "error": f"The provided url '{target_url_invalid}' is not valid",
+    }
+    assert data[1]["error"] is None
+
+
+def test_create_links_existing_target_url(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    links = [{"target_url": target_url}, {"target_url": f"{target_url}/1"}, {"target_url": f"{target_url}/1"}]
+
+    response = client.post("/api/v1/links:batch", headers=auth_headers, json={"links": links})
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data[0]["error"] == f"Link with target url '{target_url}' already exists under slug '{slug}'"
+    created_slug = data[1]["link"]["slug"]
+    assert data[2]["error"] == f"Link with target url '{target_url}/1' already exists under slug '{created_slug}'"
+
+
+def test_create_links_invalid_and_existing_slug(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    slug_invalid: str,
+    target_url: str,
+) -> None:
+    links = [
+        {"slug": slug_invalid, "target_url": target_url},
+        {"slug": slug, "target_url": f"{target_url}/1"},
+        {"slug": slug, "target_url": f"{target_url}/2"},
+    ]
+
+    response = client.post("/api/v1/links:batch", headers=auth_headers, json={"links": links})
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data[0]["error"] == f"Slug '{slug_invalid}' is not valid"
+    assert data[1]["link"] == {"slug": slug, "target_url": f"{target_url}/1", "clicks": 0}
+    assert data[2]["error"] == f"Slug '{slug}' is already in use for target url '{target_url}/1'"
+
+
+@pytest.mark.usefixtures("exhausted_slug_space")
+def test_create_links_no_available_slugs(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    target_url: str,
+    slugs: list[str],
+) -> None:
+    links = [{"target_url": f"{target_url}/{index}"} for index in range(len(slugs) + 1)]
+
+    response = client.post("/api/v1/links:batch", headers=auth_headers, json={"links": links})
+    data = response.json()
+
+    assert response.status_code == 200
+    assert {item["link"]["slug"] for item in data[:-1]} == set(slugs)
+    assert data[-1]["error"] == "No unused slugs are available in the database"
+
+
+def test_create_links(client: TestClient, auth_headers: dict[str, str], slug: str, target_url: str) -> None:
+    links = [{"target_url": f"{target_url}/1"}, {"slug": slug, "target_url": f"{target_url}/2"}]
+
+    response = client.post("/api/v1/links:batch", headers=auth_headers, json={"links": links})
+    data = response.json()
+
+    assert response.status_code == 200
+    assert [item["target_url"] for item in data] == [link["target_url"] for link in links]
+    assert all(item["error"] is None for item in data)
+    assert data[0]["link"]["slug"] != slug
+
+    response = client.get("/api/v1/links", headers=auth_headers)
+    assert {item["target_url"] for item in response.json()} == {f"{target_url}/1", f"{target_url}/2"}
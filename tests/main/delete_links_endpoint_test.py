@@ -0,0 +1,58 @@
+"""
+Tests for the delete links endpoint.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from fastapi.testclient import TestClient
+
+
+def test_delete_links_unauthorized(client: TestClient) -> None:
+    response = client.post("/api/v1/links:batchDelete")
+    data = response.json()
+
+    assert response.status_code == 403
+    assert data["detail"] == "Not authenticated"
+
+
+def test_delete_links_too_many(client: TestClient, auth_headers: dict[str, str], slug: str) -> None:
+    response = client.post("/api/v1/links:batchDelete", headers=auth_headers, json={"slugs": [slug] * 10_001})
+
+    assert response.status_code == 422
+
+
+def test_delete_links(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slugs: list[str],
+    slug_invalid: str,
+    target_url: str,
+) -> None:
+    for index, slug in enumerate(slugs[:2]):
+        client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": f"{target_url}/{index}"})
+        client.get(f"/{slug}", follow_redirects=False)
+
+    response = client.post(
+        "/api/v1/links:batchDelete",
+        headers=auth_headers,
+        json={"slugs": [*slugs[:3], slug_invalid]},
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert sorted(data["deleted"]) == sorted(slugs[:2])
+    for slug in slugs[:2]:
+        assert client.get(f"/{slug}", follow_redirects=False).status_code == 404
+
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slugs[0], "target_url": target_url})
+    response = client.get(f"/api/v1/links/{slugs[0]}/clicks", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_delete_links_none_in_use(client: TestClient, auth_headers: dict[str, str], slug: str) -> None:
+    response = client.post("/api/v1/links:batchDelete", headers=auth_headers, json={"slugs": [slug]})
+
+    assert response.status_code == 200
+    assert response.json() == {"deleted": []}
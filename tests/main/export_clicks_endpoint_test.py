@@ -0,0 +1,64 @@
+"""
+Tests for the export clicks endpoint.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import csv
+import io
+import json
+
+from fastapi.testclient import TestClient
+
+
+def test_export_clicks_unauthorized(client: TestClient, slug: str) -> None:
+    response = client.get(f"/api/v1/links/{slug}/clicks/export")
+    data = response.json()
+
+    assert response.status_code == 403
+    assert data["detail"] == "Not authenticated"
+
+
+def test_export_clicks_invalid_slug(client: TestClient, auth_headers: dict[str, str], slug_invalid: str) -> None:
+    response = client.get(f"/api/v1/links/{slug_invalid}/clicks/export", headers=auth_headers)
+    data = response.json()
+
+    assert response.status_code == 404
+    assert data["detail"] == f"Slug '{slug_invalid}' is not valid"
+
+
+def test_export_clicks_invalid_format(client: TestClient, auth_headers: dict[str, str], slug: str) -> None:
+    response = client.get(f"/api/v1/links/{slug}/clicks/export", headers=auth_headers, params={"format": "xml"})
+
+    assert response.status_code == 422
+
+
+def test_export_clicks_ndjson(client: TestClient, auth_headers: dict[str, str], slug: str, target_url: str) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    client.get(f"/{slug}", follow_redirects=False)
+    client.get(f"/{slug}", follow_redirects=False)
+
+    response = client.get(f"/api/v1/links/{slug}/clicks/export", headers=auth_headers)
+    rows = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    assert response.headers["Content-Disposition"] == f'attachment; filename="{slug}-clicks.ndjson"'
+    assert len(rows) == 2
+    assert [row["timestamp"] for row in rows] == sorted((row["timestamp"] for row in rows), reverse=True)
+    for row in rows:
+        assert set(row.keys()) == {"timestamp", "ip_address"}
+        assert row["ip_address"] == "testclient"
+
+
+def test_export_clicks_csv(client: TestClient, auth_headers: dict[str, str], slug: str, target_url: str) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    client.get(f"/{slug}", follow_redirects=False)
+
+    response = client.get(f"/api/v1/links/{slug}/clicks/export", headers=auth_headers, params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/csv")
+    assert len(rows) == 1
+    assert rows[0]["ip_address"] == "testclient"
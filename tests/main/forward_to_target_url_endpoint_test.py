@@ -4,8 +4,14 @@ Tests for the forward to target url endpoint.
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+
+import pytest
 from fastapi.testclient import TestClient
 
+from linker.ratelimit import ip_rate_limiter, slug_rate_limiter
+
 
 def test_forward_to_target_url_invalid_slug(client: TestClient, slug_invalid: str) -> None:
     response = client.get(f"/{slug_invalid}", follow_redirects=False)
@@ -40,3 +46,91 @@ def test_forward_to_target_url(client: TestClient, auth_headers: dict[str, str],
     assert data["slug"] == slug
     assert data["target_url"] == target_url
     assert data["clicks"] == 3
+
+
+def test_forward_to_target_url_after_update(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    client.get(f"/{slug}", follow_redirects=False)
+    client.patch(f"/api/v1/links/{slug}", headers=auth_headers, json={"target_url": f"{target_url}/1"})
+
+    response = client.get(f"/{slug}", follow_redirects=False)
+
+    assert response.status_code == 307
+    assert response.headers["Location"] == f"{target_url}/1"
+
+
+def test_forward_to_target_url_after_delete(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    client.get(f"/{slug}", follow_redirects=False)
+    client.delete(f"/api/v1/links/{slug}", headers=auth_headers)
+
+    response = client.get(f"/{slug}", follow_redirects=False)
+    data = response.json()
+
+    assert response.status_code == 404
+    assert data["detail"] == f"Slug '{slug}' is not in use"
+
+
+def test_forward_to_target_url_query_budget(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+    assert_max_queries: Callable[[int], AbstractContextManager[list[str]]],
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+
+    # Looking up the link, then recording the click, its click count, its hourly rollup and its visitor sketch. The
+    # visitor sketch is created empty if missing, read for update, then written back.
+    with assert_max_queries(7):
+        client.get(f"/{slug}", follow_redirects=False)
+    # The link is cached, so only the click is recorded. The visitor is not new, so the sketch is not written back.
+    with assert_max_queries(5):
+        client.get(f"/{slug}", follow_redirects=False)
+
+
+def test_forward_to_target_url_rate_limited(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    assert_max_queries: Callable[[int], AbstractContextManager[list[str]]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": "https://example.com"})
+    monkeypatch.setattr(ip_rate_limiter, "per_minute", 60)
+    monkeypatch.setattr(ip_rate_limiter, "burst", 2)
+
+    assert client.get(f"/{slug}", follow_redirects=False).status_code == 307
+    assert client.get(f"/{slug}", follow_redirects=False).status_code == 307
+    # The request is rejected before the link is looked up or the click is recorded.
+    with assert_max_queries(0):
+        response = client.get(f"/{slug}", follow_redirects=False)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert ip_rate_limiter.rejected == 1
+
+
+def test_forward_to_target_url_rate_limited_by_slug(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    monkeypatch.setattr(slug_rate_limiter, "per_minute", 60)
+    monkeypatch.setattr(slug_rate_limiter, "burst", 1)
+
+    assert client.get(f"/{slug}", follow_redirects=False).status_code == 307
+    assert client.get(f"/{slug}", follow_redirects=False).status_code == 429
+    assert client.get(f"/api/v1/links/{slug}", headers=auth_headers).json()["clicks"] == 1
@@ -49,3 +49,52 @@ def test_get_link(client: TestClient, auth_headers: dict[str, str], slug: str, t
     assert set(data.keys()) == {"slug", "target_url", "clicks"}
     assert data["slug"] == slug
     assert data["target_url"] == target_url
+
+
+def test_get_link_not_modified(client: TestClient, auth_headers: dict[str, str], slug: str, target_url: str) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    etag = client.get(f"/api/v1/links/{slug}", headers=auth_headers).headers["ETag"]
+
+    response = client.get(f"/api/v1/links/{slug}", headers={**auth_headers, "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert "Last-Modified" in response.headers
+    assert response.content == b""
+
+
+def test_get_link_modified_by_click(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    etag = client.get(f"/api/v1/links/{slug}", headers=auth_headers).headers["ETag"]
+    client.get(f"/{slug}", follow_redirects=False)
+
+    response = client.get(f"/api/v1/links/{slug}", headers={**auth_headers, "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["clicks"] == 1
+
+
+def test_get_link_not_modified_since(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    last_modified = client.get(f"/api/v1/links/{slug}", headers=auth_headers).headers["Last-Modified"]
+
+    response = client.get(f"/api/v1/links/{slug}", headers={**auth_headers, "If-Modified-Since": last_modified})
+
+    assert response.status_code == 304
+
+
+def test_get_link_conditional_slug_not_in_use(client: TestClient, auth_headers: dict[str, str], slug: str) -> None:
+    response = client.get(f"/api/v1/links/{slug}", headers={**auth_headers, "If-None-Match": "*"})
+
+    assert response.status_code == 404
@@ -4,6 +4,8 @@ Tests for the list clicks endpoint.
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
+from collections.abc import Callable
+from contextlib import AbstractContextManager
 from datetime import UTC, datetime, timedelta
 
 from fastapi.testclient import TestClient
@@ -69,3 +71,57 @@ def test_list_clicks(client: TestClient, auth_headers: dict[str, str], slug: str
         assert timestamp < item_timestamp < timestamp + timedelta(seconds=1)
         assert item["ip_address"] == "testclient"
         assert set(item.keys()) == {"ip_address", "timestamp"}
+
+
+def test_list_clicks_pagination(client: TestClient, auth_headers: dict[str, str], slug: str, target_url: str) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    for _ in range(5):
+        client.get(f"/{slug}", follow_redirects=False)
+
+    timestamps: list[str] = []
+    cursor = None
+    for expected_page_size in [2, 2, 1]:
+        params: dict[str, str | int] = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        response = client.get(f"/api/v1/links/{slug}/clicks", headers=auth_headers, params=params)
+        data = response.json()
+
+        assert response.status_code == 200
+        assert len(data) == expected_page_size
+        timestamps.extend(item["timestamp"] for item in data)
+        cursor = response.headers.get("X-Next-Cursor")
+
+    assert cursor is None
+    assert timestamps == sorted(timestamps, reverse=True)
+    assert len(set(timestamps)) == 5
+
+
+def test_list_clicks_invalid_cursor(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+
+    response = client.get(f"/api/v1/links/{slug}/clicks", headers=auth_headers, params={"cursor": "WzFd"})
+    data = response.json()
+
+    assert response.status_code == 422
+    assert data["detail"] == "Cursor 'WzFd' is not valid"
+
+
+def test_list_clicks_query_budget(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+    assert_max_queries: Callable[[int], AbstractContextManager[list[str]]],
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    for _ in range(5):
+        client.get(f"/{slug}", follow_redirects=False)
+
+    with assert_max_queries(2):
+        response = client.get(f"/api/v1/links/{slug}/clicks", headers=auth_headers)
+
+    assert len(response.json()) == 5
@@ -4,6 +4,9 @@ Tests for the list links endpoint.
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+
 from fastapi.testclient import TestClient
 
 
@@ -46,3 +49,111 @@ def test_list_links(client: TestClient, auth_headers: dict[str, str], target_url
     for item in data:
         assert set(item.keys()) == {"slug", "target_url", "clicks"}
         assert item["slug"] in slugs
+
+
+def test_list_links_pagination(client: TestClient, auth_headers: dict[str, str], target_url: str) -> None:
+    for index in range(3):
+        client.post("/api/v1/links", headers=auth_headers, json={"target_url": f"{target_url}/{index}"})
+
+    response = client.get("/api/v1/links", headers=auth_headers, params={"limit": 2})
+    first_page = response.json()
+    cursor = response.headers["X-Next-Cursor"]
+
+    assert response.status_code == 200
+    assert len(first_page) == 2
+
+    response = client.get("/api/v1/links", headers=auth_headers, params={"limit": 2, "cursor": cursor})
+    second_page = response.json()
+
+    assert response.status_code == 200
+    assert len(second_page) == 1
+    assert "X-Next-Cursor" not in response.headers
+    returned_targets = {item["target_url"] for item in first_page + second_page}
+    assert returned_targets == {f"{target_url}/{index}" for index in range(3)}
+
+
+def test_list_links_invalid_cursor(client: TestClient, auth_headers: dict[str, str]) -> None:
+    response = client.get("/api/v1/links", headers=auth_headers, params={"cursor": "invalid"})
+    data = response.json()
+
+    assert response.status_code == 422
+    assert data["detail"] == "Cursor 'invalid' is not valid"
+
+
+def test_list_links_invalid_limit(client: TestClient, auth_headers: dict[str, str]) -> None:
+    response = client.get("/api/v1/links", headers=auth_headers, params={"limit": 0})
+
+    assert response.status_code == 422
+
+
+def test_list_links_query_budget(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    target_url: str,
+    assert_max_queries: Callable[[int], AbstractContextManager[list[str]]],
+) -> None:
+    links = [{"target_url": f"{target_url}/{index}"} for index in range(20)]
+    client.post("/api/v1/links:batch", headers=auth_headers, json={"links": links})
+
+    # Reading the page, whose links validate it.
+    with assert_max_queries(1):
+        response = client.get("/api/v1/links", headers=auth_headers, params={"limit": 10})
+
+    assert len(response.json()) == 10
+
+
+def test_list_links_not_modified(client: TestClient, auth_headers: dict[str, str], target_url: str) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"target_url": f"{target_url}/1"})
+    etag = client.get("/api/v1/links", headers=auth_headers).headers["ETag"]
+
+    response = client.get("/api/v1/links", headers={**auth_headers, "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+
+def test_list_links_modified(client: TestClient, auth_headers: dict[str, str], target_url: str) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"target_url": f"{target_url}/1"})
+    etag = client.get("/api/v1/links", headers=auth_headers).headers["ETag"]
+    client.post("/api/v1/links", headers=auth_headers, json={"target_url": f"{target_url}/2"})
+
+    response = client.get("/api/v1/links", headers={**auth_headers, "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert response.headers["ETag"] != etag
+
+
+def test_list_links_revalidated_by_clicks(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    target_url: str,
+) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    etag = client.get("/api/v1/links", headers=auth_headers).headers["ETag"]
+    link_etag = client.get(f"/api/v1/links/{slug}", headers=auth_headers).headers["ETag"]
+    client.get(f"/{slug}", follow_redirects=False)
+
+    response = client.get("/api/v1/links", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["clicks"] == 1
+    response = client.get(f"/api/v1/links/{slug}", headers={**auth_headers, "If-None-Match": link_etag})
+    assert response.status_code == 200
+
+
+def test_list_links_revalidated_by_deletes(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    target_url: str,
+) -> None:
+    slugs = [
+        client.post("/api/v1/links", headers=auth_headers, json={"target_url": f"{target_url}/{index}"}).json()["slug"]
+        for index in range(2)
+    ]
+    etag = client.get("/api/v1/links", headers=auth_headers).headers["ETag"]
+    client.delete(f"/api/v1/links/{slugs[1]}", headers=auth_headers)
+
+    response = client.get("/api/v1/links", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert [link["slug"] for link in response.json()] == slugs[:1]
@@ -0,0 +1,39 @@
+"""
+Tests for the metrics endpoint.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from fastapi.testclient import TestClient
+
+from linker.metrics import metrics
+
+
+def test_metrics_unauthorized(client: TestClient) -> None:
+    response = client.get("/metrics")
+    data = response.json()
+
+    assert response.status_code == 403
+    assert data["detail"] == "Not authenticated"
+
+
+def test_metrics(client: TestClient, auth_headers: dict[str, str], slug: str, target_url: str) -> None:
+    client.post("/api/v1/links", headers=auth_headers, json={"slug": slug, "target_url": target_url})
+    metrics.reset()
+    client.get(f"/{slug}", follow_redirects=False)
+    client.get(f"/{slug}", follow_redirects=False)
+    client.get("/surprised-charmander", follow_redirects=False)
+    client.get(f"/api/v1/links/{slug}", headers=auth_headers)
+
+    response = client.get("/metrics", headers=auth_headers)
+    lines = response.text.splitlines()
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert 'linker_http_requests_total{handler="redirect",route="/{slug}",method="GET",status="307"} 2' in lines
+    assert 'linker_http_requests_total{handler="redirect",route="/{slug}",method="GET",status="404"} 1' in lines
+    assert 'linker_http_requests_total{handler="api",route="/api/v1/links/{slug}",method="GET",status="200"} 1' in lines
+    assert 'linker_http_request_duration_seconds_count{handler="redirect",route="/{slug}"} 3' in lines
+    assert 'linker_crud_errors_total{error="SlugNotInUseError"} 1' in lines
+    assert any(line.startswith('linker_crud_duration_seconds_count{function="get_link"}') for line in lines)
+    assert "# TYPE linker_db_pool_checked_out gauge" in lines
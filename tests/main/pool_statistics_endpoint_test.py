@@ -0,0 +1,31 @@
+"""
+Tests for the pool statistics endpoint.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from fastapi.testclient import TestClient
+
+
+def test_pool_statistics_unauthorized(client: TestClient) -> None:
+    response = client.get("/api/v1/stats/pool")
+    data = response.json()
+
+    assert response.status_code == 403
+    assert data["detail"] == "Not authenticated"
+
+
+def test_pool_statistics(client: TestClient, auth_headers: dict[str, str]) -> None:
+    response = client.get("/api/v1/stats/pool", headers=auth_headers)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert set(data.keys()) == {
+        "pool_size",
+        "checked_in",
+        "checked_out",
+        "overflow",
+        "checkouts",
+        "wait_seconds_total",
+        "wait_seconds_max",
+    }
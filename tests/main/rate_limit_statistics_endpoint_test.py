@@ -0,0 +1,45 @@
+"""
+Tests for the rate limit statistics endpoint.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from linker.ratelimit import ip_rate_limiter
+
+
+def test_rate_limit_statistics_unauthorized(client: TestClient) -> None:
+    response = client.get("/api/v1/stats/ratelimit")
+    data = response.json()
+
+    assert response.status_code == 403
+    assert data["detail"] == "Not authenticated"
+
+
+def test_rate_limit_statistics(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    slug: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(ip_rate_limiter, "per_minute", 60)
+    monkeypatch.setattr(ip_rate_limiter, "burst", 1)
+    client.get(f"/{slug}", follow_redirects=False)
+    client.get(f"/{slug}", follow_redirects=False)
+
+    response = client.get("/api/v1/stats/ratelimit", headers=auth_headers)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["ip"] == {
+        "size": 1,
+        "max_size": ip_rate_limiter.max_size,
+        "per_minute": 60,
+        "burst": 1,
+        "allowed": 1,
+        "rejected": 1,
+        "evictions": 0,
+    }
+    assert data["slug"]["allowed"] == 0
@@ -0,0 +1,33 @@
+"""
+Tests for the startup statistics endpoint.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from fastapi.testclient import TestClient
+
+from linker.startup import startup_timings
+
+
+def test_startup_statistics_unauthorized(client: TestClient) -> None:
+    response = client.get("/api/v1/stats/startup")
+    data = response.json()
+
+    assert response.status_code == 403
+    assert data["detail"] == "Not authenticated"
+
+
+def test_startup_statistics(client: TestClient, auth_headers: dict[str, str]) -> None:
+    startup_timings.reset()
+    with startup_timings.phase("engine"):
+        pass
+    with startup_timings.phase("schema"):
+        pass
+
+    response = client.get("/api/v1/stats/startup", headers=auth_headers)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert list(data["phases"]) == ["engine", "schema"]
+    assert data["total_seconds"] == sum(data["phases"].values())
+    startup_timings.reset()
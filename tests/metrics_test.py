@@ -0,0 +1,78 @@
+"""
+Tests for the metrics.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import pytest
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+from linker.crud import InvalidSlugError, SlugNotInUseError, create_link, get_link
+from linker.metrics import Histogram, Metrics, instrument, instrument_engine, metrics
+from linker.models import Link, PoolStatisticsRead
+
+
+def test_histogram_counts_values_in_the_first_bucket_that_is_not_less() -> None:
+    histogram = Histogram((0.1, 1.0))
+
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(2.65)
+
+
+def test_metrics_render_cumulative_buckets() -> None:
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.observe_crud("get_link", 0.05)
+    metrics.observe_crud("get_link", 0.5)
+
+    lines = metrics.render(PoolStatisticsRead()).splitlines()
+
+    assert "# TYPE linker_crud_duration_seconds histogram" in lines
+    assert 'linker_crud_duration_seconds_bucket{function="get_link",le="0.1"} 1' in lines
+    assert 'linker_crud_duration_seconds_bucket{function="get_link",le="1.0"} 2' in lines
+    assert 'linker_crud_duration_seconds_bucket{function="get_link",le="+Inf"} 2' in lines
+    assert 'linker_crud_duration_seconds_count{function="get_link"} 2' in lines
+
+
+def test_metrics_render_escapes_label_values() -> None:
+    metrics = Metrics()
+    metrics.observe_request('/a"b\\c', "GET", 200, 0.0)
+
+    assert 'route="/a\\"b\\\\c"' in metrics.render(PoolStatisticsRead())
+
+
+def test_instrument_counts_errors_of_the_outermost_function_once(session: Session, slug_invalid: str) -> None:
+    metrics.reset()
+
+    @instrument
+    def get_invalid_link(session: Session) -> Link:
+        return get_link(session, slug_invalid)
+
+    with pytest.raises(InvalidSlugError):
+        get_invalid_link(session)
+    with pytest.raises(SlugNotInUseError):
+        get_link(session, "surprised-pikachu")
+
+    assert metrics.errors == {"InvalidSlugError": 1, "SlugNotInUseError": 1}
+    assert metrics.crud_durations["get_link"].count == 2
+    assert metrics.crud_durations["get_invalid_link"].count == 1
+
+
+def test_instrument_engine_labels_queries_with_the_crud_function(
+    engine: Engine,
+    session: Session,
+    slug: str,
+    target_url: str,
+) -> None:
+    instrument_engine(engine)
+    metrics.reset()
+
+    create_link(session, slug, target_url)
+    session.exec(select(Link)).all()
+
+    assert metrics.query_durations["create_link"].count >= 2
+    assert metrics.query_durations["other"].count == 1
@@ -0,0 +1,88 @@
+"""
+Tests for the click partitions and retention.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import asyncio
+import contextlib
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+from linker.crud import create_link, record_clicks
+from linker.models import Click
+from linker.partitions import (
+    add_months,
+    expire_clicks,
+    is_click_table_partitioned,
+    legacy_partition_name,
+    maintain_clicks,
+    month_start,
+    partition_name,
+    run_click_maintenance,
+)
+
+
+def test_month_start() -> None:
+    assert month_start(datetime(2025, 3, 1, 0, 30, tzinfo=UTC)) == datetime(2025, 3, 1)  # noqa: DTZ001
+    assert month_start(datetime(2025, 3, 1, 0, 30, tzinfo=UTC) + timedelta(hours=-1)) == datetime(2025, 2, 1)  # noqa: DTZ001
+
+
+@pytest.mark.parametrize(
+    ("months", "expected"),
+    [(1, datetime(2025, 12, 1)), (2, datetime(2026, 1, 1)), (-11, datetime(2024, 12, 1))],  # noqa: DTZ001
+)
+def test_add_months(months: int, expected: datetime) -> None:
+    assert add_months(datetime(2025, 11, 1), months) == expected  # noqa: DTZ001
+
+
+def test_partition_name() -> None:
+    assert partition_name(datetime(2025, 1, 1)) == "click_y2025m01"  # noqa: DTZ001
+
+
+def test_legacy_partition_name() -> None:
+    assert legacy_partition_name(datetime(2025, 3, 1)) == "click_before_y2025m03"  # noqa: DTZ001
+
+
+def test_expire_clicks(engine: Engine, session: Session, slug: str, target_url: str) -> None:
+    link = create_link(session, slug, target_url)
+    assert link.id is not None
+    now = datetime.now(tz=UTC)
+    timestamps = [now - timedelta(days=40), now - timedelta(days=31), now - timedelta(days=1)]
+    record_clicks(session, [Click(ip_address="127.0.0.1", link_id=link.id, timestamp=t) for t in timestamps])
+
+    with engine.connect() as connection:
+        assert not is_click_table_partitioned(connection)
+    maintain_clicks(engine, None)
+    assert len(session.exec(select(Click)).all()) == len(timestamps)
+    expire_clicks(engine, timedelta(days=30))
+
+    remaining = session.exec(select(Click.timestamp)).all()
+    assert [timestamp.replace(tzinfo=UTC) for timestamp in remaining] == timestamps[2:]
+    session.refresh(link)
+    assert link.click_count == len(timestamps)
+
+
+def test_run_click_maintenance_survives_failures(engine: Engine, monkeypatch: pytest.MonkeyPatch) -> None:
+    runs: list[timedelta | None] = []
+
+    def maintain_clicks(engine: Engine, retention: timedelta | None, *, archive: bool) -> None:  # noqa: ARG001
+        runs.append(retention)
+        raise RuntimeError
+
+    monkeypatch.setattr("linker.partitions.maintain_clicks", maintain_clicks)
+
+    async def run() -> None:
+        task = asyncio.create_task(run_click_maintenance(engine, timedelta(days=1), 0))
+        while len(runs) < 2:  # noqa: ASYNC110
+            await asyncio.sleep(0)
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    assert runs[:2] == [timedelta(days=1), timedelta(days=1)]
@@ -0,0 +1,94 @@
+"""
+Tests for the per-request query counts.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, select, text
+
+from linker.crud import list_links
+from linker.metrics import instrument_engine
+from linker.models import Link
+from linker.queries import QueryCountMiddleware, count_queries
+
+
+def test_count_queries(engine: Engine, session: Session, slug: str) -> None:
+    instrument_engine(engine)
+
+    with count_queries() as counter:
+        list_links(session)
+        session.exec(select(Link).where(Link.slug == slug)).all()
+
+    assert counter.count == 2
+    assert counter.seconds > 0
+
+
+def test_count_queries_ignores_queries_outside_the_block(engine: Engine, session: Session) -> None:
+    instrument_engine(engine)
+    list_links(session)
+
+    with count_queries() as counter:
+        pass
+
+    assert counter.count == 0
+
+
+def test_count_queries_nested(engine: Engine, session: Session, slug: str) -> None:
+    instrument_engine(engine)
+
+    with count_queries(statements=True) as outer:
+        list_links(session)
+        with count_queries() as inner:
+            session.exec(select(Link).where(Link.slug == slug)).all()
+
+    assert (outer.count, inner.count) == (2, 1)
+    assert outer.statements is not None
+    assert len(outer.statements) == outer.count
+    assert inner.statements is None
+
+
+def test_query_count_middleware_headers(tmp_path: Path, engine: Engine, session: Session) -> None:
+    # The synchronous handler runs in a worker thread, and the async handler runs the query in a greenlet.
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'linker.db'}", poolclass=NullPool)
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    app = FastAPI()
+    app.add_middleware(QueryCountMiddleware, debug=True)
+
+    @app.get("/sync")
+    def sync_endpoint() -> None:
+        list_links(session)
+        list_links(session)
+
+    @app.get("/async")
+    async def async_endpoint() -> None:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    client = TestClient(app)
+    sync_response = client.get("/sync")
+    async_response = client.get("/async")
+
+    assert sync_response.headers["X-Query-Count"] == "2"
+    assert float(sync_response.headers["X-Query-Seconds"]) > 0
+    assert async_response.headers["X-Query-Count"] == "1"
+
+
+def test_query_count_middleware_without_debug() -> None:
+    app = FastAPI()
+    app.add_middleware(QueryCountMiddleware, debug=False)
+
+    @app.get("/")
+    def endpoint() -> None:
+        pass
+
+    response = TestClient(app).get("/")
+
+    assert "X-Query-Count" not in response.headers
@@ -0,0 +1,63 @@
+"""
+Tests for the redirect rate limiter.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import pytest
+
+from linker.ratelimit import RateLimiter
+
+
+def test_rate_limiter_allows_burst(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("linker.ratelimit.time.monotonic", lambda: 100.0)
+    rate_limiter = RateLimiter(per_minute=60, burst=3, max_size=10)
+
+    assert [rate_limiter.acquire("127.0.0.1") for _ in range(4)] == [0, 0, 0, 1]
+    assert rate_limiter.acquire("127.0.0.2") == 0
+    assert (rate_limiter.allowed, rate_limiter.rejected) == (4, 1)
+
+
+def test_rate_limiter_refills(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 100.0
+    monkeypatch.setattr("linker.ratelimit.time.monotonic", lambda: now)
+    rate_limiter = RateLimiter(per_minute=30, burst=1, max_size=10)
+
+    assert rate_limiter.acquire("127.0.0.1") == 0
+    assert rate_limiter.acquire("127.0.0.1") == 2
+    now += 1
+    assert rate_limiter.acquire("127.0.0.1") == 1
+    now += 1
+    assert rate_limiter.acquire("127.0.0.1") == 0
+
+
+def test_rate_limiter_expires_idle_buckets(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 100.0
+    monkeypatch.setattr("linker.ratelimit.time.monotonic", lambda: now)
+    rate_limiter = RateLimiter(per_minute=60, burst=2, max_size=10)
+    rate_limiter.acquire("127.0.0.1")
+    rate_limiter.acquire("127.0.0.2")
+    now += 2
+    rate_limiter.acquire("127.0.0.3")
+
+    assert rate_limiter.statistics().size == 1
+    assert rate_limiter.evictions == 0
+
+
+def test_rate_limiter_evicts_least_recently_used() -> None:
+    rate_limiter = RateLimiter(per_minute=60, burst=1, max_size=2)
+    rate_limiter.acquire("127.0.0.1")
+    rate_limiter.acquire("127.0.0.2")
+    rate_limiter.acquire("127.0.0.3")
+
+    assert rate_limiter.statistics().size == 2
+    assert rate_limiter.evictions == 1
+    assert rate_limiter.acquire("127.0.0.1") == 0
+    assert rate_limiter.acquire("127.0.0.3") > 0
+
+
+def test_rate_limiter_disabled() -> None:
+    rate_limiter = RateLimiter(per_minute=0, burst=1, max_size=2)
+
+    assert [rate_limiter.acquire("127.0.0.1") for _ in range(3)] == [0, 0, 0]
+    assert rate_limiter.statistics().size == 0
@@ -0,0 +1,51 @@
+"""
+Tests for the HyperLogLog sketches.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import pytest
+
+from linker.constants import VISITOR_SKETCH_PRECISION
+from linker.sketches import HyperLogLog, relative_standard_error
+
+
+def ip_addresses(start: int, count: int) -> list[str]:
+    return [f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}" for index in range(start, start + count)]
+
+
+@pytest.mark.parametrize("count", [0, 1, 10, 100, 1_000, 10_000, 100_000])
+def test_hyperloglog_estimate_within_error_bounds(count: int) -> None:
+    sketch = HyperLogLog()
+    for ip_address in ip_addresses(0, count):
+        sketch.add(ip_address)
+    # Repeated values do not change the estimate.
+    for ip_address in ip_addresses(0, count):
+        assert not sketch.add(ip_address)
+
+    # Three standard errors hold for all but about 0.3% of the sketches, and small counts are close to exact.
+    assert abs(sketch.estimate() - count) <= max(3 * relative_standard_error() * count, 1)
+
+
+def test_hyperloglog_error_bounds() -> None:
+    assert len(HyperLogLog().to_bytes()) == 1 << VISITOR_SKETCH_PRECISION == 1024
+    assert relative_standard_error() == pytest.approx(0.0325)
+
+
+def test_hyperloglog_merge_and_round_trip() -> None:
+    first, second, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for ip_address in ip_addresses(0, 3_000):
+        first.add(ip_address)
+        both.add(ip_address)
+    for ip_address in ip_addresses(2_000, 3_000):
+        second.add(ip_address)
+        both.add(ip_address)
+
+    first.merge(HyperLogLog(second.to_bytes()))
+    assert first.to_bytes() == both.to_bytes()
+    assert abs(first.estimate() - 5_000) <= 3 * relative_standard_error() * 5_000
+
+
+def test_hyperloglog_invalid_registers() -> None:
+    with pytest.raises(ValueError, match="must have 1024 registers, got 16"):
+        HyperLogLog(bytes(16))
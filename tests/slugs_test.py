@@ -4,7 +4,9 @@ Tests for the slugs.
 @author "Daniel Mizsak" <info@pythonvilag.hu>
 """
 
-from linker.slugs import get_slugs
+import pytest
+
+from linker.slugs import SlugSpace, get_slugs
 
 
 def test_get_slugs(slugs: list[str]) -> None:
@@ -13,3 +15,36 @@ def test_get_slugs(slugs: list[str]) -> None:
     assert len(generated_slugs) == 150 * 10
     for slug in slugs:
         assert slug in generated_slugs
+
+
+def test_slug_space_is_bijective() -> None:
+    slug_space = SlugSpace(suffix_count=3)
+
+    generated_slugs = [slug_space.slug(index) for index in range(slug_space.size)]
+
+    assert len(set(generated_slugs)) == slug_space.size == 150 * 10 * 3
+    assert set(get_slugs()) < set(generated_slugs)
+    assert all(slug in slug_space for slug in generated_slugs)
+
+
+def test_slug_space_is_scrambled() -> None:
+    slug_space = SlugSpace()
+
+    assert slug_space.size == 150 * 10 * 10_000
+    assert [slug_space.slug(index) for index in range(3)] != sorted(slug_space.slug(index) for index in range(3))
+    assert slug_space.slug(0) != SlugSpace(seed=7).slug(0)
+
+
+@pytest.mark.parametrize(
+    "slug",
+    ["surprised-pika", "surprised-pikachu-0", "surprised-pikachu-01", "surprised-pikachu-10000", "pikachu", 1],
+)
+def test_slug_space_does_not_contain(slug: object) -> None:
+    assert slug not in SlugSpace()
+
+
+def test_slug_space_index_out_of_range() -> None:
+    slug_space = SlugSpace(suffix_count=1)
+
+    with pytest.raises(ValueError, match="Slug index 1500 is out of range for a space of 1500 slugs"):
+        slug_space.slug(slug_space.size)
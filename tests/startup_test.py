@@ -0,0 +1,29 @@
+"""
+Tests for the startup timings.
+
+@author "Daniel Mizsak" <info@pythonvilag.hu>
+"""
+
+import pytest
+
+from linker.startup import StartupTimings
+
+
+def test_startup_timings_records_failed_phase() -> None:
+    startup_timings = StartupTimings()
+
+    with pytest.raises(RuntimeError), startup_timings.phase("schema"):
+        raise RuntimeError
+
+    assert list(startup_timings.statistics().phases) == ["schema"]
+
+
+def test_startup_timings_reset() -> None:
+    startup_timings = StartupTimings()
+    with startup_timings.phase("engine"):
+        pass
+
+    startup_timings.reset()
+
+    assert startup_timings.statistics().phases == {}
+    assert startup_timings.statistics().total_seconds == 0